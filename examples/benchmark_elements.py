@@ -0,0 +1,45 @@
+import time
+import numpy as np
+import microfem
+
+
+# This benchmark compares the bilinear (q4), serendipity (q8) and Lagrange
+# (q9) laminate elements on a rectangular cantilever 100 um wide and 400 um
+# long. For each element and mesh density, the error of the lowest modes,
+# the number of free DOFs and the solve time are printed, so the cheapest
+# element for a target accuracy can be chosen.
+width = 100
+length = 400
+n_modes = 4
+meshes = [(2, 8), (4, 16), (6, 24), (8, 32), (12, 48)]
+material = microfem.PiezoMumpsMaterial()
+
+
+def frequencies(nelx, nely, element):
+
+    # `a` and `b` are half the element dimensions in um.
+    a = width / nelx / 2
+    b = length / nely / 2
+    topology = np.ones((nelx, nely))
+    cantilever = microfem.Cantilever(topology, a, b, width / 2, length - 1)
+
+    start = time.perf_counter()
+    fem = microfem.LaminateFEM(material, cantilever, element=element)
+    w, _, _ = fem.modal_analysis(n_modes=n_modes)
+    elapsed = time.perf_counter() - start
+    return np.sqrt(w) / (2 * np.pi), fem.dof.prolongation.n_free, elapsed
+
+
+# The reference frequencies are from a fine mesh of Lagrange elements.
+reference, n_ref, _ = frequencies(24, 96, 'q9')
+print('Reference (q9, %d DOFs): %s Hz\n' % (n_ref, reference))
+
+tup = ('Element', 'Mesh', 'DOFs', 'Time (s)', 'Max error (%)')
+print('%-8s %-8s %-8s %-10s %-14s' % tup)
+for element in ('q4', 'q8', 'q9'):
+    for nelx, nely in meshes:
+        freq, n_dof, elapsed = frequencies(nelx, nely, element)
+        error = 100 * np.max(np.abs(freq / reference - 1))
+        mesh = '%dx%d' % (nelx, nely)
+        print('%-8s %-8s %-8d %-10.3f %-14.4f' % (element, mesh, n_dof,
+                                                 elapsed, error))
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+import microfem
+
+
+# This benchmark compares the sparse direct solver backends on the stiffness
+# matrix of the free DOFs of the laminate example, refined to several mesh
+# sizes. For each installed backend the factorization time, the time of one
+# solve, and the time of a six mode analysis with the factorization are
+# printed. 'superlu (general)' is the unsymmetric LU with column ordering
+# that was used before the backends were added. The backend chosen by
+# solver='auto' is marked with a star.
+n_modes = 6
+scales = [1, 2, 3]
+material = microfem.PiezoMumpsMaterial()
+tip = np.vstack((np.zeros((20, 25)), np.ones((10, 25)), np.zeros((20, 25))))
+topology = np.hstack((np.ones((50, 25)), tip))
+
+configs = [('superlu (general)', 'superlu', False)]
+configs += [(name, name, True) for name in microfem.available_backends()]
+
+tup = ('Backend', 'DOFs', 'Factor (s)', 'Solve (s)', 'Modes (s)')
+print('%-20s %-8s %-12s %-12s %-12s' % tup)
+for scale in scales:
+    t = np.kron(topology, np.ones((scale, scale)))
+    cantilever = microfem.Cantilever(t, 5 / scale, 5 / scale, 250, 495)
+    fem = microfem.LaminateFEM(material, cantilever)
+    k = fem.get_stiffness_matrix(free=True).tocsc()
+    m = fem.get_mass_matrix(free=True).tocsc()
+    f = np.ones(k.shape[0])
+    auto = microfem.factorize(k, definite=True).backend
+
+    for label, backend, symmetric in configs:
+        start = time.perf_counter()
+        factor = microfem.factorize(k, backend, symmetric, definite=symmetric)
+        t_factor = time.perf_counter() - start
+
+        start = time.perf_counter()
+        factor.solve(f)
+        t_solve = time.perf_counter() - start
+
+        start = time.perf_counter()
+        microfem.solve_modes(k, m, n_modes, factor=factor)
+        t_modes = time.perf_counter() - start
+
+        label = label + (' *' if symmetric and backend == auto else '')
+        tup = (label, k.shape[0], t_factor, t_solve, t_modes)
+        print('%-20s %-8d %-12.3f %-12.4f %-12.3f' % tup)
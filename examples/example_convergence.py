@@ -0,0 +1,17 @@
+import microfem
+
+
+# A convergence study refines the mesh of a rectangular cantilever by halving
+# the element dimensions at each level, and compares the flexural 
+# frequencies with the analytic Euler-Bernoulli beam. The cantilever is 50um
+# wide and 400um long, and the coarsest mesh has 2 elements across.
+material = microfem.PiezoMumpsMaterial()
+study = microfem.ConvergenceStudy(material, width=50, length=400, n_modes=3,
+                                  theory='euler', nelx=2)
+study.run(levels=4)
+
+# The results table shows the error, DOFs, wall time and peak memory of each
+# level, followed by the coarsest mesh that meets the tolerance.
+tol = 0.01
+study.to_console(tol)
+best = study.recommend(tol)
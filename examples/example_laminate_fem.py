@@ -38,33 +38,38 @@ fem = microfem.LaminateFEM(material, cantilever)
 # resonance frequencies and mode shapes of the cantilever. These can then be
 # plotted.
 n_modes = 3
-ws, _, vall = fem.modal_analysis(n_modes=n_modes)
+ws, vs, vall = fem.modal_analysis(n_modes=n_modes)
 
 
-# Using the results of the modal analysis, the frequency, stiffness, 
-# tip displacement, and mode type (flexural, torsional), can be determined.
-coords = (cantilever.xtip, cantilever.ytip)
-opr = microfem.LaminateDisplacement(fem, coords).get_operator()
-mode_ident = microfem.ModeIdentification(fem, cantilever, type_='laminate')
+# The frequency, tip displacement, stiffness, charge and mode type (flexural,
+# torsional) of the modes above are computed at once as a structured array,
+# without solving again. The stiffness and charge are normalized by the tip
+# deflection, so they are NaN for the torsional modes.
+metrics = fem.modal_metrics(modes=(ws, vs))
 
-
-freq = np.sqrt(ws) / (2*np.pi)
-kuu = fem.get_stiffness_matrix(free=False)
-kuv = fem.get_piezoelectric_matrix(free=False)
-phis = [vall[:, [i]] for i in range(n_modes)]
-wtips = [opr @ p for p in phis]
-kfunc = lambda p, w: np.asscalar(p.T @ kuu @ p / w ** 2)
-ks = [kfunc(p, w) for p, w in zip(phis, wtips)]
-charges = [kuv.T @ p / w for p, w in zip(phis, wtips)]
-types = [mode_ident.is_mode_flexural(p) for p in phis]
-
-            
 tup = ('Disp', 'Freq (Hz)', 'Stiffness (N/m)', 'Flexural', 'Charge (C/m)')
 print('\n    %-15s %-15s %-15s %-10s %-15s' % tup)
-for i in range(n_modes):
-    tup = (i+1, wtips[i], freq[i], ks[i], str(types[i]), charges[i])
+for i, m in enumerate(metrics):
+    tup = (i+1, m['tip'], m['freq'], m['stiffness'], str(m['flexural']), 
+           m['charge'])
     print('%-2d: %-15g %-15g %-15g %-10s %-15g' % tup)
     
 microfem.plot_mode(fem, vall[:, 0])
 microfem.plot_mode(fem, vall[:, 1])
-microfem.plot_mode(fem, vall[:, 2])
\ No newline at end of file
+microfem.plot_mode(fem, vall[:, 2])
+# The frequency response of the tip deflection to a 1 V drive of the 
+# electrode is the superposition of the modes with a static residual, so a 
+# sweep of thousands of frequencies costs little more than the modal analysis.
+freqs = np.linspace(1e3, 400e3, 2000)
+h = fem.frequency_response(freqs, voltage=1.0, zeta=0.01)
+peak = np.argmax(np.abs(h[:, 0]))
+print('\nPeak tip deflection %g um/V at %g Hz' % (1e6 * np.abs(h[peak, 0]), 
+                                               freqs[peak]))
+
+# For many evaluations, such as controller design, the transfer function 
+# from the voltage to the tip deflection is reduced to a small model by 
+# moment matching, which is evaluated in microseconds per frequency.
+rom = fem.reduced_model(n_moments=8)
+error = rom.error_estimate(freqs, zeta=0.01)
+print('Reduced model of order %d, estimated error %g' % (rom.order, 
+                                                          error.max()))
@@ -41,26 +41,18 @@ fem = microfem.PlateFEM(material, cantilever)
 # resonance frequencies and mode shapes of the cantilever. These can then be
 # plotted.
 n_modes = 3
-ws, _, vall = fem.modal_analysis(n_modes=n_modes)
+ws, vs, vall = fem.modal_analysis(n_modes=n_modes)
 
-# Using the results of the modal analysis, the frequency, stiffness, 
-# tip displacement, and mode type (flexural, torsional), can be determined.
-coords = (cantilever.xtip, cantilever.ytip)
-opr = microfem.PlateDisplacement(fem, coords).get_operator()
-mode_ident = microfem.ModeIdentification(fem, cantilever, type_='plate')
-
-freq = np.sqrt(ws) / (2*np.pi)
-kuu = fem.get_stiffness_matrix(free=False)
-phis = [vall[:, [i]] for i in range(n_modes)]
-wtips = [opr @ p for p in phis]
-kfunc = lambda p, w: np.asscalar(p.T @ kuu @ p / w ** 2)
-ks = [kfunc(p, w) for p, w in zip(phis, wtips)]
-types = [mode_ident.is_mode_flexural(p) for p in phis]
+# The frequency, tip displacement, stiffness and mode type (flexural, 
+# torsional) of the modes above are computed at once as a structured array,
+# without solving again. The stiffness is normalized by the tip deflection,
+# so it is NaN for the torsional modes.
+metrics = fem.modal_metrics(modes=(ws, vs))
             
 tup = ('Disp', 'Freq (Hz)', 'Stiffness', 'Flexural')
 print('\n    %-15s %-15s %-15s %-10s' % tup)
-for i in range(n_modes):
-    tup = (i+1, wtips[i], freq[i], ks[i], str(types[i]))
+for i, m in enumerate(metrics):
+    tup = (i+1, m['tip'], m['freq'], m['stiffness'], str(m['flexural']))
     print('%-2d: %-15g %-15g %-15g %-10s' % tup)
     
 microfem.plot_mode(fem, vall[:, 0])
@@ -8,4 +8,16 @@ from .cantilevers import Cantilever
 from .analysis_plate_displacement import PlateDisplacement
 from .analysis_laminate_displacement import LaminateDisplacement
 from .analysis_mode_identification import ModeIdentification
+from .analysis_symmetry import MirrorSymmetry, is_mirror_symmetric
 from .plotting import plot_topology, plot_mode, plot_poisson_solution
+from .plotting import render_modes, render_many, render_poisson_solutions
+from .results import ResultWriter, ResultReader
+from .sweep import ParameterSweep
+from .laminate_affine import AffineLaminate
+from .convergence import ConvergenceStudy, cantilever_frequencies
+from .tracking import ModeTracker, mac_matrix, normalize_signs
+from .superelement import Superelement
+from .solvers import factorize, available_backends, solve_modes
+from .analysis_laminate_fields import LaminateFields
+from .constraints import ModeShapes
+from .reduction import ReducedModel, krylov_reduction
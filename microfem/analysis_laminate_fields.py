@@ -0,0 +1,138 @@
+import numpy as np
+
+
+class LaminateFields(object):
+    """Recovers element quantities of many mode shapes of a laminate at once.
+    The mode shapes are gathered through the element DOFs into a block of
+    shape (n_elem, n_edof, n_modes), from which the strain and kinetic
+    energy, the strains at the centroid, and the piezoelectric charge density
+    of every element and mode are computed with a few einsums. The element
+    matrices are scaled by the densities of the elements, so the energies and
+    charges of void elements in a full grid model are those of the ersatz
+    material.
+
+    The element quantities are computed from the model when the object is
+    created, so a new object is required after the topology or model of the
+    FEM changes.
+
+    Public Attributes
+    -----------------
+    self.area : ndarray
+        The area of each element in m^2.
+    """
+
+    def __init__(self, fem):
+        """
+        Parameters
+        ----------
+        fem : microfem.LaminateFEM
+            The laminate model of the mode shapes.
+        """
+        self._edofs = fem.dof.element_mdofs
+        self._muue, self._kuue, self._kinds = fem.get_element_matrices()
+        self._kuve = np.array([m.get_piezoelectric_element()[:, 0]
+                               for m in fem.models])
+
+        # The rows of the strain matrices with non-zero strains.
+        strains = [m.get_strain_elements() for m in fem.models]
+        self._bm = np.array([bs1[[0, 1, 4]] for bs1, _, _ in strains])
+        self._bb = np.array([bs2[[0, 1, 4]] for _, bs2, _ in strains])
+        self._bs = np.array([bs3[[2, 3]] for _, _, bs3 in strains])
+
+        solid = np.array([not e.void for e in fem.mesh.elements])
+        self._xk = np.where(solid, 1.0, fem.ersatz_stiffness)
+        self._covered = fem.dof.electrodes >= 0
+        self._xm = np.where(solid, 1.0, fem.ersatz_mass)
+        size = fem.mesh.element_size
+        self.area = 4 * fem.a * fem.b * size ** 2 * 1e-12
+
+
+    def gather(self, vall):
+        """Returns the (n_elem, n_edof, n_modes) block of the element DOFs of
+        the (n_mdof, n_modes) mode shapes (vall).
+        """
+        vall = np.asarray(vall)
+        return vall.reshape(vall.shape[0], -1)[self._edofs]
+
+
+    def strain_energy(self, ue):
+        """The (n_elem, n_modes) strain energy of each element in J."""
+        return 0.5 * self._xk[:, None] * self._quadratic(ue, self._kuue)
+
+
+    def kinetic_energy(self, w, ue):
+        """The (n_elem, n_modes) peak kinetic energy of each element in J for
+        the eigenvalues (w) of the modes.
+        """
+        w = np.asarray(w)
+        return 0.5 * self._xm[:, None] * w * self._quadratic(ue, self._muue)
+
+
+    def membrane_strain(self, ue):
+        """The (n_elem, 3, n_modes) membrane strains (xx, yy, xy) at the
+        centroid of each element.
+        """
+        return np.einsum('eri,eim->erm', self._bm[self._kinds], ue)
+
+
+    def curvature(self, ue):
+        """The (n_elem, 3, n_modes) curvatures (xx, yy, xy) in 1/m at the
+        centroid of each element. The bending strain at a height z above the
+        reference plane is z times the curvature.
+        """
+        return np.einsum('eri,eim->erm', self._bb[self._kinds], ue)
+
+
+    def shear_strain(self, ue):
+        """The (n_elem, 2, n_modes) transverse shear strains (yz, xz) at the
+        centroid of each element.
+        """
+        return np.einsum('eri,eim->erm', self._bs[self._kinds], ue)
+
+
+    def charge(self, ue):
+        """The (n_elem, n_modes) charge in C induced on the electrode of each
+        element, which is zero for elements without an electrode. The sum 
+        over the elements of an electrode is the charge of the electrode, 
+        kuv' vall.
+        """
+        kuve = self._kuve[self._kinds]
+        scale = np.where(self._covered, self._xk, 0.0)
+        return scale[:, None] * np.einsum('ei,eim->em', kuve, ue)
+
+
+    def charge_density(self, ue):
+        """The (n_elem, n_modes) charge per unit area in C/m^2 induced on the
+        electrode of each element.
+        """
+        return self.charge(ue) / self.area[:, None]
+
+
+    def compute(self, w, vall):
+        """Returns a dict of all the element quantities of the modes (w, vall)
+        with the keys 'strain_energy', 'kinetic_energy', 'membrane_strain',
+        'curvature', 'shear_strain' and 'charge_density'. The DOFs are only
+        gathered once.
+        """
+        ue = self.gather(vall)
+        return {'strain_energy': self.strain_energy(ue),
+                'kinetic_energy': self.kinetic_energy(w, ue),
+                'membrane_strain': self.membrane_strain(ue),
+                'curvature': self.curvature(ue),
+                'shear_strain': self.shear_strain(ue),
+                'charge_density': self.charge_density(ue)}
+
+
+    def _quadratic(self, ue, stack):
+        """The quadratic form ue' A ue of each element and mode, where A is
+        the element matrix of the kind of each element in (stack). The
+        elements of each kind are multiplied as one batch.
+        """
+        if len(stack) == 1:
+            return np.einsum('eim,eim->em', ue, np.matmul(stack[0], ue))
+        out = np.empty((ue.shape[0], ue.shape[2]))
+        for kind, matrix in enumerate(stack):
+            u = ue[self._kinds == kind]
+            out[self._kinds == kind] = np.einsum('eim,eim->em', u,
+                                                 np.matmul(matrix, u))
+        return out
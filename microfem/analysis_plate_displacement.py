@@ -7,6 +7,7 @@ class PlateDisplacement(object):
     def __init__(self, fem, coords):
 
         self._elements = fem.dof.dof_elements
+        self._shapes = fem.dof.shapes
         self._xtip = coords[0]
         self._ytip = coords[1]
         self._a = fem.a  # distance in um
@@ -24,7 +25,8 @@ class PlateDisplacement(object):
     
     def _assemble(self, element_func):
         
-        num = 12 * len(self._elements)
+        n_edof = 3 * self._shapes.n_nodes
+        num = n_edof * len(self._elements)
         row = np.zeros(num)
         col = np.zeros(num) 
         val = np.zeros(num)
@@ -34,7 +36,7 @@ class PlateDisplacement(object):
             dof = e.mechanical_dof
             ge = element_func(e)
             if ge is not None:
-                for ii in range(12):
+                for ii in range(n_edof):
                     row[ntriplet] = 0
                     col[ntriplet] = dof[ii]
                     val[ntriplet] = ge[0, ii]
@@ -46,10 +48,12 @@ class PlateDisplacement(object):
     
     def _operator_element(self, element):
         
-        x0 = element.element.i + 0.5
-        y0 = element.element.j + 0.5
-        xi = (self._xtip / self._a - 2 * x0) 
-        eta = (self._ytip / self._b - 2 * y0) 
+        n_edof = 3 * self._shapes.n_nodes
+        s = element.element.size
+        x0 = element.element.i + 0.5 * s
+        y0 = element.element.j + 0.5 * s
+        xi = (self._xtip / self._a - 2 * x0) / s
+        eta = (self._ytip / self._b - 2 * y0) / s
         
         #if (x0 == 29.5 or x0 == 30.5) and (y0 == 59.5):
         #    print(xi, eta)
@@ -57,10 +61,9 @@ class PlateDisplacement(object):
         #    print(self._xtip - 2 * self._a * x0)
         
         if -1 < xi <= 1 and -1 < eta <= 1:
-            xi_sign = np.array([-1, 1, 1, -1])
-            eta_sign = np.array([-1, -1, 1, 1])
-            n = 0.25 * (1 + xi_sign * xi) * (1 + eta_sign * eta)
-            ge = np.array([[n[0], 0, 0, n[1], 0, 0, n[2], 0, 0, n[3], 0, 0]])
+            n, _, _ = self._shapes.evaluate((xi, eta))
+            ge = np.zeros((1, n_edof))
+            ge[0, 0::3] = n
             return ge
         
         return None
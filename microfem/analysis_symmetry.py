@@ -0,0 +1,138 @@
+import numpy as np
+import scipy.sparse as sparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .solvers import solve_modes
+from .spectrum import solve_band
+
+
+def is_mirror_symmetric(mesh):
+    """Returns True if the elements of the mesh are mirror symmetric about the
+    long axis of the cantilever, the line x = nelx / 2. The line must pass
+    through a column of nodes, so nelx must be even.
+    """
+    nelx, nely = mesh.shape
+    if nelx % 2 != 0:
+        return False
+    solid = np.zeros(mesh.shape, dtype=bool)
+    for e in mesh.elements:
+        solid[e.i:e.i + e.size, e.j:e.j + e.size] = not e.void
+    return np.array_equal(solid, solid[::-1, :])
+
+
+class MirrorSymmetry(object):
+    """Splits the modal analysis of a mirror symmetric cantilever into two
+    half-size eigenproblems. The symmetric modes (flexural) and antisymmetric
+    modes (torsional) are each spanned by a transformation (ts, ta) from the
+    DOFs of the left half of the cantilever to the free DOFs of the full
+    cantilever. The right half is the mirror image of the left half with the
+    sign of each DOF given by the parity of the node. DOFs on the centerline
+    that must be zero for a given symmetry class are removed. The half-size
+    problems are the Galerkin projections of the full problem onto these
+    subspaces, so for a symmetric structure the modes are exact.
+
+    Public Attributes
+    -----------------
+    self.ts : scipy.sparse.csc_matrix
+        The map from the symmetric half-model to the free DOFs.
+    self.ta : scipy.sparse.csc_matrix
+        The map from the antisymmetric half-model to the free DOFs.
+    """
+
+    def __init__(self, fem):
+        """
+        Parameters
+        ----------
+        fem : microfem.PlateFEM or microfem.LaminateFEM
+            The finite element model of a mirror symmetric cantilever.
+        """
+        mesh = fem.dof.mesh
+        if is_mirror_symmetric(mesh) is False:
+            raise ValueError('The topology is not mirror symmetric.')
+        if fem.dof.prolongation.constrained is True:
+            raise ValueError('Adaptive meshes are not supported.')
+
+        self._fem = fem
+        self._center = mesh.shape[0] // 2
+        self._free_index = -np.ones(fem.dof.n_mdof, dtype=int)
+        self._free_index[fem.dof.free_dofs] = np.arange(len(fem.dof.free_dofs))
+        self.ts = self._transformation(1)
+        self.ta = self._transformation(-1)
+
+
+    def modal_analysis(self, n_modes=None, expand=True, out=None, 
+                       f_min=None, f_max=None, n_slices=None, 
+                       processes=None):
+        """Solves the symmetric and antisymmetric eigenproblems concurrently
+        and merges the modes in order of increasing eigenvalue. The return
+        values (w, v, vall) are the same as the modal analysis of the FEM, and
+        (expand) and (out) select the form of (vall), see 
+        `Prolongation.expand`. The return value (symmetric) is True for each
+        symmetric mode.
+
+        If (f_max) is given, all the modes of each half-model with a 
+        frequency in the band [f_min, f_max] Hz are found instead of the 
+        lowest (n_modes), see `solve_band`.
+        """
+        if n_modes is None and f_max is None:
+            raise ValueError('Either n_modes or f_max is required.')
+        fem = self._fem
+        m = fem.get_mass_matrix(free=True)
+        k = fem.get_stiffness_matrix(free=True)
+
+        def solve(t):
+            mh = (t.T @ m @ t).tocsc()
+            kh = (t.T @ k @ t).tocsc()
+            if f_max is not None:
+                f_low = 0 if f_min is None else f_min
+                wh, vh = solve_band(kh, mh, f_low, f_max, n_slices, processes,
+                                    fem.solver)
+            else:
+                n = min(n_modes, t.shape[1] - 1)
+                wh, vh = solve_modes(kh, mh, n, backend=fem.solver)
+            return wh, t @ vh
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            (ws, vs), (wa, va) = executor.map(solve, (self.ts, self.ta))
+
+        w = np.concatenate((ws, wa))
+        v = np.hstack((vs, va))
+        symmetric = np.concatenate((np.ones(len(ws), dtype=bool),
+                                    np.zeros(len(wa), dtype=bool)))
+        order = np.argsort(w, kind='stable')[:n_modes]
+        w, v, symmetric = w[order], v[:, order], symmetric[order]
+
+        vall = fem.dof.prolongation.expand(v, expand, out)
+        return w, v, vall, symmetric
+
+
+    def _transformation(self, sign):
+        """Builds the map from the half-model to the free DOFs for symmetric
+        (sign=1) or antisymmetric (sign=-1) displacement fields.
+        """
+        dof_nodes = self._fem.dof.dof_nodes
+        lookup = {(n.node.i, n.node.j): n for n in dof_nodes}
+
+        row, col, val = [], [], []
+        n_half = 0
+        for n in dof_nodes:
+            i, j = n.node.i, n.node.j
+            if i > self._center:
+                continue
+            parity = sign * n.mirror_parity
+            mirror = lookup[(2 * self._center - i, j)]
+            for d, dm, p in zip(n.mechanical_dof, mirror.mechanical_dof, parity):
+                fd = self._free_index[d]
+                if fd < 0 or (i == self._center and p < 0):
+                    continue
+                row.append(fd)
+                col.append(n_half)
+                val.append(1.0)
+                if i != self._center:
+                    row.append(self._free_index[dm])
+                    col.append(n_half)
+                    val.append(float(p))
+                n_half += 1
+
+        shape = (len(self._fem.dof.free_dofs), n_half)
+        return sparse.coo_matrix((val, (row, col)), shape=shape).tocsc()
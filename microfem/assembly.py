@@ -0,0 +1,126 @@
+import numpy as np
+import scipy.sparse as sparse
+from concurrent.futures import ThreadPoolExecutor
+
+
+def element_blocks(n, threads=None):
+    """Splits the range of (n) elements into contiguous blocks, one for each
+    thread.
+    """
+    threads = 1 if threads is None else max(1, min(threads, n))
+    bounds = np.linspace(0, n, threads + 1).astype(int)
+    return [slice(s, e) for s, e in zip(bounds[:-1], bounds[1:])]
+
+
+def run_blocks(func, n, threads=None):
+    """Evaluates func(block) for contiguous blocks of the (n) elements and
+    returns the list of results in the order of the blocks. With more than
+    one thread the blocks are processed in a thread pool, so (func) should
+    spend its time in NumPy kernels that release the GIL.
+    """
+    blocks = element_blocks(n, threads)
+    if len(blocks) == 1:
+        return [func(blocks[0])]
+    with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+        return list(executor.map(func, blocks))
+
+
+class SparseAssembler(object):
+    """The scatter map from the entries of the element matrices to the data
+    of a CSR matrix. The map is computed once from the element DOFs and is
+    reused every time the matrix is assembled, so the sparsity pattern is
+    fixed and only the values are computed.
+
+    The entries contributing to each slot of the CSR data are summed in a
+    fixed order by a segmented reduction. When assembling with several
+    threads the slots are split into contiguous blocks, and since a block
+    boundary never splits the entries of a slot, the result is bit-identical
+    for any number of threads.
+
+    Public Attributes
+    -----------------
+    self.shape : tuple
+        The shape of the assembled matrix.
+    self.nnz : int
+        The number of stored values of the assembled matrix.
+    """
+
+    def __init__(self, rows, cols, shape):
+        """
+        Parameters
+        ----------
+        rows : ndarray
+            The row of each entry of each element matrix, shape (n_elem, n).
+        cols : ndarray
+            The column of each entry of each element matrix.
+        shape : tuple
+            The shape of the assembled matrix.
+        """
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        cols = np.asarray(cols, dtype=np.int64).ravel()
+        slots = rows * shape[1] + cols
+
+        self._order = np.argsort(slots, kind='stable')
+        sorted_slots = slots[self._order]
+        new = np.ones(len(sorted_slots), dtype=bool)
+        new[1:] = sorted_slots[1:] != sorted_slots[:-1]
+        self._starts = np.flatnonzero(new)
+        unique = sorted_slots[self._starts]
+
+        self.shape = shape
+        self.nnz = len(unique)
+        self._indices = (unique % shape[1]).astype(np.int32)
+        self._indptr = np.searchsorted(unique // shape[1],
+                                       np.arange(shape[0] + 1))
+        self._indptr = self._indptr.astype(np.int32)
+        self._n_entries = len(slots)
+
+
+    def assemble(self, values, threads=None):
+        """Sums the entries of the element matrices (values) into a CSR
+        matrix. The values are ordered the same as the rows and columns given
+        to the constructor.
+        """
+        data = self.assemble_data(values, threads)
+        return sparse.csr_matrix((data, self._indices, self._indptr),
+                                 shape=self.shape)
+
+
+    def assemble_data(self, values, threads=None):
+        """Returns the CSR data array of the assembled matrix."""
+        values = np.ravel(values)
+        if len(values) != self._n_entries:
+            raise ValueError('The number of values does not match the map.')
+
+        data = np.zeros(self.nnz)
+        def reduce(block):
+            if block.start == block.stop:
+                return
+            first = self._starts[block.start]
+            last = (self._starts[block.stop] if block.stop < self.nnz
+                    else self._n_entries)
+            segment = values[self._order[first:last]]
+            offsets = self._starts[block] - first
+            data[block] = np.add.reduceat(segment, offsets)
+        run_blocks(reduce, self.nnz, threads)
+        return data
+
+
+def element_values(scale, element_matrix, threads=None, kinds=None):
+    """Returns the entries of the element matrices of all elements as a
+    (n_elem, n) array. Each element matrix is (element_matrix) multiplied by
+    the element's entry in (scale). If (kinds) is given, (element_matrix) is
+    a stack of matrices and each element uses the matrix of its kind.
+    """
+    if kinds is None:
+        flat = np.ravel(element_matrix)[None, :]
+        kinds = np.zeros(len(scale), dtype=int)
+    else:
+        flat = np.reshape(element_matrix, (len(element_matrix), -1))
+    values = np.empty((len(scale), flat.shape[1]))
+    single = len(flat) == 1
+    def product(block):
+        rows = flat[:1] if single else flat[kinds[block]]
+        np.multiply(scale[block, None], rows, out=values[block])
+    run_blocks(product, len(scale), threads)
+    return values
@@ -0,0 +1,191 @@
+import numpy as np
+import scipy.sparse as sparse
+
+
+class Prolongation(object):
+    """The map from the free coordinates of a model to all of its DOFs. The
+    free coordinates are the DOFs that are neither fixed by the boundary
+    conditions nor tied to other DOFs by the constraints of a hanging node.
+    The system matrices of the free coordinates are P' A P, and a solution
+    u of the free coordinates is expanded to all DOFs as P u. Without
+    constraints P only selects the free DOFs, so this reduces to indexing.
+
+    Public Attributes
+    -----------------
+    self.free_dofs : ndarray
+        The DOF of each free coordinate.
+    self.constrained : bool
+        True if the model has hanging node constraints.
+    self.matrix : scipy.sparse.csr_matrix
+        The (n_dof, n_free) matrix P.
+    """
+
+    def __init__(self, n_dof, free_dofs, node_dofs=None, constraints=None):
+        """
+        Parameters
+        ----------
+        n_dof : int
+            The number of DOFs of the model.
+        free_dofs : ndarray
+            The DOFs that are not fixed by the boundary conditions.
+        node_dofs : ndarray
+            The (n_node, dofs_per_node) array of the DOFs of each node.
+        constraints : dict
+            The hanging node constraints of the mesh, see `UniformMesh`.
+        """
+        constraints = {} if constraints is None else constraints
+        self.constrained = len(constraints) > 0
+        self.n_dof = n_dof
+
+        hanging = [node_dofs[n] for n in constraints]
+        hanging = np.concatenate(hanging) if hanging else np.array([], int)
+        self.free_dofs = np.setdiff1d(free_dofs, hanging)
+
+        column = -np.ones(n_dof, dtype=int)
+        column[self.free_dofs] = np.arange(len(self.free_dofs))
+        rows = list(self.free_dofs)
+        cols = list(range(len(self.free_dofs)))
+        vals = [1.0] * len(self.free_dofs)
+        for node, masters in constraints.items():
+            for m, w in masters:
+                for d, dm in zip(node_dofs[node], node_dofs[m]):
+                    if column[dm] >= 0:
+                        rows.append(d)
+                        cols.append(column[dm])
+                        vals.append(w)
+
+        shape = (n_dof, len(self.free_dofs))
+        self.matrix = sparse.csr_matrix((vals, (rows, cols)), shape=shape)
+
+
+    @property
+    def n_free(self):
+        return len(self.free_dofs)
+
+
+    def restrict(self, a):
+        """Returns the matrix P' A P of the free coordinates."""
+        if self.constrained is False:
+            a = a.tocsr()
+            return a[self.free_dofs, :][:, self.free_dofs]
+        return (self.matrix.T @ a @ self.matrix).tocsr()
+
+
+    def restrict_rows(self, a):
+        """Returns P' A, for example the load vectors of the free coordinates.
+        """
+        if self.constrained is False:
+            a = a.tocsr() if sparse.issparse(a) else a
+            return a[self.free_dofs]
+        return self.matrix.T @ a
+
+
+    def prolong(self, v, out=None, block_size=64):
+        """Expands the free coordinates (v) to all DOFs. The result is written
+        to (out) if given, such as an np.memmap, in blocks of (block_size)
+        columns so no temporary of the full size is allocated.
+        """
+        v = np.asarray(v)
+        if out is None:
+            out = np.zeros((self.n_dof,) + v.shape[1:], dtype=v.dtype)
+        elif out.shape != (self.n_dof,) + v.shape[1:]:
+            raise ValueError('The output array must have shape %s.' %
+                             ((self.n_dof,) + v.shape[1:],))
+        if v.ndim == 1:
+            out[...] = self._prolong_block(v)
+            return out
+        for start in range(0, v.shape[1], block_size):
+            stop = start + block_size
+            out[:, start:stop] = self._prolong_block(v[:, start:stop])
+        return out
+
+
+    def expand(self, v, expand=True, out=None):
+        """Returns the mode shapes of all DOFs of the free coordinates (v) as
+        selected by (expand). If True the modes are expanded to a dense array,
+        or written to (out) if given, see `prolong`. If 'lazy' a `ModeShapes`
+        view is returned that expands the modes on access. If False None is
+        returned.
+        """
+        if expand is True:
+            return self.prolong(v, out)
+        if expand == 'lazy':
+            return ModeShapes(self, v)
+        if expand is False:
+            return None
+        raise ValueError('Unknown expansion %s.' % expand)
+
+
+    def _prolong_block(self, v):
+
+        if self.constrained is False:
+            block = np.zeros((self.n_dof,) + v.shape[1:], dtype=v.dtype)
+            block[self.free_dofs] = v
+            return block
+        return self.matrix @ v
+
+
+class ModeShapes(object):
+    """A lazy view of the mode shapes of all DOFs, P v, which only stores the
+    free coordinates (v). Indexing expands the selected rows and columns
+    only, and `blocks` streams over the modes in blocks of columns, so large
+    numbers of modes can be post-processed without holding every DOF of
+    every mode in memory. Rows and columns are indexed independently, like
+    np.ix_, and an (n, 1) row index with a (1, m) column index selects the
+    same (n, m) block as for an array. np.asarray expands all the modes.
+
+    Public Attributes
+    -----------------
+    self.v : ndarray
+        The (n_free, n_modes) free coordinates of the modes.
+    """
+
+    def __init__(self, prolongation, v):
+
+        self.prolongation = prolongation
+        self.v = np.asarray(v)
+
+
+    @property
+    def shape(self):
+        return (self.prolongation.n_dof,) + self.v.shape[1:]
+
+
+    @property
+    def ndim(self):
+        return self.v.ndim
+
+
+    @property
+    def dtype(self):
+        return self.v.dtype
+
+
+    def __len__(self):
+        return self.prolongation.n_dof
+
+
+    def __array__(self, dtype=None, copy=None):
+
+        out = self.prolongation.prolong(self.v)
+        return out if dtype is None else out.astype(dtype)
+
+
+    def __getitem__(self, index):
+
+        rows, cols = index if isinstance(index, tuple) else (index, slice(None))
+        v = self.v[:, np.ravel(cols) if np.ndim(cols) > 1 else cols]
+        rows = np.arange(self.shape[0])[np.ravel(rows) if np.ndim(rows) > 1
+                                        else rows]
+        if np.ndim(rows) == 0:
+            return (self.prolongation.matrix[[rows]] @ v)[0]
+        return self.prolongation.matrix[rows] @ v
+
+
+    def blocks(self, size=32):
+        """Yields the tuple (modes, block) of each block of at most (size)
+        modes, where (modes) is the slice of the columns of the block.
+        """
+        for start in range(0, self.v.shape[1], size):
+            modes = slice(start, min(start + size, self.v.shape[1]))
+            yield modes, self.prolongation.prolong(self.v[:, modes])
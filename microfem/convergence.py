@@ -0,0 +1,219 @@
+import time
+import tracemalloc
+import numpy as np
+
+from .cantilevers import Cantilever
+from .laminate_fem import LaminateFEM
+from .plate_fem import PlateFEM
+
+
+# The roots of 1 + cos(x) cosh(x) = 0, which give the flexural modes of a
+# clamped-free beam.
+_BETA_L = np.array([1.875104068712, 4.694091132974, 7.854757438238,
+                    10.995540734875, 14.137168391046, 17.278759532088])
+
+
+def cantilever_frequencies(material, length, n_modes=3, theory='euler'):
+    """Returns the analytic frequencies in Hz of the lowest flexural modes of
+    a uniform rectangular cantilever of (length) um.
+
+    Parameters
+    ----------
+    material : microfem.PlateMaterial or microfem.LaminateMaterial
+        The material of the cantilever.
+    length : float
+        The length of the cantilever from the clamped edge in um.
+    n_modes : int
+        The number of modes.
+    theory : string
+        'euler' is an Euler-Bernoulli beam, where the transverse stresses are
+        zero. This is accurate for cantilevers that are narrow compared to
+        their length. 'kirchhoff' is a Kirchhoff plate strip in cylindrical
+        bending, where the transverse curvature is zero. This is accurate for
+        cantilevers that are wide compared to their length.
+    """
+    if n_modes > len(_BETA_L):
+        raise ValueError('At most %d modes are available.' % len(_BETA_L))
+
+    a, b, d, mass = _laminate_stiffness(material)
+    if theory == 'euler':
+        compliance = np.linalg.inv(np.block([[a, b], [b, d]]))
+        bending = 1 / compliance[2, 2]
+    elif theory == 'kirchhoff':
+        bending = d[0, 0] - b[0, 0] ** 2 / a[0, 0]
+    else:
+        raise ValueError('Unknown theory %s.' % theory)
+
+    length = length * 1e-6
+    beta = _BETA_L[:n_modes] / length
+    return beta ** 2 * np.sqrt(bending / mass) / (2 * np.pi)
+
+
+def _laminate_stiffness(material):
+    """Returns the in-plane (a), coupling (b) and bending (d) stiffness
+    matrices of the normal strains (xx, yy) per unit width, and the mass per
+    unit area, of a plate or laminate material.
+    """
+    if hasattr(material, 'get_fem_parameters'):
+        cs1, cs2, cs3, _, _, _, cm0, _, _ = material.get_fem_parameters()
+        return cs1[:2, :2], cs2[:2, :2], cs3[:2, :2], cm0
+
+    e, nu, h = material.elastic, material.nu, material.h
+    c = e / (1 - nu ** 2) * np.array([[1, nu], [nu, 1]])
+    return c * h, np.zeros((2, 2)), c * h ** 3 / 12, material.rho * h
+
+
+class ConvergenceStudy(object):
+    """Refines the mesh of a rectangular cantilever by halving the element
+    dimensions (a, b) at each level, and compares the lowest flexural
+    frequencies of the modal analysis with `cantilever_frequencies`. The
+    modes are found by the symmetric modal analysis of the FEM, see 
+    `MirrorSymmetry`, and the flexural modes are identified by 
+    `modal_metrics`, since the symmetric modes also include in-plane modes.
+
+    The errors converge to the difference between the finite element model
+    and the analytic theory, rather than to zero. For a cantilever a quarter
+    as wide as it is long, the Euler-Bernoulli frequencies are about 1%
+    lower than the converged Mindlin plate frequencies, so tolerances should
+    be well above this floor.
+
+    Public Attributes
+    -----------------
+    self.results : list of dict
+        The results of each level of `run` with the keys 'level', 'a', 'b',
+        'shape', 'n_dof', 'freq', 'error', 'time' and 'peak_memory'. The
+        error is the largest relative error of the modes. The time is the
+        wall time in s of building the model and the modal analysis. The
+        peak memory is the peak in bytes of the allocations traced by
+        `tracemalloc`, which includes NumPy arrays but not the workspace of
+        the sparse solvers.
+    self.reference : ndarray
+        The analytic frequencies in Hz.
+    """
+
+    def __init__(self, material, width, length, n_modes=3, theory='euler',
+                 nelx=2, nely=None, **options):
+        """
+        Parameters
+        ----------
+        material : microfem.PlateMaterial or microfem.LaminateMaterial
+            The material selects the PlateFEM or LaminateFEM.
+        width : float
+            The width of the cantilever in um.
+        length : float
+            The length of the cantilever in um.
+        n_modes : int
+            The number of flexural modes compared.
+        theory : string
+            The analytic theory, see `cantilever_frequencies`.
+        nelx : int
+            The number of elements across the width of the coarsest mesh. It
+            must be even for the symmetric modal analysis.
+        nely : int
+            The number of elements along the length of the coarsest mesh. It
+            defaults to square elements.
+        options :
+            Passed to the FEM, for example element='q8'.
+        """
+        if nelx % 2 != 0:
+            raise ValueError('The number of elements across must be even.')
+
+        self.material = material
+        self.width = width
+        self.length = length
+        self.n_modes = n_modes
+        self.nelx = nelx
+        self.nely = (max(1, int(round(nelx * length / width)))
+                     if nely is None else nely)
+        self.options = options
+        self.reference = cantilever_frequencies(material, length, n_modes,
+                                                theory)
+        self.results = []
+
+
+    def run(self, levels=4):
+        """Runs the modal analysis of each level of refinement and returns
+        the list of results, see `results`.
+        """
+        self.results = []
+        for level in range(levels):
+            nelx = self.nelx * 2 ** level
+            nely = self.nely * 2 ** level
+            self.results.append(self._solve(level, nelx, nely))
+        return self.results
+
+
+    def recommend(self, tol):
+        """Returns the result of the coarsest level whose error is at most
+        (tol), or None if no level meets the tolerance.
+        """
+        for r in self.results:
+            if r['error'] <= tol:
+                return r
+        return None
+
+
+    def to_console(self, tol=None):
+
+        print('Analytic frequencies (Hz): %s\n' % self.reference)
+        tup = ('Level', 'Mesh', 'DOFs', 'Error (%)', 'Time (s)', 'Peak (MB)')
+        print('%-6s %-10s %-8s %-10s %-10s %-10s' % tup)
+        for r in self.results:
+            tup = (r['level'], '%dx%d' % r['shape'], r['n_dof'],
+                   100 * r['error'], r['time'], r['peak_memory'] / 2 ** 20)
+            print('%-6d %-10s %-8d %-10.4f %-10.3f %-10.2f' % tup)
+
+        if tol is not None:
+            r = self.recommend(tol)
+            if r is None:
+                print('\nNo level meets the tolerance of %g%%.' % (100 * tol))
+            else:
+                tup = (r['level'], r['a'], r['b'], 100 * tol)
+                print('\nLevel %d (a = %g um, b = %g um) is the coarsest mesh'
+                      ' within %g%%.' % tup)
+
+
+    def _solve(self, level, nelx, nely):
+
+        a = self.width / nelx / 2
+        b = self.length / nely / 2
+        topology = np.ones((nelx, nely))
+        cantilever = Cantilever(topology, a, b, self.width / 2, self.length)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        if hasattr(self.material, 'get_fem_parameters'):
+            fem = LaminateFEM(self.material, cantilever, **self.options)
+        else:
+            fem = PlateFEM(self.material, cantilever, **self.options)
+
+        freq = self._flexural_frequencies(fem)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        error = np.abs(freq / self.reference - 1)
+        return {'level': level, 'a': a, 'b': b, 'shape': (nelx, nely),
+                'n_dof': fem.dof.prolongation.n_free, 'freq': freq,
+                'error': np.max(error), 'time': elapsed, 'peak_memory': peak}
+
+
+    def _flexural_frequencies(self, fem):
+        """The frequencies of the lowest (n_modes) flexural modes. A mode is
+        flexural if the deflection has the same sign either side of the tip,
+        see `modal_metrics`. The in-plane modes barely deflect the tip, so
+        their sign is noise and they are also excluded by their undefined
+        modal stiffness. More modes are solved until enough flexural modes
+        are found.
+        """
+        n_max = fem.dof.prolongation.n_free - 2
+        n = min(2 * self.n_modes + 2, n_max)
+        while True:
+            metrics = fem.modal_metrics(n, symmetric=True)
+            flexural = metrics['flexural'] & ~np.isnan(metrics['stiffness'])
+            if np.count_nonzero(flexural) >= self.n_modes:
+                return metrics['freq'][flexural][:self.n_modes]
+            if n >= n_max:
+                raise ValueError('The mesh has fewer than %d flexural '
+                                 'modes.' % self.n_modes)
+            n = min(2 * n, n_max)
@@ -0,0 +1,105 @@
+import numpy as np
+import scipy.linalg
+
+from .solvers import solve_modes
+
+
+def shunt_modes(k, m, kuv, kvv, resistance, n_modes, factor, n_basis=None):
+    """Finds the damped modes of a laminate whose electrodes are shunted by
+    resistors. The charge flowing through the shunts dissipates energy, so
+    the modes are complex. The equations of motion are
+
+        M u'' + K u + Kuv V = 0
+        Kvv V' + G V = Kuv' u'
+
+    where G is the diagonal matrix of the conductances of the shunts. An
+    infinite resistance is an open electrode and the limit of zero
+    resistance is a short-circuited electrode.
+
+    The mechanical DOFs are reduced to the span of the lowest (n_basis)
+    short-circuit modes and the static response to the electrode voltages,
+    K^-1 Kuv, which holds the open-circuit modes to good accuracy. The
+    eigenvalues of the first order state-space model of the reduced
+    coordinates, their velocities and the voltages are found densely.
+
+    Parameters
+    ----------
+    k : scipy.sparse matrix
+        The stiffness matrix of the free DOFs.
+    m : scipy.sparse matrix
+        The mass matrix of the free DOFs.
+    kuv : ndarray
+        The (n_free, n_electrodes) piezoelectric matrix of the free DOFs.
+    kvv : ndarray
+        The (n_electrodes, n_electrodes) capacitance matrix.
+    resistance : float or ndarray
+        The resistance of the shunt of each electrode in Ohm.
+    n_modes : int
+        The number of modes.
+    factor : microfem.Factorization
+        The factorization of (k).
+    n_basis : int
+        The number of short-circuit modes in the reduced basis. Defaults to
+        twice the number of modes, and at least ten more.
+
+    Returns
+    -------
+    w : ndarray
+        The complex eigenvalues, -s^2 for the poles (s) of the modes in order
+        of increasing frequency. np.sqrt(w) is wd + i zeta wn, where (wd) is
+        the damped natural frequency in rad/s, (wn) the undamped natural
+        frequency and (zeta) the damping ratio.
+    v : ndarray
+        The complex mode shapes of the free DOFs, scaled to unit mass and
+        rotated so that the largest entry of the reduced coordinates is real.
+    """
+    kuv = np.asarray(kuv, dtype=float).reshape(k.shape[0], -1)
+    kvv = np.atleast_2d(kvv)
+    n_electrodes = kuv.shape[1]
+    if resistance is None:
+        raise ValueError('The shunt resistance is required.')
+    resistance = np.broadcast_to(np.asarray(resistance, dtype=float),
+                                 (n_electrodes,))
+    if not np.all(np.isfinite(resistance)):
+        raise ValueError('The shunt resistance must be finite, use open-'
+                         'circuit modes for an infinite resistance.')
+    if np.any(resistance <= 0):
+        raise ValueError('The shunt resistance must be positive, use short-'
+                         'circuit modes for a resistance of zero.')
+    if n_basis is None:
+        n_basis = max(2 * n_modes, n_modes + 10)
+    n_basis = min(n_basis, k.shape[0] - n_electrodes - 2)
+
+    # The Ritz basis of short-circuit modes and static voltage responses,
+    # made M-orthonormal with any linearly dependent directions removed.
+    _, phi = solve_modes(k, m, n_basis, factor=factor)
+    basis = np.hstack((phi, factor.solve(kuv).reshape(kuv.shape)))
+    basis = basis / np.sqrt(np.einsum('ij,ij->j', basis, m @ basis))
+    d, e = np.linalg.eigh(basis.T @ (m @ basis))
+    keep = d > 1e-10 * np.max(d)
+    basis = basis @ (e[:, keep] / np.sqrt(d[keep]))
+    wr, x = np.linalg.eigh(basis.T @ (k @ basis))
+    psi = basis @ x
+    theta = psi.T @ kuv
+
+    # The state-space model of the modal coordinates (q, q') and voltages.
+    nr = len(wr)
+    cinv = np.linalg.inv(kvv)
+    conductance = np.diag(1 / resistance)
+    a = np.zeros((2 * nr + n_electrodes, 2 * nr + n_electrodes))
+    a[:nr, nr:2 * nr] = np.eye(nr)
+    a[nr:2 * nr, :nr] = -np.diag(wr)
+    a[nr:2 * nr, 2 * nr:] = -theta
+    a[2 * nr:, nr:2 * nr] = cinv @ theta.T
+    a[2 * nr:, 2 * nr:] = -cinv @ conductance
+    s, y = scipy.linalg.eig(a)
+
+    # Keep one pole of each oscillatory pair, the electrical poles are real.
+    scale = np.max(np.abs(s))
+    oscillatory = np.flatnonzero(s.imag > 1e-9 * scale)
+    order = oscillatory[np.argsort(np.abs(s[oscillatory]))][:n_modes]
+    q = y[:nr, order]
+    q = q / np.linalg.norm(q, axis=0)
+    peak = q[np.argmax(np.abs(q), axis=0), np.arange(q.shape[1])]
+    q = q * (np.abs(peak) / peak)
+    return -s[order] ** 2, psi @ q
@@ -0,0 +1,94 @@
+import numpy as np
+import scipy.sparse as sparse
+
+from .solvers import factorize
+
+
+def frequency_response(fem, freqs, load, outputs, n_modes=20, zeta=0.0,
+                       rayleigh=None, method='modal'):
+    """Computes the steady state response of the (outputs) to the harmonic
+    (load) of the plate or laminate (fem) at the frequencies (freqs). The
+    equations of motion of the free DOFs are
+
+        (K + i w C - w^2 M) u = f
+
+    where the damping matrix is C = alpha M + beta K for the Rayleigh
+    damping (rayleigh) = (alpha, beta).
+
+    If (method) is 'modal', the response is the superposition of the lowest
+    (n_modes) modes with the damping ratio (zeta) of each mode plus the
+    Rayleigh damping ratio alpha / (2 wn) + beta wn / 2. The static response
+    of the truncated modes, K^-1 f - sum(phi phi' f / wn^2), is added as a
+    residual, so the response is exact at zero frequency and accurate below
+    the highest mode. The modes and the residual are found once, so each
+    frequency only costs a small dense product.
+
+    If (method) is 'direct', the complex dynamic stiffness is factorized and
+    solved at each frequency with the solver backend of the (fem), which is
+    exact but only supports Rayleigh damping. It is intended to validate the
+    modal response.
+
+    Parameters
+    ----------
+    fem : microfem.PlateFEM or microfem.LaminateFEM
+        The finite element model.
+    freqs : ndarray
+        The frequencies in Hz.
+    load : ndarray
+        The (n_mdof,) load vector of all DOFs, or an (n_mdof, n_loads) array
+        of load vectors.
+    outputs : scipy.sparse matrix or ndarray
+        The (n_outputs, n_mdof) operator of the outputs, such as the operator
+        of a `LaminateDisplacement`.
+    n_modes : int
+        The number of modes of the modal response.
+    zeta : float or ndarray
+        The modal damping ratio, or the ratio of each mode.
+    rayleigh : tuple
+        The coefficients (alpha, beta) of the Rayleigh damping.
+    method : string
+        'modal' or 'direct'.
+
+    Returns
+    -------
+    h : ndarray
+        The complex response of shape (n_freqs, n_outputs), or
+        (n_freqs, n_outputs, n_loads) for an array of load vectors.
+    """
+    if method not in ('modal', 'direct'):
+        raise ValueError('Unknown frequency response method %s.' % method)
+    load = load.toarray() if sparse.issparse(load) else np.asarray(load)
+    single = load.ndim == 1
+    prolongation = fem.dof.prolongation
+    f = prolongation.restrict_rows(load.reshape(load.shape[0], -1))
+    if not sparse.issparse(outputs):
+        outputs = np.atleast_2d(outputs)
+    c = prolongation.restrict_rows(outputs.T).T
+    omega = 2 * np.pi * np.atleast_1d(np.asarray(freqs, dtype=float))
+    alpha, beta = (0.0, 0.0) if rayleigh is None else rayleigh
+
+    if method == 'modal':
+        w, v, _ = fem.modal_analysis(n_modes, expand=False)
+        wn = np.sqrt(w)
+        ratio = zeta + 0.5 * alpha / wn + 0.5 * beta * wn
+        modal_load = v.T @ f
+        modal_out = c @ v
+        residual = c @ fem.factorize_stiffness().solve(f).reshape(f.shape)
+        residual = residual - modal_out @ (modal_load / w[:, None])
+        d = (w - omega[:, None] ** 2 +
+             2j * ratio * wn * omega[:, None])
+        h = np.einsum('om,fm,mi->foi', modal_out, 1 / d, modal_load,
+                      optimize=True)
+        h += residual
+    else:
+        if np.any(zeta != 0):
+            raise ValueError('Modal damping is only supported by the modal '
+                             'frequency response.')
+        k = fem.get_stiffness_matrix(free=True)
+        m = fem.get_mass_matrix(free=True)
+        h = np.zeros((len(omega), c.shape[0], f.shape[1]), dtype=complex)
+        for i, wi in enumerate(omega):
+            a = (1 + 1j * wi * beta) * k + (1j * wi * alpha - wi ** 2) * m
+            factor = factorize(a, fem.solver, symmetric=True)
+            h[i] = c @ factor.solve(f).reshape(f.shape)
+    return h[:, :, 0] if single else h
@@ -0,0 +1,122 @@
+import numpy as np
+import scipy.sparse as sparse
+
+
+# The elastic matrices of the layers have this structure, with the entries
+# c11, c12, c44 and c66 in the positions marked 1, 2, 3 and 4 respectively.
+_ELASTIC_PATTERN = np.array([[1, 2, 0, 0, 0],
+                             [2, 1, 0, 0, 0],
+                             [0, 0, 3, 0, 0],
+                             [0, 0, 0, 3, 0],
+                             [0, 0, 0, 0, 4]])
+
+# The piezoelectric coefficients of the layers have this structure.
+_PIEZO_PATTERN = np.array([[1], [1], [0], [0], [0]])
+
+
+class AffineLaminate(object):
+    """The system matrices of a laminate are linear in the coefficient
+    matrices (cs1, cs2, cs3), (ce1, ce2), (cc) and (cm0, cm1, cm2) that are
+    summed over the layers of the laminate. For a fixed mesh and element
+    dimensions, this class assembles the global matrix of each unit
+    coefficient once. The system matrices of any layer stack, that is any
+    thicknesses, moduli, densities and piezoelectric layer, are then a linear
+    combination of these global matrices and require no element integration
+    or assembly.
+
+    Each coefficient matrix is decomposed into the entries c11, c12, c44 and
+    c66 of an isotropic layer, so kuu is a combination of twelve matrices,
+    muu of three, kuv of two, and kvv of one.
+    """
+
+    def __init__(self, fem):
+        """
+        Parameters
+        ----------
+        fem : microfem.LaminateFEM
+            The FEM defining the topology and element dimensions.
+        """
+        self._fem = fem
+        zero_cs = np.zeros((5, 5))
+        zero_ce = np.zeros((5, 1))
+
+        def basis(cs=(zero_cs,) * 3, ce=(zero_ce,) * 2, cc=0, cm=(0, 0, 0)):
+            params = (cs[0], cs[1], cs[2], ce[0], ce[1], cc, cm[0], cm[1],
+                      cm[2])
+            stacks = zip(*[m.element_matrices(params, 1) for m in fem.models])
+            return fem.assemble_elements(*[np.array(x) for x in stacks])
+
+        k_basis = []
+        for i in range(3):
+            for t in range(1, 5):
+                cs = [zero_cs] * 3
+                cs[i] = (_ELASTIC_PATTERN == t).astype(float)
+                k_basis.append(basis(cs=cs)[1])
+        m_basis = [basis(cm=np.eye(3)[i])[0] for i in range(3)]
+        p_basis = [basis(ce=[_PIEZO_PATTERN * (i == j) for j in range(2)])[2]
+                   for i in range(2)]
+        c_basis = [basis(cc=1)[3]]
+
+        self._templates = [k_basis[0], m_basis[0], p_basis[0], c_basis[0]]
+        self._data = [np.column_stack([b.data for b in bs])
+                      for bs in (k_basis, m_basis, p_basis, c_basis)]
+
+
+    def coefficients(self, material):
+        """Returns the coefficients of the stiffness, mass, piezoelectric and
+        capacitance basis matrices for a laminate material.
+        """
+        cs1, cs2, cs3, ce1, ce2, cc, cm0, cm1, cm2 = material.get_fem_parameters()
+        be = 1 / material.he
+
+        kc = np.concatenate([_decompose(cs, _ELASTIC_PATTERN, 4)
+                             for cs in (cs1, cs2, cs3)])
+        mc = np.array([cm0, cm1, cm2], dtype=float)
+        pc = np.concatenate([_decompose(ce, _PIEZO_PATTERN, 1) * be
+                             for ce in (ce1, ce2)])
+        cc = np.array([cc], dtype=float)
+        return kc, mc, pc, cc
+
+
+    def assemble(self, material):
+        """Returns the system mass, stiffness, piezoelectric, and capacitance
+        matrices (muu, kuu, kuv, kvv) of the topology for a laminate material.
+        """
+        kc, mc, pc, cc = self.coefficients(material)
+        kuu, muu, kuv, kvv = [self._combine(i, c) for i, c in
+                              enumerate((kc, mc, pc, cc))]
+        return muu, kuu, kuv, kvv
+
+
+    def apply(self, material):
+        """Replaces the material of the FEM with a laminate material. The 
+        system matrices are combined from the basis matrices, and only the 
+        element models of the FEM are recreated, which takes a few 
+        milliseconds, so later assemblies, electrode changes and field 
+        recovery use the new material.
+        """
+        fem = self._fem
+        fem._set_models(material)
+        fem.muu, fem.kuu, fem.kuv, fem.kvv = self.assemble(material)
+
+
+    def _combine(self, index, coefficients):
+
+        template = self._templates[index]
+        data = self._data[index] @ coefficients
+        return sparse.csr_matrix((data, template.indices, template.indptr),
+                                 shape=template.shape)
+
+
+def _decompose(matrix, pattern, n_terms):
+    """Returns the entry of (matrix) at each of the terms 1..n_terms of the
+    (pattern). Raises an error if the matrix doesn't have the structure of
+    the pattern.
+    """
+    terms = np.zeros(n_terms)
+    for t in range(1, n_terms + 1):
+        terms[t - 1] = matrix[pattern == t][0]
+    rebuilt = sum(v * (pattern == t) for t, v in enumerate(terms, 1))
+    if not np.allclose(rebuilt, matrix, rtol=1e-12, atol=0):
+        raise ValueError('The laminate is not made of isotropic layers.')
+    return terms
@@ -1,13 +1,30 @@
 import numpy as np
+from .constraints import Prolongation
+from .shapes import element_shapes, element_nodes
 
 
 class LaminateDOF(object):
     
-    def __init__(self, mesh):
+    def __init__(self, mesh, element='q4', electrodes=None):
+        """
+        Parameters
+        ----------
+        mesh : microfem.UniformMesh
+            The mesh of the cantilever.
+        element : string
+            The element type, see `element_shapes`. Quadratic elements add 
+            DOF nodes at the sides and center of each element.
+        electrodes : ndarray
+            The electrode layout, see `set_electrodes`. Defaults to a single 
+            electrode covering every element.
+        """
         
         self.mesh = mesh
-        self.dof_nodes = [LaminateNode(n) for n in mesh.nodes]
-        self.dof_elements = [LaminateElement(e, self.dof_nodes) for e in mesh.elements]
+        self.shapes = element_shapes(element)
+        nodes, connectivity = element_nodes(mesh, self.shapes)
+        self.dof_nodes = [LaminateNode(n) for n in nodes]
+        self.dof_elements = [LaminateElement(e, self.dof_nodes, c) 
+                             for e, c in zip(mesh.elements, connectivity)]
         
         ads = [n.mechanical_dof for n in self.dof_nodes]
         fds = [n.mechanical_dof for n in self.dof_nodes if n.boundary == True]
@@ -15,18 +32,73 @@ class LaminateDOF(object):
         self.all_dofs = np.concatenate(ads)
         self.fixed_dofs = np.concatenate(fds)
         self.free_dofs = np.setdiff1d(self.all_dofs, self.fixed_dofs)
+        
+        # The free DOFs exclude those of hanging nodes, which are constrained.
+        node_dofs = np.array([n.mechanical_dof for n in self.dof_nodes])
+        self.prolongation = Prolongation(len(self.all_dofs), self.free_dofs, 
+                                         node_dofs, mesh.constraints)
+        self.free_dofs = self.prolongation.free_dofs
 
         self.n_mdof = len(self.all_dofs)
-        self.n_edof = 1
         self.n_elem = len(self.dof_elements)
         
+        # The mechanical DOFs of each element as an (n_elem, 5 n_nodes) array.
+        emds = [e.mechanical_dof for e in self.dof_elements]
+        n_edof = 5 * self.shapes.n_nodes
+        self.element_mdofs = np.array(emds, dtype=int).reshape(-1, n_edof)
+        
+        # The deflection DOF of each node of the mesh.
+        dds = [n.deflection_dof for n in self.dof_nodes[:mesh.n_node]]
+        self.deflection_dofs = np.array(dds, dtype=int)
+        
+        if electrodes is None:
+            electrodes = np.zeros(mesh.shape, dtype=int)
+        self.set_electrodes(electrodes)
+        
+        
+    def set_electrodes(self, electrodes):
+        """Sets the electrode layout from an array of the shape of the 
+        topology, with the electrode of each element numbered from 0, or -1 
+        for an element without an electrode. Each electrode has one 
+        electrical DOF, its voltage, with the same number as the electrode. 
+        The elements of an adaptive mesh must each lie on a single electrode.
+        
+        This sets (electrodes), the electrode of each element, 
+        (element_edofs), the same as an (n_elem, 1) array, and (n_edof), the
+        number of electrodes.
+        """
+        electrodes = np.asarray(electrodes, dtype=int)
+        if electrodes.shape != self.mesh.shape:
+            raise ValueError('The electrodes do not match the shape of the '
+                             'mesh.')
+        merged = [e for e in self.mesh.elements if e.size > 1]
+        for e in merged:
+            block = electrodes[e.i:e.i + e.size, e.j:e.j + e.size]
+            if np.any(block != block[0, 0]):
+                raise ValueError('An element lies on several electrodes.')
+        
+        patch = self.mesh.domain2array(electrodes)
+        n_edof = np.max(patch) + 1 if len(patch) > 0 else 0
+        missing = np.setdiff1d(np.arange(n_edof), patch)
+        if n_edof < 1 or len(missing) > 0 or np.min(patch) < -1:
+            raise ValueError('The electrodes must be numbered 0 to n - 1 '
+                             'with at least one element each.')
+        
+        self.electrodes = patch
+        self.n_edof = int(n_edof)
+        self.element_edofs = patch.reshape(-1, 1)
+        for e, p in zip(self.dof_elements, patch):
+            e.electrical_dof = np.array([p])
+        
         
 class LaminateElement(object):
     
-    def __init__(self, element, dof_nodes):
+    def __init__(self, element, dof_nodes, node_indices=None):
 
         self.element = element
-        self.dof_nodes = [dof_nodes[n.index] for n in element.nodes]
+        if node_indices is None:
+            node_indices = [n.index for n in element.nodes]
+        self.dof_nodes = [dof_nodes[i] for i in node_indices]
         
         mds = [n.mechanical_dof for n in self.dof_nodes]
         self.mechanical_dof = np.concatenate(mds)
@@ -43,6 +115,14 @@ class LaminateElement(object):
 
 
 class LaminateNode(object):
+    """
+    Laminates have five mechanical DOFs per node.
+    
+    The mirror parity is the sign each DOF takes under a reflection about a 
+    line of constant x, for a displacement field symmetric about that line.
+    """
+    
+    mirror_parity = np.array([-1, 1, 1, 1, -1])
     
     def __init__(self, node):
         
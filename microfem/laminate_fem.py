@@ -1,22 +1,97 @@
 import numpy as np
 import scipy.sparse as sparse
-import scipy.sparse.linalg as linalg
 
-from .mesh import UniformMesh
+from .mesh import UniformMesh, QuadtreeMesh
+from .analysis_symmetry import MirrorSymmetry, is_mirror_symmetric
+from .spectrum import solve_band
+from .solvers import factorize, solve_modes, LowRankUpdate
+from .constraints import ModeShapes
+from .electrical import shunt_modes
+from .harmonic import frequency_response
+from .reduction import krylov_reduction
+from .assembly import SparseAssembler, element_values
 from .laminate_model import LaminateModel
 from .laminate_dof import LaminateDOF
+from .analysis_laminate_displacement import LaminateDisplacement
 
 
 class LaminateFEM(object):
 
-    def __init__(self, material, cantilever):
+    def __init__(self, material, cantilever, full_grid=False, 
+                 ersatz_stiffness=1e-6, ersatz_mass=1e-9, threads=None,
+                 adaptive=False, max_size=2, element='q4', solver='auto',
+                 electrodes=None):
+        """
+        Parameters
+        ----------
+        material : microfem.LaminateMaterial
+            The layers of the laminate.
+        cantilever : microfem.Cantilever
+            The topology and element dimensions of the cantilever.
+        full_grid : bool
+            If True, every node of the rectangular grid keeps a fixed DOF 
+            number and the void elements are modelled with an ersatz material.
+            The sparsity pattern and free DOFs then don't depend on the 
+            topology, see `update_topology`.
+        ersatz_stiffness : float
+            The relative stiffness, piezoelectric coupling and capacitance of 
+            void elements in a full grid model.
+        ersatz_mass : float
+            The relative mass of void elements in a full grid model. It should
+            be much smaller than the ersatz stiffness to push the local modes
+            of the void regions well above the modes of the structure.
+        threads : int
+            The number of threads used to assemble the system matrices. The
+            matrices are bit-identical for any number of threads.
+        adaptive : bool
+            If True, uniform solid blocks of the topology are merged into 
+            larger elements, see `QuadtreeMesh`.
+        max_size : int
+            The largest element width of an adaptive mesh. The elements are
+            bilinear, so large elements are too stiff. For the laminate 
+            example, a width of 2 keeps the lowest six frequencies within 1% 
+            of the uniform mesh with a quarter of the DOFs, while widths of 4
+            and 8 give errors of up to 5% and 14%.
+        element : string
+            The element type, 'q4' (4-node bilinear), 'q8' (8-node 
+            serendipity) or 'q9' (9-node Lagrange), see `element_shapes`. The
+            quadratic elements converge much faster with mesh refinement, see
+            examples/benchmark_elements.py.
+        solver : string
+            The sparse direct solver backend, see `factorize`. If 'auto', the
+            fastest installed backend for the stiffness matrix is chosen.
+        electrodes : ndarray
+            The electrode of each element of the topology, numbered from 0, 
+            or -1 for no electrode, see `set_electrodes`. Defaults to one 
+            electrode over the whole cantilever. An adaptive mesh only merges
+            elements on the same electrode.
+        """
+        
+        if adaptive is True and full_grid is True:
+            raise ValueError('An adaptive mesh cannot be a full grid.')
+        if adaptive is True and element != 'q4':
+            raise ValueError('Adaptive meshes only support q4 elements.')
         
         self.cantilever = cantilever
-        self.mesh = UniformMesh(cantilever.topology)
-        self.dof = LaminateDOF(self.mesh)
-        self.model = LaminateModel(material, cantilever.a, cantilever.b)
+        self.ersatz_stiffness = ersatz_stiffness
+        self.ersatz_mass = ersatz_mass
+        if adaptive is True:
+            fields = () if electrodes is None else (electrodes,)
+            self.mesh = QuadtreeMesh(cantilever.topology, max_size, fields)
+        else:
+            self.mesh = UniformMesh(cantilever.topology, full_grid)
+        self.element = element
+        self.dof = LaminateDOF(self.mesh, element, electrodes)
         self.a = cantilever.a
         self.b = cantilever.b
+        self._sizes, self._kinds = np.unique(self.mesh.element_size, 
+                                             return_inverse=True)
+        self._set_models(material)
+        self.threads = threads
+        self.solver = solver
+        self._factor = None
+        self._assemblers = self._scatter_maps()
+        self._set_densities(cantilever.topology)
         self.assemble()
         
     
@@ -25,7 +100,7 @@ class LaminateFEM(object):
         muu = self.muu.tocsr()
         if free is False:
             return muu
-        return muu[self.dof.free_dofs, :][:, self.dof.free_dofs]
+        return self.dof.prolongation.restrict(muu)
 
     
     def get_stiffness_matrix(self, free=False):
@@ -33,7 +108,7 @@ class LaminateFEM(object):
         kuu = self.kuu.tocsr()
         if free is False:
             return kuu
-        return kuu[self.dof.free_dofs, :][:, self.dof.free_dofs]
+        return self.dof.prolongation.restrict(kuu)
     
     
     def get_piezoelectric_matrix(self, free=False):
@@ -41,87 +116,405 @@ class LaminateFEM(object):
         kuv = self.kuv.tocsr()
         if free is False:
             return kuv
-        return kuv[self.dof.free_dofs, :]
+        return self.dof.prolongation.restrict_rows(kuv)
     
     
     def get_capacitance_matrix(self):
         return self.kvv
         
         
-    def modal_analysis(self, n_modes):
+    def modal_analysis(self, n_modes=None, symmetric=False, f_min=None, 
+                       f_max=None, n_slices=None, processes=None, 
+                       expand=True, out=None, electrical='short', 
+                       resistance=None):
         """The return value (w) are the eigenvalues and the return value (v) 
         are the eigenvectors.
+        
+        The (electrical) boundary condition of the electrodes is 'short' 
+        (zero voltage), 'open' (zero charge) or 'shunt' (a resistor of 
+        (resistance) Ohm on each electrode). Open electrodes add the rank 
+        n_electrodes stiffness Kuv Kvv^-1 Kuv', which is applied as a low rank
+        update of the factorization of the stiffness matrix, see 
+        `LowRankUpdate`. The modes of shunted electrodes are damped, so (w)
+        and (v) are complex, see `shunt_modes`. The symmetric and band solves
+        only support short-circuit modes.
+        
+        If (symmetric) is True, the modes of a mirror symmetric cantilever are
+        found from two half-size eigenproblems, see `MirrorSymmetry`. If 
+        (symmetric) is 'auto' this is done when the topology is symmetric and
+        the mesh has no hanging nodes.
+        
+        If (f_max) is given, all the modes with a frequency in the band 
+        [f_min, f_max] Hz are returned instead of the lowest (n_modes). The 
+        band is split into (n_slices) slices that are solved on (processes)
+        worker processes, see `solve_band`.
+        
+        The mode shapes of all DOFs (vall) are selected by (expand), see 
+        `Prolongation.expand`. If False (vall) is None, if 'lazy' it is a 
+        `ModeShapes` view that is expanded on access, and if True it is a 
+        dense array, written to (out) if given, such as an np.memmap of shape
+        (n_mdof, n_modes).
         """
-        m = self.muu.tocsc()[self.dof.free_dofs, :][:, self.dof.free_dofs]
-        k = self.kuu.tocsc()[self.dof.free_dofs, :][:, self.dof.free_dofs]
-        w, v = linalg.eigsh(k, k=n_modes, M=m, sigma=0, which='LM')
-        vall = np.zeros((self.dof.n_mdof, n_modes))
-        vall[self.dof.free_dofs, :] = v
+        if n_modes is None and f_max is None:
+            raise ValueError('Either n_modes or f_max is required.')
+        if electrical not in ('short', 'open', 'shunt'):
+            raise ValueError('Unknown electrical boundary %s.' % electrical)
+        if electrical != 'short':
+            if symmetric is True or f_max is not None:
+                raise ValueError('Only short-circuit modes support symmetric '
+                                 'and band solves.')
+            symmetric = False
+        
+        if symmetric == 'auto':
+            symmetric = (self.dof.prolongation.constrained is False and
+                         is_mirror_symmetric(self.mesh))
+        if symmetric is True:
+            symmetry = MirrorSymmetry(self)
+            w, v, vall, _ = symmetry.modal_analysis(n_modes, expand, out, 
+                                                    f_min, f_max, n_slices,
+                                                    processes)
+            return w, v, vall
+        
+        m = self.get_mass_matrix(free=True).tocsc()
+        k = self.get_stiffness_matrix(free=True).tocsc()
+        if f_max is not None:
+            f_min = 0 if f_min is None else f_min
+            w, v = solve_band(k, m, f_min, f_max, n_slices, processes, 
+                              self.solver)
+        elif electrical == 'short':
+            factor = self.factorize_stiffness()
+            w, v = solve_modes(k, m, n_modes, factor=factor)
+        elif electrical == 'open':
+            kuv = self.get_piezoelectric_matrix(free=True).toarray()
+            kvv = self.get_capacitance_matrix().toarray()
+            factor = LowRankUpdate(self.factorize_stiffness(), kuv, kvv)
+            w, v = solve_modes(factor.matrix_operator(k), m, n_modes, 
+                               factor=factor)
+        else:
+            kuv = self.get_piezoelectric_matrix(free=True).toarray()
+            kvv = self.get_capacitance_matrix().toarray()
+            w, v = shunt_modes(k, m, kuv, kvv, resistance, n_modes, 
+                               self.factorize_stiffness())
+        vall = self.dof.prolongation.expand(v, expand, out)
         return w, v, vall
+
+
+    def modal_metrics(self, n_modes=None, tip=None, modes=None, **options):
+        """Runs the modal analysis and returns the metrics of each mode as a
+        structured array with the fields 'freq' (Hz), 'tip' (the deflection
+        of the mode shape at the tip), 'stiffness' (N/m), 'charge' (C/m, an
+        array of the electrodes if there are several) and 'flexural'. The 
+        modal stiffness and charge are normalized to unit tip deflection, so
+        they are NaN for modes that barely deflect the tip, such as the 
+        torsional modes of a symmetric cantilever and in-plane modes. A 
+        mode is flexural if the deflection has the same sign 1 um either side
+        of the tip, see `ModeIdentification`.
+
+        All the metrics are computed for blocks of mode shapes with a few 
+        sparse-dense products, so many modes cost little more than one, and
+        the mode shapes of all DOFs are never held at once, see `ModeShapes`.
+
+        Parameters
+        ----------
+        n_modes : int
+            The number of modes.
+        tip : tuple
+            The coordinates (x, y) of the tip in um. Defaults to the tip of
+            the cantilever.
+        modes : tuple
+            The eigenvalues and eigenvectors (w, v) of an earlier modal 
+            analysis, whose metrics are computed without solving again.
+        options :
+            Passed to `modal_analysis`, for example symmetric='auto'.
+        """
+        if options.get('electrical') == 'shunt':
+            raise ValueError('The metrics of damped modes are not supported.')
+        if modes is None:
+            w, _, vall = self.modal_analysis(n_modes, expand='lazy', **options)
+        else:
+            w, vall = modes[0], ModeShapes(self.dof.prolongation, modes[1])
+        if tip is None:
+            tip = (self.cantilever.xtip, self.cantilever.ytip)
+        x, y = tip
+        points = ((x, y), (x - 1, y), (x + 1, y))
+        opr = sparse.vstack([LaminateDisplacement(self, p).get_operator()
+                             for p in points])
+        kuu = self.get_stiffness_matrix()
+        kuv = self.get_piezoelectric_matrix()
+
+        # The mode shapes are expanded and reduced one block at a time.
+        disp = np.zeros((3, len(w)))
+        peak = np.zeros(len(w))
+        energy = np.zeros(len(w))
+        charge = np.zeros((len(w), kuv.shape[1]))
+        for cols, block in vall.blocks():
+            disp[:, cols] = opr @ block
+            peak[cols] = np.abs(block[self.dof.deflection_dofs]).max(axis=0)
+            energy[cols] = np.einsum('im,im->m', block, kuu @ block)
+            charge[cols] = (kuv.T @ block).T
+
+        # The metrics normalized by a negligible tip deflection are NaN. The 
+        # charge is an array of the electrodes if there are several.
+        scale = np.where(np.abs(disp[0]) > 1e-6 * peak, disp[0], np.nan)
+        charge = charge / scale[:, None]
+        charge = charge[:, 0] if kuv.shape[1] == 1 else charge
+        dtype = [('freq', float), ('tip', float), ('stiffness', float),
+                 ('charge', float, charge.shape[1:]), ('flexural', bool)]
+        metrics = np.zeros(len(w), dtype=dtype)
+        metrics['freq'] = np.sqrt(w) / (2 * np.pi)
+        metrics['tip'] = disp[0]
+        metrics['stiffness'] = energy / scale ** 2
+        metrics['charge'] = charge
+        metrics['flexural'] = np.sign(disp[1]) == np.sign(disp[2])
+        return metrics
+
+
+    def frequency_response(self, freqs, load=None, voltage=None, 
+                           outputs=None, n_modes=20, zeta=0.0, rayleigh=None,
+                           method='modal'):
+        """Returns the complex response of the (outputs) to a harmonic (load)
+        of all DOFs and (voltage) on the electrodes at the frequencies (freqs)
+        in Hz, see `frequency_response`. The electrodes are driven by the 
+        voltage, one value for each electrode or a scalar for all of them, 
+        which adds the load -Kuv V. The electrodes are short-circuited if 
+        only a load is given. An (n_electrodes, n_loads) voltage array gives
+        a response for each column, such as np.eye(n_electrodes) for the 
+        response to each electrode.
+
+        Parameters
+        ----------
+        freqs : ndarray
+            The frequencies in Hz.
+        load : ndarray
+            The load vector of all DOFs, or an (n_mdof, n_loads) array.
+        voltage : float or ndarray
+            The voltage amplitude of the electrodes in V.
+        outputs : scipy.sparse matrix
+            The (n_outputs, n_mdof) operator of the outputs. Defaults to the
+            deflection at the tip, see `LaminateDisplacement`.
+        n_modes : int
+            The number of modes of the modal response.
+        zeta : float or ndarray
+            The modal damping ratio, or the ratio of each mode.
+        rayleigh : tuple
+            The coefficients (alpha, beta) of the Rayleigh damping
+            alpha M + beta K.
+        method : string
+            'modal' for modal superposition with a static residual, or 
+            'direct' to solve the full system at each frequency.
+
+        Returns
+        -------
+        h : ndarray
+            The complex response of shape (n_freqs, n_outputs), or 
+            (n_freqs, n_outputs, n_loads) for several loads.
+        """
+        if load is None and voltage is None:
+            raise ValueError('A load or voltage is required.')
+        if voltage is not None:
+            kuv = self.get_piezoelectric_matrix()
+            voltage = np.asarray(voltage, dtype=float)
+            if voltage.ndim == 0:
+                voltage = np.broadcast_to(voltage, kuv.shape[1:])
+            drive = -(kuv @ voltage)
+            load = drive if load is None else load + drive
+        if outputs is None:
+            tip = (self.cantilever.xtip, self.cantilever.ytip)
+            outputs = LaminateDisplacement(self, tip).get_operator()
+        return frequency_response(self, freqs, load, outputs, n_modes, zeta,
+                                  rayleigh, method)
+
+
+    def reduced_model(self, n_moments=8, expansion_freqs=(0.0,), 
+                      outputs=None):
+        """Returns a reduced order model of the transfer function from the 
+        voltage of each electrode to the (outputs), which default to the 
+        deflection at the tip, see `LaminateDisplacement`. The model matches
+        (n_moments) moments about each of the (expansion_freqs) in Hz, see 
+        `krylov_reduction`, and its transfer function is evaluated at any 
+        frequency with `ReducedModel.transfer`. The electrodes are driven by
+        the voltage, so the load is -Kuv V.
+        """
+        if outputs is None:
+            tip = (self.cantilever.xtip, self.cantilever.ytip)
+            outputs = LaminateDisplacement(self, tip).get_operator()
+        kuv = self.get_piezoelectric_matrix()
+        return krylov_reduction(self, -kuv, outputs, n_moments, 
+                                expansion_freqs)
+
+
+    def factorize_stiffness(self):
+        """Returns the factorization of the stiffness matrix of the free DOFs,
+        see `factorize`. It is computed once for each assembly and shared by
+        the modal analysis and static solves.
+        """
+        if self._factor is None or self._factor[0] is not self.kuu:
+            k = self.get_stiffness_matrix(free=True)
+            factor = factorize(k, self.solver, definite=True)
+            self._factor = (self.kuu, factor)
+        return self._factor[1]
+
+
+    def __getstate__(self):
+        """The cached factorization of the stiffness matrix isn't copied or 
+        pickled, such as for the workers of a `ParameterSweep`, and is 
+        recomputed when it is next needed.
+        """
+        state = self.__dict__.copy()
+        state['_factor'] = None
+        return state
+
+
+    def update_topology(self, topology):
+        """Changes the topology of a full grid model. Only the values of the 
+        system matrices change, the DOF numbering and sparsity are retained.
+        """
+        self.mesh.update_domain(topology)
+        self._set_densities(topology)
+        self.assemble()
+        
+        
+    def update_model(self, material=None, a=None, b=None):
+        """Changes the material or element dimensions. Only the element 
+        matrices are recomputed, and their values are scattered into the 
+        system matrices through the existing maps.
+        """
+        self.a = self.a if a is None else a
+        self.b = self.b if b is None else b
+        self._set_models(self.material if material is None else material)
+        self.assemble()
+        
         
-    
     def assemble(self):
         """The mass, stiffness, piezoelectric, and capacitance matricies are 
         assembled in this function.
         """
-        muue = self.model.get_mass_element()
-        kuue = self.model.get_stiffness_element()
-        kuve = self.model.get_piezoelectric_element()
-        kvve = self.model.get_capacitance_element()
-        
-        nm, ne = kuve.shape
-        
-        k_num = nm * nm * self.mesh.n_elem
-        p_num = nm * ne * self.mesh.n_elem
-        c_num = ne * ne * self.mesh.n_elem
-        
-        k_index = list(np.ndindex(nm, nm))
-        p_index = list(np.ndindex(nm, ne))
-        c_index = list(np.ndindex(ne, ne))
-        
-        k_row = np.zeros(k_num)
-        k_col = np.zeros(k_num)
-        k_val = np.zeros(k_num)
-        m_val = np.zeros(k_num)
-        p_row = np.zeros(p_num)
-        p_col = np.zeros(p_num)
-        p_val = np.zeros(p_num)
-        c_row = np.zeros(c_num)
-        c_col = np.zeros(c_num)
-        c_val = np.zeros(c_num)
-        
-        k_ntriplet = 0
-        p_ntriplet = 0
-        c_ntriplet = 0
-        
-        for ni, e in enumerate(self.dof.dof_elements):
-            
-            for ii, jj in k_index:
-                k_row[k_ntriplet] = e.mechanical_dof[ii]
-                k_col[k_ntriplet] = e.mechanical_dof[jj]
-                k_val[k_ntriplet] = kuue[ii, jj]
-                m_val[k_ntriplet] = muue[ii, jj]
-                k_ntriplet += 1
-            
-            for ii, jj in p_index:
-                p_row[p_ntriplet] = e.mechanical_dof[ii]
-                p_col[p_ntriplet] = e.electrical_dof[jj]
-                p_val[p_ntriplet] = kuve[ii, jj]
-                p_ntriplet += 1
-            
-            for ii, jj in c_index:
-                c_row[c_ntriplet] = e.electrical_dof[ii]
-                c_col[c_ntriplet] = e.electrical_dof[jj]
-                c_val[c_ntriplet] = kvve[ii, jj]
-                c_ntriplet += 1
-        
-        muu_shape = (self.dof.n_mdof, self.dof.n_mdof)
+        muue = np.array([m.get_mass_element() for m in self.models])
+        kuue = np.array([m.get_stiffness_element() for m in self.models])
+        kuve = np.array([m.get_piezoelectric_element() for m in self.models])
+        kvve = np.array([m.get_capacitance_element() for m in self.models])
+        matrices = self.assemble_elements(muue, kuue, kuve, kvve)
+        self.muu, self.kuu, self.kuv, self.kvv = matrices
+        
+        
+    def assemble_elements(self, muue, kuue, kuve, kvve):
+        """Returns the system mass, stiffness, piezoelectric, and capacitance
+        matrices for the given element matrices. The matrices are scaled by 
+        the element densities and have the same sparsity for any values.
+        
+        The element matrices are stacks with one matrix for each element 
+        model in `models`. A single matrix may be given for uniform meshes.
+        """
+        k_map = self._assemblers[0]
+        muue, kuue = [np.reshape(x, (-1,) + np.shape(x)[-2:]) 
+                      for x in (muue, kuue)]
+        k_val = element_values(self._xk, kuue, self.threads, self._kinds)
+        m_val = element_values(self._xm, muue, self.threads, self._kinds)
+        muu = k_map.assemble(m_val, self.threads)
+        kuu = k_map.assemble(k_val, self.threads)
+        kuv, kvv = self._assemble_electrodes(kuve, kvve)
+        return muu, kuu, kuv, kvv
+    
+    
+    def set_electrodes(self, electrodes):
+        """Changes the electrode layout, see `LaminateDOF.set_electrodes`. 
+        The structural matrices don't depend on the electrodes, so only the 
+        piezoelectric matrix, with one column for each electrode, and the 
+        diagonal capacitance matrix are reassembled.
+        """
+        self.dof.set_electrodes(electrodes)
+        self._assemblers = (self._assemblers[0],) + self._electrode_maps()
+        kuve = np.array([m.get_piezoelectric_element() for m in self.models])
+        kvve = np.array([m.get_capacitance_element() for m in self.models])
+        self.kuv, self.kvv = self._assemble_electrodes(kuve, kvve)
+    
+    
+    def _assemble_electrodes(self, kuve, kvve):
+        """Assembles the piezoelectric and capacitance matrices from the 
+        elements that lie on an electrode.
+        """
+        _, p_map, c_map = self._assemblers
+        kuve, kvve = [np.reshape(x, (-1,) + np.shape(x)[-2:]) 
+                      for x in (kuve, kvve)]
+        covered = self.dof.electrodes >= 0
+        xk, kinds = self._xk[covered], self._kinds[covered]
+        p_val = element_values(xk, kuve, self.threads, kinds)
+        c_val = element_values(xk, kvve, self.threads, kinds)
+        kuv = p_map.assemble(p_val, self.threads)
+        kvv = c_map.assemble(c_val, self.threads)
+        return kuv, kvv
+        
+        
+    def _scatter_maps(self):
+        """The maps from the element matrices to the system matrices. The maps
+        only depend on the mesh and electrodes, so they are built once and 
+        reused.
+        """
+        mdofs = self.dof.element_mdofs
+        nm = mdofs.shape[1]
+        k_row = np.repeat(mdofs, nm, axis=1)
+        k_col = np.tile(mdofs, (1, nm))
         kuu_shape = (self.dof.n_mdof, self.dof.n_mdof)
+        k_map = SparseAssembler(k_row, k_col, kuu_shape)
+        return (k_map,) + self._electrode_maps()
+    
+    
+    def _electrode_maps(self):
+        """The maps from the element matrices of the elements on an electrode
+        to the piezoelectric and capacitance matrices, in one vectorized pass
+        over the element DOFs.
+        """
+        covered = self.dof.electrodes >= 0
+        mdofs = self.dof.element_mdofs[covered]
+        edofs = self.dof.element_edofs[covered]
+        nm, ne = mdofs.shape[1], edofs.shape[1]
+        
+        p_row = np.repeat(mdofs, ne, axis=1)
+        p_col = np.tile(edofs, (1, nm))
+        c_row = np.repeat(edofs, ne, axis=1)
+        c_col = np.tile(edofs, (1, ne))
+        
         kuv_shape = (self.dof.n_mdof, self.dof.n_edof)
         kvv_shape = (self.dof.n_edof, self.dof.n_edof)
+        p_map = SparseAssembler(p_row, p_col, kuv_shape)
+        c_map = SparseAssembler(c_row, c_col, kvv_shape)
+        return p_map, c_map
+        
+        
+    def _set_models(self, material):
+        """Creates an element model for each size of element in the mesh. The
+        element model of the grid spacing (a, b) is `model`.
+        """
+        self.material = material
+        self.model = LaminateModel(material, self.a, self.b, self.element)
+        self.models = [self.model if s == 1 else 
+                       LaminateModel(material, s * self.a, s * self.b, 
+                                     self.element) 
+                       for s in self._sizes]
         
-        self.muu = sparse.coo_matrix((m_val, (k_row, k_col)), shape=muu_shape)
-        self.kuu = sparse.coo_matrix((k_val, (k_row, k_col)), shape=kuu_shape)
-        self.kuv = sparse.coo_matrix((p_val, (p_row, p_col)), shape=kuv_shape)
-        self.kvv = sparse.coo_matrix((c_val, (c_row, c_col)), shape=kvv_shape)
-        
\ No newline at end of file
+        
+    def element_densities(self, topology):
+        """The stiffness and mass of each element relative to the solid 
+        material for a (topology).
+        """
+        solid = self.mesh.domain2array(topology) == 1
+        xk = np.where(solid, 1.0, self.ersatz_stiffness)
+        xm = np.where(solid, 1.0, self.ersatz_mass)
+        return xk, xm
+    
+    
+    def get_element_matrices(self):
+        """Returns the stacks of element mass and stiffness matrices, one for
+        each element model in `models`, and the index in the stacks of each 
+        element.
+        """
+        muue = np.array([m.get_mass_element() for m in self.models])
+        kuue = np.array([m.get_stiffness_element() for m in self.models])
+        return muue, kuue, self._kinds
+        
+        
+    def _set_densities(self, topology):
+        """The stiffness and mass of each element relative to the solid 
+        material.
+        """
+        self._xk, self._xm = self.element_densities(topology)
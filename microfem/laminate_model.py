@@ -1,13 +1,9 @@
 import numpy as np
+from .shapes import element_shapes
 
 class LaminateModel(object):
     
-    _points = [[-0.577350269189626, -0.577350269189626],
-               [0.577350269189626, -0.577350269189626],
-               [0.577350269189626, 0.577350269189626],
-               [-0.577350269189626, 0.577350269189626]]
-    
-    def __init__(self, material, a, b):
+    def __init__(self, material, a, b, element='q4'):
         """
         Parameters
         ----------
@@ -15,7 +11,10 @@ class LaminateModel(object):
             Units are in um.
         b : float
             Units are in um.
+        element : string
+            The element type, see `element_shapes`.
         """
+        self._element = element_shapes(element)
         self._a = a * 1e-6
         self._b = b * 1e-6
         self._jacobian = self._a * self._b
@@ -39,33 +38,56 @@ class LaminateModel(object):
     
     def get_capacitance_element(self):
         return self._kvve
-    
+
+
+    def get_strain_elements(self, point=(0.0, 0.0)):
+        """Returns the matrices (bs1, bs2, bs3) from the element DOFs to the
+        membrane strains, curvatures and transverse shear strains at a
+        (point) of the normalized element, which defaults to the centroid.
+        The rows of (bs1) and (bs2) are (xx, yy, 0, 0, xy) and the rows of
+        (bs3) are (0, 0, yz, xz, 0).
+        """
+        return self._dofs_to_strain_matrix(point)
+
         
     def _generate_element_matrices(self):  
         
-        cs1, cs2, cs3, ce1, ce2, cc, cm0, cm1, cm2 = self._material.get_fem_parameters()
+        params = self._material.get_fem_parameters()
+        be = self._dofs_to_electric_field_matrix()
+        return self.element_matrices(params, be)
+    
+    
+    def element_matrices(self, params, be):
+        """Computes the element matrices from the laminate parameters (params)
+        in the order returned by `LaminateMaterial.get_fem_parameters`, and 
+        the electric field per unit voltage (be). The element matrices are 
+        linear in each of the parameters.
+        """
+        cs1, cs2, cs3, ce1, ce2, cc, cm0, cm1, cm2 = params
                 
-        muue = np.zeros((20, 20))
-        kuue = np.zeros((20, 20))
-        kuve = np.zeros((20, 1))
+        size = 5 * self._element.n_nodes
+        muue = np.zeros((size, size))
+        kuue = np.zeros((size, size))
+        kuve = np.zeros((size, 1))
         
-        # Four point integration for bending stiffness and piezoelectric effect.
-        be = self._dofs_to_electric_field_matrix()
-        for p in self._points:
+        # Full integration for bending stiffness and piezoelectric effect.
+        for p, w in zip(*self._element.full_rule):
             bs1, bs2, bs3 = self._dofs_to_strain_matrix(p)
             bu1, bu2 = self._dofs_to_displacement_matrix(p)
-            muue += self._jacobian * (cm0 * bu1.T @ bu1 + cm1 * bu2.T @ bu1)
-            muue += self._jacobian * (cm1 * bu1.T @ bu2 + cm2 * bu2.T @ bu2)
-            kuue += self._jacobian * (bs1.T @ cs1 @ bs1 + bs2.T @ cs2 @ bs1)
-            kuue += self._jacobian * (bs1.T @ cs2 @ bs2 + bs2.T @ cs3 @ bs2)
-            kuve += self._jacobian * ((bs1.T + bs3.T) @ ce1 * be)
-            kuve += self._jacobian * (bs2.T @ ce2 * be)
+            jw = w * self._jacobian
+            muue += jw * (cm0 * bu1.T @ bu1 + cm1 * bu2.T @ bu1)
+            muue += jw * (cm1 * bu1.T @ bu2 + cm2 * bu2.T @ bu2)
+            kuue += jw * (bs1.T @ cs1 @ bs1 + bs2.T @ cs2 @ bs1)
+            kuue += jw * (bs1.T @ cs2 @ bs2 + bs2.T @ cs3 @ bs2)
+            kuve += jw * ((bs1.T + bs3.T) @ ce1 * be)
+            kuve += jw * (bs2.T @ ce2 * be)
         
         
-        # Single point integration for shear stiffness or capacitance.
-        point, weight = (0, 0), 4
-        _, _, bs3 = self._dofs_to_strain_matrix(point)
-        kuue += weight * self._jacobian * (bs3.T @ cs1 @ bs3)
+        # Reduced integration for shear stiffness or capacitance.
+        for point, weight in zip(*self._element.reduced_rule):
+            _, _, bs3 = self._dofs_to_strain_matrix(point)
+            kuue += weight * self._jacobian * (bs3.T @ cs1 @ bs3)
+        weight = np.sum(self._element.reduced_rule[1])
         kvve = np.array([[weight * self._jacobian * cc]])
         
         # Enforce symmetry.
@@ -75,10 +97,11 @@ class LaminateModel(object):
     
     
     def _dofs_to_strain_matrix(self, point):
-        bs1 = [None for _ in range(4)]
-        bs2 = [None for _ in range(4)]
-        bs3 = [None for _ in range(4)]
-        for i in range(4):
+        n_nodes = self._element.n_nodes
+        bs1 = [None for _ in range(n_nodes)]
+        bs2 = [None for _ in range(n_nodes)]
+        bs3 = [None for _ in range(n_nodes)]
+        for i in range(n_nodes):
             n, dndx, dndy = self._shapes(point, i)
             bs1[i] = np.array([[dndx, 0, 0, 0, 0], 
                                [0, dndy, 0, 0, 0], 
@@ -102,9 +125,10 @@ class LaminateModel(object):
     
     
     def _dofs_to_displacement_matrix(self, point):
-        bu1 = [None for _ in range(4)]
-        bu2 = [None for _ in range(4)]
-        for i in range(4):
+        n_nodes = self._element.n_nodes
+        bu1 = [None for _ in range(n_nodes)]
+        bu2 = [None for _ in range(n_nodes)]
+        for i in range(n_nodes):
             n, _, _ = self._shapes(point, i)
             bu1[i] = np.hstack((np.diag((n, n, n)), 
                                 np.zeros((3, 2))))
@@ -126,13 +150,9 @@ class LaminateModel(object):
         index = 1 : node se
         index = 2 : node ne
         index = 3 : node nw
+        index > 3 : the side and center nodes of quadratic elements, see 
+                    `BilinearShapes`.
         """
-        xi, eta = point
-        xi_sign = [-1, 1, 1, -1]
-        eta_sign = [-1, -1, 1, 1]
-        xs, es = xi_sign[index], eta_sign[index]
-        n = 0.25 * (1 + xs * xi) * (1 + es * eta)
-        dndx = xs * 0.25 * (1 + es * eta) / self._a
-        dndy = es * 0.25 * (1 + xs * xi) / self._b
-        return n, dndx, dndy
+        n, dndxi, dndeta = self._element.evaluate(point)
+        return n[index], dndxi[index] / self._a, dndeta[index] / self._b
     
\ No newline at end of file
@@ -11,6 +11,13 @@ class UniformMesh(object):
     from this class. This class does manage the density property utilized in
     topology optimization routines.
     
+    When the mesh is created with `full_grid=True`, every element and node of
+    the rectangular grid is retained regardless of the topology. The void flags
+    of the elements are still set from the domain, so the finite element 
+    models can assign an ersatz material to the void elements. The numbering 
+    of the elements and nodes then depends only on the shape of the domain, 
+    and stays fixed as the topology changes.
+    
     Public Attributes
     -----------------    
     self.elements : list of objects
@@ -18,18 +25,41 @@ class UniformMesh(object):
     
     self.nodes : list of objects
         The list of nodes that comprise the canitlever domain.
+        
+    self.shape : tuple
+        The number of elements (nelx, nely) in the rectangular grid.
+        
+    self.connectivity : ndarray
+        The indices of the (sw, se, ne, nw) nodes of each element.
+    
+    self.node_ij : ndarray
+        The grid indices (i, j) of each node.
+        
+    self.element_ij : ndarray
+        The grid indices (i, j) of each element.
+        
+    self.element_size : ndarray
+        The width of each element in multiples of the grid spacing.
+        
+    self.constraints : dict
+        Maps the index of each hanging node to a list of (master node index, 
+        weight) pairs. The DOFs of a hanging node are the weighted sum of the 
+        DOFs of its masters. A uniform mesh has no hanging nodes.
     """
     
-    def __init__(self, domain):
+    def __init__(self, domain, full_grid=False):
         """
         Parameters
         ----------
         domain : ndarray
             An object describing a the topology of the cantilever.
+        full_grid : bool
+            If True, void elements and nodes are kept in the mesh.
         """
         
         # Create all elements and nodes on the rectangular domain.
         nelx, nely = domain.shape
+        self.shape = (nelx, nely)
         self._nodes_2D = [[Node(i, j) for j in range(nely + 1)]
                           for i in range(nelx + 1)]
         self._elements_2D = [[Element(i, j, domain, self._nodes_2D) 
@@ -38,16 +68,36 @@ class UniformMesh(object):
         # Create list of valid elements and nodes.
         gen_elements = (e for row in self._elements_2D for e in row)
         gen_nodes = (n for row in self._nodes_2D for n in row)
-        self.elements = [e for e in gen_elements if e.void == False]
-        self.nodes = [n for n in gen_nodes if n.void == False]
-        
-        
-        # Set index on elements.
+        self.full_grid = full_grid
+        if full_grid is True:
+            self.elements = list(gen_elements)
+            self.nodes = list(gen_nodes)
+        else:
+            self.elements = [e for e in gen_elements if e.void == False]
+            self.nodes = [n for n in gen_nodes if n.void == False]
+
+        self.constraints = {}
+        self._set_indices()
+
+
+    def _set_indices(self):
+        """Numbers the elements and nodes in the order of their lists, and 
+        creates the connectivity arrays for vectorized operations on the mesh.
+        """
         for i, e in enumerate(self.elements):
             e.index = i
             
         for i, n in enumerate(self.nodes):
             n.index = i
+        
+        conn = [[n.index for n in e.nodes] for e in self.elements]
+        self.connectivity = np.array(conn, dtype=int).reshape(-1, 4)
+        self.node_ij = np.array([(n.i, n.j) for n in self.nodes], dtype=int)
+        self.node_ij = self.node_ij.reshape(-1, 2)
+        self.element_ij = np.array([(e.i, e.j) for e in self.elements], 
+                                   dtype=int).reshape(-1, 2)
+        self.element_size = np.array([e.size for e in self.elements], 
+                                     dtype=int)
 
 
     @property
@@ -63,6 +113,22 @@ class UniformMesh(object):
     def domain2array(self, domain):
         
         return  np.array([domain[e.i, e.j] for e in self.elements])
+    
+    
+    def update_domain(self, domain):
+        """Resets the void flags of the elements and nodes from a new domain.
+        This is only possible for full grid meshes since the lists of elements
+        and nodes, and hence their numbering, do not change.
+        """
+        if self.full_grid is False:
+            raise ValueError('Only full grid meshes can change their domain.')
+        if domain.shape != self.shape:
+            raise ValueError('The domain does not match the shape of the mesh.')
+            
+        for n in self.nodes:
+            n.void = True
+        for e in self.elements:
+            e.set_void(domain)
         
     
     def to_console(self):
@@ -78,6 +144,95 @@ class UniformMesh(object):
                 print(n)
                     
                     
+class QuadtreeMesh(UniformMesh):
+    """An adaptive mesh that merges uniform solid blocks of 2^k x 2^k 
+    elements of the rectangular grid into single larger elements. Large 
+    solid regions, which contribute little to resolving the modes, then use
+    far fewer DOFs. Blocks are aligned to multiples of their size, and the 
+    largest blocks are placed first.
+    
+    A node of a small element that lies on the edge of a larger element is a
+    hanging node. Its DOFs are tied by linear interpolation to the corner 
+    nodes of the largest element edge it lies on, which keeps the bilinear 
+    displacement field continuous. The constraints are resolved so that all
+    masters are regular nodes.
+    """
+    
+    def __init__(self, domain, max_size=8, fields=()):
+        """
+        Parameters
+        ----------
+        domain : ndarray
+            An object describing a the topology of the cantilever.
+        max_size : int
+            The largest element width in multiples of the grid spacing. It is
+            rounded down to a power of two.
+        fields : tuple of ndarray
+            Element properties, such as conductivity, that must be uniform 
+            over a block for it to be merged.
+        """
+        
+        nelx, nely = domain.shape
+        self.shape = (nelx, nely)
+        self.full_grid = False
+        self._nodes_2D = [[Node(i, j) for j in range(nely + 1)]
+                          for i in range(nelx + 1)]
+        
+        # Cover the solid elements with the largest aligned uniform blocks.
+        solid = np.asarray(domain) == 1
+        covered = np.zeros(self.shape, dtype=bool)
+        self.elements = []
+        size = 2 ** int(np.log2(max(1, max_size)))
+        while size >= 1:
+            for i, j in np.ndindex(nelx // size, nely // size):
+                block = np.s_[i*size:(i+1)*size, j*size:(j+1)*size]
+                if covered[block].any() or not solid[block].all():
+                    continue
+                if any(np.ptp(f[block]) != 0 for f in fields):
+                    continue
+                e = Element(i*size, j*size, domain, self._nodes_2D, size)
+                self.elements.append(e)
+                covered[block] = True
+            size //= 2
+        self.elements.sort(key=lambda e: (e.i, e.j))
+        
+        gen_nodes = (n for row in self._nodes_2D for n in row)
+        self.nodes = [n for n in gen_nodes if n.void == False]
+        self._set_indices()
+        self.constraints = self._hanging_node_constraints()
+        
+        
+    def _hanging_node_constraints(self):
+        
+        # Find the largest element edge that each hanging node lies on.
+        edges = {}
+        for e in sorted(self.elements, key=lambda e: e.size):
+            s = e.size
+            corners = e.nodes + e.nodes[:1]
+            steps = ((1, 0), (0, 1), (-1, 0), (0, -1))
+            for (na, nb), (di, dj) in zip(zip(corners, corners[1:]), steps):
+                for k in range(1, s):
+                    n = self._nodes_2D[na.i + k * di][na.j + k * dj]
+                    if n.void is False:
+                        edges[n.index] = ((na.index, 1 - k / s), 
+                                          (nb.index, k / s))
+        
+        # Resolve the masters that are themselves hanging nodes.
+        resolved = {}
+        def resolve(index):
+            if index not in edges:
+                return [(index, 1.0)]
+            if index not in resolved:
+                weights = {}
+                for master, w in edges[index]:
+                    for m, wm in resolve(master):
+                        weights[m] = weights.get(m, 0.0) + w * wm
+                resolved[index] = sorted(weights.items())
+            return resolved[index]
+        
+        return {index: resolve(index) for index in sorted(edges)}
+
+
 class Element(object):
     """
     Public Attributes
@@ -89,21 +244,30 @@ class Element(object):
                  denoted by their position on a compass, are stored in order 
                  (sw, se, ne, nw).
     self.void  : False if a member of the domain, else True.
-    self.index : The index in the list of non-void elements.
+    self.index : The index in the list of non-void elements, or in the list of 
+                 all elements for full grid meshes.
+    self.size  : The width of the element in multiples of the grid spacing.
+                 Only elements of a quadtree mesh are larger than one.
     """
-    def __init__(self, i, j, domain, nodes_2D):
+    def __init__(self, i, j, domain, nodes_2D, size=1):
         
         nsw = nodes_2D[i][j]
-        nse = nodes_2D[i + 1][j]
-        nne = nodes_2D[i + 1][j + 1]
-        nnw = nodes_2D[i][j + 1]
+        nse = nodes_2D[i + size][j]
+        nne = nodes_2D[i + size][j + size]
+        nnw = nodes_2D[i][j + size]
         
         # Public Attributes.
         self.i = i
         self.j = j
+        self.size = size
         self.nodes = (nsw, nse, nne, nnw)
-        self.void = False if domain[i][j] == 1 else True
         self.index = 0 # set later if not void
+        self.set_void(domain)
+        
+    
+    def set_void(self, domain):
+        
+        self.void = False if domain[self.i][self.j] == 1 else True
         
         # Set node.void to False if element is non-void.
         if self.void is False:
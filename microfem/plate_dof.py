@@ -1,13 +1,27 @@
 import numpy as np
+from .constraints import Prolongation
+from .shapes import element_shapes, element_nodes
 
 
 class PlateDOF(object):
     
-    def __init__(self, mesh):
+    def __init__(self, mesh, element='q4'):
+        """
+        Parameters
+        ----------
+        mesh : microfem.UniformMesh
+            The mesh of the cantilever.
+        element : string
+            The element type, see `element_shapes`. Quadratic elements add 
+            DOF nodes at the sides and center of each element.
+        """
         
         self.mesh = mesh
-        self.dof_nodes = [PlateNode(n) for n in mesh.nodes]
-        self.dof_elements = [PlateElement(e, self.dof_nodes) for e in mesh.elements]
+        self.shapes = element_shapes(element)
+        nodes, connectivity = element_nodes(mesh, self.shapes)
+        self.dof_nodes = [PlateNode(n) for n in nodes]
+        self.dof_elements = [PlateElement(e, self.dof_nodes, c) 
+                             for e, c in zip(mesh.elements, connectivity)]
         
         ads = [n.mechanical_dof for n in self.dof_nodes]
         fds = [n.mechanical_dof for n in self.dof_nodes if n.boundary == True]
@@ -15,17 +29,34 @@ class PlateDOF(object):
         self.all_dofs = np.concatenate(ads)
         self.fixed_dofs = np.concatenate(fds)
         self.free_dofs = np.setdiff1d(self.all_dofs, self.fixed_dofs)
+        
+        # The free DOFs exclude those of hanging nodes, which are constrained.
+        node_dofs = np.array([n.mechanical_dof for n in self.dof_nodes])
+        self.prolongation = Prolongation(len(self.all_dofs), self.free_dofs, 
+                                         node_dofs, mesh.constraints)
+        self.free_dofs = self.prolongation.free_dofs
 
         self.n_mdof = len(self.all_dofs)
         self.n_elem = len(self.dof_elements)
         
+        # The mechanical DOFs of each element as a (n_elem, 3 n_nodes) array.
+        emds = [e.mechanical_dof for e in self.dof_elements]
+        n_edof = 3 * self.shapes.n_nodes
+        self.element_mdofs = np.array(emds, dtype=int).reshape(-1, n_edof)
+        
+        # The deflection DOF of each node of the mesh.
+        dds = [n.deflection_dof for n in self.dof_nodes[:mesh.n_node]]
+        self.deflection_dofs = np.array(dds, dtype=int)
+        
         
 class PlateElement(object):
     
-    def __init__(self, element, dof_nodes):
+    def __init__(self, element, dof_nodes, node_indices=None):
 
         self.element = element
-        self.dof_nodes = [dof_nodes[n.index] for n in element.nodes]
+        if node_indices is None:
+            node_indices = [n.index for n in element.nodes]
+        self.dof_nodes = [dof_nodes[i] for i in node_indices]
         
         mds = [n.mechanical_dof for n in self.dof_nodes]
         self.mechanical_dof = np.concatenate(mds)
@@ -44,7 +75,13 @@ class PlateElement(object):
 class PlateNode(object):
     """
     Plates have three mechanical DOFs per node.
+    
+    The mirror parity is the sign each DOF takes under a reflection about a 
+    line of constant x, for a displacement field symmetric about that line.
     """
+    
+    mirror_parity = np.array([1, 1, -1])
+    
         
     def __init__(self, node):
         
@@ -1,15 +1,23 @@
 import numpy as np
 import scipy.sparse as sparse
-import scipy.sparse.linalg as linalg
 
 from .plate_model import PlateModel
 from .plate_dof import PlateDOF
-from .mesh import UniformMesh
+from .mesh import UniformMesh, QuadtreeMesh
+from .analysis_symmetry import MirrorSymmetry, is_mirror_symmetric
+from .spectrum import solve_band
+from .solvers import factorize, solve_modes
+from .constraints import ModeShapes
+from .harmonic import frequency_response
+from .assembly import SparseAssembler, element_values
+from .analysis_plate_displacement import PlateDisplacement
 
 
 class PlateFEM(object):
 
-    def __init__(self, material, cantilever):
+    def __init__(self, material, cantilever, full_grid=False, 
+                 ersatz_stiffness=1e-6, ersatz_mass=1e-9, threads=None,
+                 adaptive=False, max_size=2, element='q4', solver='auto'):
         """
         The initialization rountine creates the element models. The mesh and 
         penalization are updated seperately.
@@ -18,13 +26,63 @@ class PlateFEM(object):
         ----------
         material : microfem.PlateMaterial 
             An object containing the material properties of the plate.
+        full_grid : bool
+            If True, every node of the rectangular grid keeps a fixed DOF 
+            number and the void elements are modelled with an ersatz material.
+            The sparsity pattern and free DOFs then don't depend on the 
+            topology, see `update_topology`.
+        ersatz_stiffness : float
+            The relative stiffness of void elements in a full grid model.
+        ersatz_mass : float
+            The relative mass of void elements in a full grid model. It should
+            be much smaller than the ersatz stiffness to push the local modes
+            of the void regions well above the modes of the structure.
+        threads : int
+            The number of threads used to assemble the system matrices. The
+            matrices are bit-identical for any number of threads.
+        adaptive : bool
+            If True, uniform solid blocks of the topology are merged into 
+            larger elements, see `QuadtreeMesh`.
+        max_size : int
+            The largest element width of an adaptive mesh. The elements are
+            bilinear, so large elements are too stiff. For the laminate 
+            example, a width of 2 keeps the lowest six frequencies within 1% 
+            of the uniform mesh with a quarter of the DOFs, while widths of 4
+            and 8 give errors of up to 5% and 14%.
+        element : string
+            The element type, 'q4' (4-node bilinear), 'q8' (8-node 
+            serendipity) or 'q9' (9-node Lagrange), see `element_shapes`. The
+            quadratic elements converge much faster with mesh refinement, see
+            examples/benchmark_elements.py.
+        solver : string
+            The sparse direct solver backend, see `factorize`. If 'auto', the
+            fastest installed backend for the stiffness matrix is chosen.
         """
         
-        self._model = PlateModel(material, cantilever.a, cantilever.b)
+        if adaptive is True and full_grid is True:
+            raise ValueError('An adaptive mesh cannot be a full grid.')
+        if adaptive is True and element != 'q4':
+            raise ValueError('Adaptive meshes only support q4 elements.')
+        
+        self.cantilever = cantilever
         self.a = cantilever.a
         self.b = cantilever.b
-        self._mesh = UniformMesh(cantilever.topology)
-        self.dof = PlateDOF(self._mesh)
+        self.ersatz_stiffness = ersatz_stiffness
+        self.ersatz_mass = ersatz_mass
+        if adaptive is True:
+            self._mesh = QuadtreeMesh(cantilever.topology, max_size)
+        else:
+            self._mesh = UniformMesh(cantilever.topology, full_grid)
+        self.element = element
+        self.dof = PlateDOF(self._mesh, element)
+        self._sizes, self._kinds = np.unique(self._mesh.element_size, 
+                                             return_inverse=True)
+        self._set_models(material)
+        self.threads = threads
+        self.solver = solver
+        self._factor = None
+        self._assembler = self._scatter_map()
+        self._set_densities(cantilever.topology)
         self._assemble()
 
 
@@ -33,7 +91,7 @@ class PlateFEM(object):
         muu = self._muu.tocsr()
         if free is False:
             return muu
-        return muu[self.dof.free_dofs, :][:, self.dof.free_dofs]
+        return self.dof.prolongation.restrict(muu)
 
     
     def get_stiffness_matrix(self, free=False):
@@ -41,21 +99,224 @@ class PlateFEM(object):
         kuu = self._kuu.tocsr()
         if free is False:
             return kuu
-        return kuu[self.dof.free_dofs, :][:, self.dof.free_dofs]
+        return self.dof.prolongation.restrict(kuu)
     
     
-    def modal_analysis(self, n_modes):
+    def modal_analysis(self, n_modes=None, symmetric=False, f_min=None, 
+                       f_max=None, n_slices=None, processes=None, 
+                       expand=True, out=None):
         """
         The return value (w) are the eigenvalues and the return value (v) 
         are the eigenvectors.
+        
+        If (symmetric) is True, the modes of a mirror symmetric cantilever are
+        found from two half-size eigenproblems, see `MirrorSymmetry`. If 
+        (symmetric) is 'auto' this is done when the topology is symmetric and
+        the mesh has no hanging nodes.
+        
+        If (f_max) is given, all the modes with a frequency in the band 
+        [f_min, f_max] Hz are returned instead of the lowest (n_modes). The 
+        band is split into (n_slices) slices that are solved on (processes)
+        worker processes, see `solve_band`.
+        
+        The mode shapes of all DOFs (vall) are selected by (expand), see 
+        `Prolongation.expand`. If False (vall) is None, if 'lazy' it is a 
+        `ModeShapes` view that is expanded on access, and if True it is a 
+        dense array, written to (out) if given, such as an np.memmap of shape
+        (n_mdof, n_modes).
         """
         
-        m = self._muu.tocsc()[self.dof.free_dofs, :][:, self.dof.free_dofs]
-        k = self._kuu.tocsc()[self.dof.free_dofs, :][:, self.dof.free_dofs]
-        w, v = linalg.eigsh(k, k=n_modes, M=m, sigma=0, which='LM')
-        vall = np.zeros((self.dof.n_mdof, n_modes))
-        vall[self.dof.free_dofs, :] = v
+        if n_modes is None and f_max is None:
+            raise ValueError('Either n_modes or f_max is required.')
+        if symmetric == 'auto':
+            symmetric = (self.dof.prolongation.constrained is False and
+                         is_mirror_symmetric(self._mesh))
+        if symmetric is True:
+            symmetry = MirrorSymmetry(self)
+            w, v, vall, _ = symmetry.modal_analysis(n_modes, expand, out, 
+                                                    f_min, f_max, n_slices,
+                                                    processes)
+            return w, v, vall
+        
+        m = self.get_mass_matrix(free=True).tocsc()
+        k = self.get_stiffness_matrix(free=True).tocsc()
+        if f_max is not None:
+            f_min = 0 if f_min is None else f_min
+            w, v = solve_band(k, m, f_min, f_max, n_slices, processes, 
+                              self.solver)
+        else:
+            factor = self.factorize_stiffness()
+            w, v = solve_modes(k, m, n_modes, factor=factor)
+        vall = self.dof.prolongation.expand(v, expand, out)
         return w, v, vall
+
+
+    def modal_metrics(self, n_modes=None, tip=None, modes=None, **options):
+        """
+        Runs the modal analysis and returns the metrics of each mode as a
+        structured array with the fields 'freq' (Hz), 'tip' (the deflection
+        of the mode shape at the tip), 'stiffness' (N/m) and 'flexural'. The
+        stiffness is NaN for modes that barely deflect the tip. The metrics
+        of the eigenvalues and eigenvectors (modes) = (w, v) of an earlier 
+        modal analysis are computed without solving again. See 
+        `LaminateFEM.modal_metrics`.
+        """
+
+        if modes is None:
+            w, _, vall = self.modal_analysis(n_modes, expand='lazy', **options)
+        else:
+            w, vall = modes[0], ModeShapes(self.dof.prolongation, modes[1])
+        if tip is None:
+            tip = (self.cantilever.xtip, self.cantilever.ytip)
+        x, y = tip
+        points = ((x, y), (x - 1, y), (x + 1, y))
+        opr = sparse.vstack([PlateDisplacement(self, p).get_operator()
+                             for p in points])
+        kuu = self.get_stiffness_matrix()
+
+        disp = np.zeros((3, len(w)))
+        peak = np.zeros(len(w))
+        energy = np.zeros(len(w))
+        for cols, block in vall.blocks():
+            disp[:, cols] = opr @ block
+            peak[cols] = np.abs(block[self.dof.deflection_dofs]).max(axis=0)
+            energy[cols] = np.einsum('im,im->m', block, kuu @ block)
+
+        # The stiffness normalized by a negligible tip deflection is NaN.
+        scale = np.where(np.abs(disp[0]) > 1e-6 * peak, disp[0], np.nan)
+        dtype = [('freq', float), ('tip', float), ('stiffness', float),
+                 ('flexural', bool)]
+        metrics = np.zeros(len(w), dtype=dtype)
+        metrics['freq'] = np.sqrt(w) / (2 * np.pi)
+        metrics['tip'] = disp[0]
+        metrics['stiffness'] = energy / scale ** 2
+        metrics['flexural'] = np.sign(disp[1]) == np.sign(disp[2])
+        return metrics
+
+
+    def frequency_response(self, freqs, load, outputs=None, n_modes=20, 
+                           zeta=0.0, rayleigh=None, method='modal'):
+        """
+        Returns the complex response of the (outputs) to the harmonic (load) 
+        of all DOFs at the frequencies (freqs) in Hz, with the modal damping
+        ratio (zeta) and the Rayleigh damping (rayleigh) = (alpha, beta). The
+        outputs are the rows of a sparse operator of all DOFs and default to
+        the deflection at the tip. By default the response is the 
+        superposition of (n_modes) modes with a static residual, and 
+        (method) 'direct' solves the full system at each frequency, see 
+        `frequency_response`.
+        """
+
+        if outputs is None:
+            tip = (self.cantilever.xtip, self.cantilever.ytip)
+            outputs = PlateDisplacement(self, tip).get_operator()
+        return frequency_response(self, freqs, load, outputs, n_modes, zeta,
+                                  rayleigh, method)
+
+
+    def factorize_stiffness(self):
+        """
+        Returns the factorization of the stiffness matrix of the free DOFs,
+        see `factorize`. It is computed once for each assembly and shared by
+        the modal analysis and static solves.
+        """
+
+        if self._factor is None or self._factor[0] is not self._kuu:
+            k = self.get_stiffness_matrix(free=True)
+            factor = factorize(k, self.solver, definite=True)
+            self._factor = (self._kuu, factor)
+        return self._factor[1]
+
+
+    def __getstate__(self):
+        """
+        The cached factorization of the stiffness matrix isn't copied or 
+        pickled, such as for the workers of a `ParameterSweep`, and is 
+        recomputed when it is next needed.
+        """
+
+        state = self.__dict__.copy()
+        state['_factor'] = None
+        return state
+
+
+    def update_topology(self, topology):
+        """
+        Changes the topology of a full grid model. Only the values of the 
+        system matrices change, the DOF numbering and sparsity are retained.
+        """
+        
+        self._mesh.update_domain(topology)
+        self._set_densities(topology)
+        self._assemble()
+    
+    
+    def update_model(self, material=None, a=None, b=None):
+        """
+        Changes the material or element dimensions. Only the element matrices
+        are recomputed, and their values are scattered into the system 
+        matrices through the existing map.
+        """
+        
+        self.a = self.a if a is None else a
+        self.b = self.b if b is None else b
+        self._set_models(self.material if material is None else material)
+        self._assemble()
+    
+    
+    def _set_models(self, material):
+        """
+        Creates an element model for each size of element in the mesh.
+        """
+        
+        self.material = material
+        self._models = [PlateModel(material, s * self.a, s * self.b, 
+                                   self.element) 
+                        for s in self._sizes]
+    
+    
+    def element_densities(self, topology):
+        """
+        The stiffness and mass of each element relative to the solid material
+        for a (topology).
+        """
+        
+        solid = self._mesh.domain2array(topology) == 1
+        xk = np.where(solid, 1.0, self.ersatz_stiffness)
+        xm = np.where(solid, 1.0, self.ersatz_mass)
+        return xk, xm
+    
+    
+    def get_element_matrices(self):
+        """
+        Returns the stacks of element mass and stiffness matrices, one for 
+        each element model, and the index in the stacks of each element.
+        """
+        
+        muue = np.array([m.me for m in self._models])
+        kuue = np.array([m.ke for m in self._models])
+        return muue, kuue, self._kinds
+    
+    
+    def _set_densities(self, topology):
+        """
+        The stiffness and mass of each element relative to the solid material.
+        """
+        
+        self._xk, self._xm = self.element_densities(topology)
+    
+    
+    def _scatter_map(self):
+        """
+        The map from the element matrices to the system matrices. The map 
+        only depends on the mesh, so it is built once and reused.
+        """
+        
+        nm = self.dof.element_mdofs.shape[1]
+        k_row = np.repeat(self.dof.element_mdofs, nm, axis=1)
+        k_col = np.tile(self.dof.element_mdofs, (1, nm))
+        k_shape = (self.dof.n_mdof, self.dof.n_mdof)
+        return SparseAssembler(k_row, k_col, k_shape)
     
     
     def _assemble(self):
@@ -64,28 +325,8 @@ class PlateFEM(object):
         the plate.
         """
         
-        muue = self._model.me
-        kuue = self._model.ke
-        nm = kuue.shape[0]
-        k_num = nm * nm * self._mesh.n_elem
-        k_index = list(np.ndindex(nm, nm))
-        k_row = np.zeros(k_num)
-        k_col = np.zeros(k_num)
-        k_val = np.zeros(k_num)
-        m_val = np.zeros(k_num)
-        k_ntriplet = 0
-
-        for ni, e in enumerate(self.dof.dof_elements):
-            
-            for ii, jj in k_index:
-                k_row[k_ntriplet] = e.mechanical_dof[ii]
-                k_col[k_ntriplet] = e.mechanical_dof[jj]
-                k_val[k_ntriplet] = kuue[ii, jj]
-                m_val[k_ntriplet] = muue[ii, jj]
-                k_ntriplet += 1
-            
-        muu_shape = (self.dof.n_mdof, self.dof.n_mdof)
-        kuu_shape = (self.dof.n_mdof, self.dof.n_mdof)
-
-        self._muu = sparse.coo_matrix((m_val, (k_row, k_col)), shape=muu_shape)
-        self._kuu = sparse.coo_matrix((k_val, (k_row, k_col)), shape=kuu_shape)
+        muue, kuue, _ = self.get_element_matrices()
+        k_val = element_values(self._xk, kuue, self.threads, self._kinds)
+        m_val = element_values(self._xm, muue, self.threads, self._kinds)
+        self._muu = self._assembler.assemble(m_val, self.threads)
+        self._kuu = self._assembler.assemble(k_val, self.threads)
@@ -1,11 +1,15 @@
+import os
 import math
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import cm
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.tri as mtri
 import matplotlib.patches as patches
 import scipy.interpolate as interpolate
+from concurrent.futures import ProcessPoolExecutor
 
 
 def plot_topology(cantilever, filename=None):
@@ -41,53 +45,171 @@ def plot_topology(cantilever, filename=None):
         
         
 def plot_mode(fem, v):
-        
-    # Create list of points at each node and the deflection DOF.
-    n_pts = len(fem.dof.dof_nodes)
-    pts = np.zeros((n_pts, 3))
-    for n in fem.dof.dof_nodes:
-        z = v[n.deflection_dof]
-        pts[n.node.index, :] = np.array([n.node.i, n.node.j, z])
-    
-    # Create two triangles from each element.
-    n_tri = round(2 * fem.dof.n_elem)
-    tri = np.zeros((n_tri, 3))
-    for e in fem.dof.dof_elements:
-        index1 = round(2 * e.element.index)
-        index2 = round(2 * e.element.index + 1)
-        n0, n1, n2, n3 = e.element.nodes
-        tri[index1, :] = np.array([n0.index, n1.index, n2.index])
-        tri[index2, :] = np.array([n2.index, n3.index, n0.index])
-
+    """
+    Plots the deflection of a mode shape (v) over the mesh of the FEM.
+    """
+    
+    pts, tri = mode_mesh(fem)
+    z = v[fem.dof.deflection_dofs]
     triang = mtri.Triangulation(pts[:, 0], pts[:, 1], triangles=tri)
     fig = plt.figure()
-    ax = Axes3D(fig)
-    ax.plot_trisurf(triang, pts[:, 2], cmap=cm.viridis)
-    ax.plot_trisurf(triang, np.zeros(n_pts), alpha=0.3)
+    ax = fig.add_subplot(projection='3d')
+    ax.plot_trisurf(triang, z, cmap=cm.viridis)
+    ax.plot_trisurf(triang, np.zeros(len(pts)), alpha=0.3)
     ax.view_init(30, 45)
     plt.show()
     
     
+def mode_mesh(fem):
+    """
+    Returns the points (x, y) of the nodes and the triangles of the mesh of 
+    the FEM, used to plot mode shapes. Two triangles are created from each 
+    element.
+    """
+    
+    mesh = fem.dof.mesh
+    pts = mesh.node_ij.astype(float)
+    conn = mesh.connectivity
+    tri = np.empty((2 * len(conn), 3), dtype=int)
+    tri[0::2] = conn[:, [0, 1, 2]]
+    tri[1::2] = conn[:, [2, 3, 0]]
+    return pts, tri
+
+
+def render_modes(fem, vall, out_dir, fmt='png', modes=None, dpi=100):
+    """
+    Renders the mode shapes in the columns of (vall) to image files without 
+    a display. A single figure and triangulation are reused for every mode.
+    The files are named mode_000.png, mode_001.png, ... in (out_dir).
+    
+    Parameters
+    ----------
+    fem : microfem.PlateFEM or microfem.LaminateFEM
+        The finite element model of the mode shapes.
+    vall : ndarray
+        The mode shapes, one in each column.
+    out_dir : string
+        The directory to save the images in. It is created if it doesn't 
+        exist.
+    fmt : string
+        The image format.
+    modes : list of int
+        The columns of (vall) to render. All columns are rendered if None.
+        
+    Returns
+    -------
+    filenames : list of string
+        The filename of each rendered mode.
+    """
+    
+    pts, tri = mode_mesh(fem)
+    modes = range(vall.shape[1]) if modes is None else modes
+    z = vall[fem.dof.deflection_dofs[:, None], np.asarray(modes)[None, :]]
+    return _render_mode_data((pts, tri, z, list(modes), out_dir, fmt, dpi))
+
+
+def render_many(jobs, fmt='png', processes=None, dpi=100):
+    """
+    Renders the mode shapes of many designs in parallel processes. Only the
+    points, triangles and deflections are sent to the worker processes.
+    
+    Parameters
+    ----------
+    jobs : list of tuple
+        Each job is a tuple (fem, vall, out_dir) as given to `render_modes`.
+    processes : int
+        The number of worker processes. Defaults to the number of CPUs.
+        
+    Returns
+    -------
+    filenames : list of list of string
+        The filenames of the rendered modes of each job.
+    """
+    
+    tasks = []
+    for fem, vall, out_dir in jobs:
+        pts, tri = mode_mesh(fem)
+        z = vall[fem.dof.deflection_dofs, :]
+        modes = list(range(vall.shape[1]))
+        tasks.append((pts, tri, z, modes, out_dir, fmt, dpi))
+    
+    if processes == 1:
+        return [_render_mode_data(t) for t in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_mode_data, tasks))
+
+
+def _render_mode_data(task):
+    
+    pts, tri, z, modes, out_dir, fmt, dpi = task
+    os.makedirs(out_dir, exist_ok=True)
+    
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(projection='3d')
+    triang = mtri.Triangulation(pts[:, 0], pts[:, 1], triangles=tri)
+    ax.plot_trisurf(triang, np.zeros(len(pts)), alpha=0.3)
+    ax.view_init(30, 45)
+    
+    filenames = []
+    for k, mode in enumerate(modes):
+        surface = ax.plot_trisurf(triang, z[:, k], cmap=cm.viridis)
+        filename = os.path.join(out_dir, 'mode_%03d.%s' % (mode, fmt))
+        fig.savefig(filename, format=fmt, dpi=dpi)
+        surface.remove()
+        filenames.append(filename)
+    return filenames
+    
     
 def plot_poisson_solution(fem, uall, show=None):
     
+    fig, ax = plt.subplots()
+    _draw_poisson_solution(ax, fem, uall, show)
+    plt.show()
+    
+    
+def render_poisson_solutions(fem, ualls, out_dir, fmt='png', show=None, 
+                             dpi=100):
+    """
+    Renders the solutions in the columns of (ualls) to image files without a
+    display. The figure is reused for every solution. The files are named
+    poisson_000.png, poisson_001.png, ... in (out_dir).
+    """
+    
+    os.makedirs(out_dir, exist_ok=True)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    
+    filenames = []
+    ualls = np.reshape(ualls, (len(fem.dof.dof_nodes), -1))
+    for k in range(ualls.shape[1]):
+        ax.clear()
+        _draw_poisson_solution(ax, fem, ualls[:, k], show)
+        filename = os.path.join(out_dir, 'poisson_%03d.%s' % (k, fmt))
+        fig.savefig(filename, format=fmt, dpi=dpi)
+        filenames.append(filename)
+    return filenames
+    
+
+def _draw_poisson_solution(ax, fem, uall, show):
+    
     assert len(fem.dof.dof_nodes) == uall.shape[0]
 
     a = fem.poisson_domain.a
     b = fem.poisson_domain.b
     nelx, nely = fem.poisson_domain.domain.shape
+    mesh = fem.dof.mesh
     
     x = np.arange(nelx + 1) * 2 * a
     y = np.arange(nely + 1) * 2 * b
     mx, my = np.meshgrid(x, y, indexing='ij')
     mask = np.ones(mx.shape, dtype=bool)
     zdata = np.zeros(mx.shape)
-    for n in fem.dof.dof_nodes:
-        mask[n.node.i, n.node.j] = False
-        zdata[n.node.i, n.node.j] = uall[n.dof]
+    ii, jj = mesh.node_ij[:, 0], mesh.node_ij[:, 1]
+    mask[ii, jj] = [n.void for n in mesh.nodes]
+    zdata[ii, jj] = uall[[n.dof for n in fem.dof.dof_nodes]]
     z_mask = np.ma.array(zdata, mask=mask)
-
-    fig, ax = plt.subplots()
     
     # Add information about the poisson.
     extent = [0, 2*nelx*a, 0, 2*nely*b]
@@ -97,13 +219,12 @@ def plot_poisson_solution(fem, uall, show=None):
         img = fem.poisson_domain.conductivity.T
     elif show == 'source':
         img = fem.poisson_domain.source.T
-    ax.imshow(img, extent=extent, origin='lower', cmap=cm.Pastel1)  
+    if show is not None:
+        ax.imshow(img, extent=extent, origin='lower', cmap=cm.Pastel1)  
     
     # Add the temperature distribution.
-    cs = ax.contour(mx, my, z_mask, 10, colors='k', interpolation='bilinear')
+    cs = ax.contour(mx, my, z_mask, 10, colors='k')
     ax.clabel(cs, inline=1, fontsize=10)
     ax.set_title('Temperature Distribution')
     ax.set_xlabel('Width (um)')
     ax.set_ylabel('Length(um)')
-    
-    plt.show()
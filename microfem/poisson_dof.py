@@ -1,4 +1,5 @@
 import numpy as np
+from .constraints import Prolongation
 
 
 class PoissonDOF(object):
@@ -13,8 +14,18 @@ class PoissonDOF(object):
         self.all_dofs = np.arange(mesh.n_node)
         self.fixed_dofs = [n.dof for n in self.dof_nodes if n.node.j == 0]
         self.free_dofs = np.setdiff1d(self.all_dofs, self.fixed_dofs)
+        
+        # The free DOFs exclude those of hanging nodes, which are constrained.
+        node_dofs = self.all_dofs[:, None]
+        self.prolongation = Prolongation(mesh.n_node, self.free_dofs, 
+                                         node_dofs, mesh.constraints)
+        self.free_dofs = self.prolongation.free_dofs
         self.n_dof = len(self.all_dofs)
         
+        # The DOFs of each element as a (n_elem, 4) array.
+        eds = [e.dofs for e in self.dof_elements]
+        self.element_dofs = np.array(eds, dtype=int).reshape(-1, 4)
+        
         
 class PoissonElement(object):
     
@@ -1,6 +1,9 @@
+import numpy as np
+
+
 class PoissonDomain(object):
     
-    def __init__(self, domain, conductivity, source, a, b):
+    def __init__(self, domain, conductivity, source, a, b, capacity=None):
         """
         Parameters
         ----------
@@ -8,11 +11,15 @@ class PoissonDomain(object):
             Half the element width in x-direction. The units are um.
         b : float
             Half the element width in y-direction. The units are um.
+        capacity : ndarray
+            The heat capacity per unit area of each element, used by 
+            transient analyses. Defaults to one for every element.
         """
         
         self.domain = domain
         self.conductivity = conductivity
         self.source = source
+        self.capacity = np.ones(domain.shape) if capacity is None else capacity
         self.a = a
         self.b = b
         
@@ -2,7 +2,9 @@ import numpy as np
 import scipy.sparse as sparse
 from .poisson_dof import PoissonDOF
 from .poisson_model import PoissonModel
-from .mesh import UniformMesh
+from .mesh import UniformMesh, QuadtreeMesh
+from .assembly import SparseAssembler, element_values, run_blocks
+from .solvers import factorize
 
 
 class PoissonFEM(object):
@@ -16,31 +18,77 @@ class PoissonFEM(object):
         The object provides access to the degrees-of-freedom and mesh 
         parameters.
     """
-    def __init__(self, poisson_domain):
-        
-        mesh = UniformMesh(poisson_domain.domain)
-        model = PoissonModel(poisson_domain.a, poisson_domain.b)
+    def __init__(self, poisson_domain, full_grid=False, ersatz=1e-6, 
+                 threads=None, adaptive=False, max_size=2, solver='auto'):
+        """
+        Parameters
+        ----------
+        poisson_domain : microfem.PoissonDomain
+            The domain, conductivity and sources of the problem.
+        full_grid : bool
+            If True, every node of the rectangular grid keeps a fixed DOF
+            number. Void elements have their conductivity scaled by (ersatz)
+            and no source, so the sparsity pattern and free DOFs don't depend
+            on the domain.
+        ersatz : float
+            The relative conductivity of void elements in a full grid model.
+        threads : int
+            The number of threads used to assemble the system matrices. The
+            matrices are bit-identical for any number of threads.
+        adaptive : bool
+            If True, blocks of solid elements with uniform conductivity, 
+            source and capacity are merged into larger elements, see 
+            `QuadtreeMesh`.
+        max_size : int
+            The largest element width of an adaptive mesh.
+        solver : string
+            The sparse direct solver backend, see `factorize`.
+        """
+        if adaptive is True and full_grid is True:
+            raise ValueError('An adaptive mesh cannot be a full grid.')
+        if adaptive is True:
+            fields = (poisson_domain.conductivity, poisson_domain.source, 
+                      poisson_domain.capacity)
+            mesh = QuadtreeMesh(poisson_domain.domain, max_size, fields)
+        else:
+            mesh = UniformMesh(poisson_domain.domain, full_grid)
         self.poisson_domain = poisson_domain
         self.dof = PoissonDOF(mesh)
-        self._ke = model.ke
-        self._fe = model.fe
+        self.threads = threads
+        self.solver = solver
+        
+        # One element model for each size of element, the matrices are stacks
+        # indexed by the kind of each element. The conduction matrix of an 
+        # element is unchanged by scaling both of its dimensions, so all sizes
+        # share the conduction matrix of the grid spacing.
+        sizes, self._kinds = np.unique(mesh.element_size, return_inverse=True)
+        models = [PoissonModel(s * poisson_domain.a, s * poisson_domain.b) 
+                  for s in sizes]
+        model = PoissonModel(poisson_domain.a, poisson_domain.b)
+        self._ke = np.array([model.ke for _ in models])
+        self._fe = np.array([m.fe for m in models])
+        self._ce = np.array([m.ce for m in models])
         self._k = mesh.domain2array(poisson_domain.conductivity)
         self._q = mesh.domain2array(poisson_domain.source)
         
+        # Apply the ersatz material to the void elements.
+        solid = mesh.domain2array(poisson_domain.domain) == 1
+        self._xk = np.where(solid, 1.0, ersatz)
+        self._k = self._xk * self._k
+        self._q = np.where(solid, self._q, 0.0)
+        self._c = self._xk * mesh.domain2array(poisson_domain.capacity)
+        self._solid = solid
+        self._factor = None
+        self._transient_factors = {}
         
-        # Create row and col vectors for sparce matrices 
-        def kr_term(e): return np.hstack([e.dofs for _ in range(4)])
-        def kc_term(e): return np.hstack([d*np.ones(4) for d in e.dofs]) 
-        kr = np.hstack([kr_term(e) for e in self.dof.dof_elements])
-        kc = np.hstack([kc_term(e) for e in self.dof.dof_elements])
-        fr = np.hstack([e.dofs for e in self.dof.dof_elements])
-        fc = np.zeros(fr.shape)
         
-        # Precomputed indexes of the sparse matrices.
-        self._k_index = (kr, kc)
-        self._f_index = (fr, fc)
-        self._k_shape = (self.dof.n_dof, self.dof.n_dof)
-        self._f_shape = (self.dof.n_dof, 1) 
+        # Precomputed maps from the element matrices to the sparse matrices.
+        dofs = self.dof.element_dofs
+        kr = np.repeat(dofs, 4, axis=1)
+        kc = np.tile(dofs, (1, 4))
+        fc = np.zeros(dofs.shape)
+        self._k_map = SparseAssembler(kr, kc, (self.dof.n_dof, self.dof.n_dof))
+        self._f_map = SparseAssembler(dofs, fc, (self.dof.n_dof, 1))
     
         # Assemble the conductivity and source matrices.
         self._ktau, self._ftau = self._assemble()
@@ -50,14 +98,14 @@ class PoissonFEM(object):
 
         if free is False:
             return self._ktau
-        return self._ktau[self.dof.free_dofs, :][:, self.dof.free_dofs]
+        return self.dof.prolongation.restrict(self._ktau)
     
     
     def get_heating_matrix(self, free=False):
         
         if free is False:
             return self._ftau
-        return self._ftau[self.dof.free_dofs, :]
+        return self.dof.prolongation.restrict_rows(self._ftau)
     
     
     def solve(self):
@@ -65,13 +113,206 @@ class PoissonFEM(object):
         and (ftau). Computes the solution of the equation Ku=f. Reinserts the
         boundary DOFs into the solution then returns.
         """
-        sysk = self.get_conduction_matrix(free=True)
-        sysf = self.get_heating_matrix(free=True)
-        ufree = sparse.linalg.spsolve(sysk, sysf)
-        uall = np.zeros(self.dof.all_dofs.shape)
-        uall[self.dof.free_dofs] = ufree
+        sysf = self.get_heating_matrix(free=True).toarray().ravel()
+        ufree = self._factorization().solve(sysf)
+        uall = self.dof.prolongation.prolong(ufree)
         return uall, ufree
     
+    
+    def solve_many(self, sources):
+        """Solves the equation Ku=f for many source configurations on the same
+        conductivity. The conduction matrix is factorized once and all the 
+        load vectors are solved as one block.
+        
+        Parameters
+        ----------
+        sources : ndarray
+            The (n_cases, nelx, nely) stack of element sources.
+            
+        Returns
+        -------
+        uall : ndarray
+            The (n_dof, n_cases) array of solutions including the boundary 
+            DOFs.
+        """
+        sources = np.asarray(sources, dtype=float)
+        if sources.ndim == 2:
+            sources = sources[None, :, :]
+        
+        # Element sources of each case, zero on void elements.
+        ei, ej = self.dof.mesh.element_ij.T
+        q = sources[:, ei, ej] * self._solid
+        
+        # Scatter the element load vectors (fe) of all cases in one product.
+        n_elem = len(ei)
+        rows = self.dof.element_dofs.ravel()
+        cols = np.repeat(np.arange(n_elem), 4)
+        vals = self._fe.reshape(len(self._fe), -1)[self._kinds].ravel()
+        load = sparse.csr_matrix((vals, (rows, cols)), 
+                                 shape=(self.dof.n_dof, n_elem))
+        f = self.dof.prolongation.restrict_rows(load @ q.T)
+        
+        ufree = self._factorization().solve(np.ascontiguousarray(f))
+        return self.dof.prolongation.prolong(ufree)
+    
+    
+    def sensitivity(self, objective='compliance', probe=None, p=8):
+        """Computes an objective of the temperature and its derivative with 
+        respect to the conductivity of every element using the adjoint 
+        method. The adjoint equation K lambda = dJ/du is solved with the 
+        factorization of the forward problem, so the cost is about two solves.
+        The derivative is then -lambda_e' ke u_e for each element.
+        
+        Parameters
+        ----------
+        objective : string
+            'compliance' is f'u. 'mean' is the average temperature of all 
+            nodes. 'probe' is the average temperature at the DOFs (probe). 
+            'max' is the p-norm of the temperatures at the DOFs (probe), or
+            all DOFs if (probe) is None, a differentiable approximation of the
+            maximum temperature that assumes the temperatures are positive.
+        probe : int or list of int
+            The DOFs of the probes.
+        p : float
+            The exponent of the p-norm for the 'max' objective.
+        
+        Returns
+        -------
+        value : float
+            The value of the objective.
+        grad : ndarray
+            The (nelx, nely) array of derivatives with respect to the element
+            conductivities. Elements not in the mesh have zero derivative.
+        """
+        uall, _ = self.solve()
+        n_dof = self.dof.n_dof
+        
+        if objective == 'compliance':
+            f = self.get_heating_matrix().toarray().ravel()
+            value, dj = f @ uall, f
+        elif objective == 'mean':
+            value, dj = np.mean(uall), np.full(n_dof, 1 / n_dof)
+        elif objective in ('probe', 'max'):
+            probe = self.dof.all_dofs if probe is None else probe
+            probe = np.atleast_1d(probe)
+            dj = np.zeros(n_dof)
+            if objective == 'probe':
+                value = np.mean(uall[probe])
+                np.add.at(dj, probe, 1 / len(probe))
+            else:
+                value = np.sum(uall[probe] ** p) ** (1 / p)
+                np.add.at(dj, probe, (uall[probe] / value) ** (p - 1))
+        else:
+            raise ValueError('Unknown objective %s.' % objective)
+        
+        # The compliance is self-adjoint, otherwise solve the adjoint problem.
+        if objective == 'compliance':
+            lall = uall
+        else:
+            prolongation = self.dof.prolongation
+            lfree = self._factorization().solve(prolongation.restrict_rows(dj))
+            lall = prolongation.prolong(lfree)
+        
+        dofs = self.dof.element_dofs
+        def element_sensitivity(block):
+            ue = uall[dofs[block]]
+            le = lall[dofs[block]]
+            ke = self._ke[self._kinds[block]]
+            return -np.einsum('ei,eij,ej->e', le, ke, ue)
+        de = np.concatenate(run_blocks(element_sensitivity, len(dofs), 
+                                       self.threads))
+        
+        # The conductivity of a merged element is the mean of its grid 
+        # elements, so its derivative is shared evenly between them.
+        grad = np.zeros(self.poisson_domain.domain.shape)
+        sizes = self.dof.mesh.element_size
+        de = self._xk * de / sizes ** 2
+        for (i, j), s, d in zip(self.dof.mesh.element_ij, sizes, de):
+            grad[i:i + s, j:j + s] = d
+        return value, grad
+    
+    
+    def get_capacity_matrix(self, free=False, lumped=False):
+        """The heat capacity matrix. The lumped matrix is diagonal with the 
+        row sums of the consistent matrix.
+        """
+        cv = element_values(self._c, self._ce, self.threads, self._kinds)
+        ctau = self._k_map.assemble(cv, self.threads)
+        if lumped is True:
+            ctau = sparse.diags(np.asarray(ctau.sum(axis=1)).ravel(), 
+                                format='csr')
+        if free is False:
+            return ctau
+        return self.dof.prolongation.restrict(ctau)
+    
+    
+    def transient(self, dt, n_steps, u0=None, theta=1.0, lumped=False, 
+                  stride=1, writer=None):
+        """Integrates the heat equation C du/dt + K u = f in time from the
+        initial temperature (u0) with the theta method. The matrix 
+        (C + theta dt K) is factorized once for each time step size and 
+        reused, including by later calls. This is a generator that yields 
+        snapshots every (stride) steps, so the full time history is never 
+        held in memory.
+        
+        Parameters
+        ----------
+        dt : float
+            The time step.
+        n_steps : int
+            The number of time steps.
+        u0 : ndarray
+            The initial temperature of all DOFs. Defaults to zero.
+        theta : float
+            1.0 is implicit Euler and 0.5 is Crank-Nicolson.
+        lumped : bool
+            If True, the lumped capacity matrix is used.
+        stride : int
+            The number of time steps between snapshots.
+        writer : microfem.ResultWriter
+            If given, each snapshot is also appended to the writer with the 
+            fields 't' and 'u'.
+            
+        Yields
+        ------
+        t : float
+            The time of the snapshot.
+        uall : ndarray
+            The temperature of all DOFs at time (t).
+        """
+        prolongation = self.dof.prolongation
+        key = (dt, theta, lumped)
+        if key not in self._transient_factors:
+            c = self.get_capacity_matrix(free=True, lumped=lumped)
+            k = self.get_conduction_matrix(free=True)
+            lu = factorize(c + theta * dt * k, self.solver, definite=True)
+            rhs = (c - (1 - theta) * dt * k).tocsr()
+            self._transient_factors[key] = (lu, rhs)
+        lu, rhs = self._transient_factors[key]
+        f = dt * self.get_heating_matrix(free=True).toarray().ravel()
+        
+        u = np.zeros(prolongation.n_free)
+        if u0 is not None:
+            u = np.asarray(u0, dtype=float)[prolongation.free_dofs]
+        
+        for step in range(1, n_steps + 1):
+            u = lu.solve(rhs @ u + f)
+            if step % stride == 0 or step == n_steps:
+                uall = prolongation.prolong(u)
+                if writer is not None:
+                    writer.append(t=np.float64(step * dt), u=uall)
+                yield step * dt, uall
+    
+    
+    def _factorization(self):
+        """The factorization of the conduction matrix of the free DOFs. It
+        is computed once and reused by all solves.
+        """
+        if self._factor is None:
+            sysk = self.get_conduction_matrix(free=True)
+            self._factor = factorize(sysk, self.solver, definite=True)
+        return self._factor
+    
         
     def _assemble(self):
         """
@@ -80,14 +321,8 @@ class PoissonFEM(object):
         matrices (self._ke, self._fe) for each element and assembles them into
         sparse matrices (self.ktau, self.ftau).
         """
-        kexpand = np.expand_dims(self._k, axis=1)
-        fexpand = np.expand_dims(self._q, axis=1)
-        kv = np.ravel(kexpand @ np.expand_dims(self._ke.ravel(), axis=0))
-        fv = np.ravel(fexpand @ self._fe.T)
-
-        sysk = sparse.coo_matrix((kv, self._k_index), shape=self._k_shape)
-        sysf = sparse.coo_matrix((fv, self._f_index), shape=self._f_shape)
-        ktau = sysk.tocsr()
-        ftau = sysf.tocsr()
+        kv = element_values(self._k, self._ke, self.threads, self._kinds)
+        fv = element_values(self._q, self._fe, self.threads, self._kinds)
+        ktau = self._k_map.assemble(kv, self.threads)
+        ftau = self._f_map.assemble(fv, self.threads)
         return ktau, ftau
-    
\ No newline at end of file
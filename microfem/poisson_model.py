@@ -16,10 +16,13 @@ class PoissonModel(object):
         points = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) / np.sqrt(3)
         self._ke = np.zeros((4, 4))
         self._fe = np.zeros((4, 1))
+        self._ce = np.zeros((4, 4))
         for p in points:
             n, dndxi, dndeta = self.shapes(p)
-            self._ke += a*b * (dndxi.T @ dndxi / a*a + dndeta.T @ dndeta / b*b)
+            self._ke += a*b * (dndxi.T @ dndxi / (a*a) + 
+                               dndeta.T @ dndeta / (b*b))
             self._fe += a*b * n.T
+            self._ce += a*b * n.T @ n
             
     
     @property
@@ -30,6 +33,12 @@ class PoissonModel(object):
     @property
     def fe(self):
         return self._fe
+    
+    
+    @property
+    def ce(self):
+        """The consistent capacity matrix of the element."""
+        return self._ce
         
           
     @staticmethod
@@ -0,0 +1,230 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sparse
+
+from .solvers import factorize
+
+
+class ReducedModel(object):
+    """A reduced order model of the transfer function from the inputs to
+    the outputs of a plate or laminate,
+
+        (K_r - w^2 M_r) q = B_r u
+        y = C_r q
+
+    where (q) are the reduced coordinates, see `krylov_reduction`. The
+    model is diagonalized once, so the transfer function is evaluated at
+    any frequency from the modes of the reduced model, which takes a few
+    microseconds per frequency.
+
+    The reduced coordinates are built in rounds of one block of moments of
+    each expansion frequency, and the coordinates of the earlier rounds
+    span a reduced model of lower order. The difference of the transfer
+    functions of the model and the model of one round less estimates the
+    error of the model of one round less, so it usually overestimates the
+    error of the model itself, see `error_estimate`.
+
+    Public Attributes
+    -----------------
+    self.m : ndarray
+        The (n_red, n_red) reduced mass matrix.
+    self.k : ndarray
+        The (n_red, n_red) reduced stiffness matrix.
+    self.b : ndarray
+        The (n_red, n_inputs) reduced input matrix.
+    self.c : ndarray
+        The (n_outputs, n_red) reduced output matrix.
+    self.rounds : list
+        The number of reduced coordinates after each round.
+    """
+
+    def __init__(self, m, k, b, c, rounds=None):
+        """
+        Parameters
+        ----------
+        m, k, b, c : ndarray
+            The reduced mass, stiffness, input and output matrices.
+        rounds : list
+            The number of reduced coordinates after each round. Defaults to
+            a single round of all the coordinates.
+        """
+        self.m = m
+        self.k = k
+        self.b = b
+        self.c = c
+        self.rounds = [len(k)] if rounds is None else list(rounds)
+        self._w, phi = scipy.linalg.eigh(k, m)
+        self._phib = phi.T @ b
+        self._cphi = c @ phi
+
+
+    @property
+    def order(self):
+        return len(self.k)
+
+
+    def natural_frequencies(self):
+        """Returns the natural frequencies of the reduced model in Hz. The
+        frequencies near the expansion frequencies are accurate.
+        """
+        return np.sqrt(np.abs(self._w)) / (2 * np.pi)
+
+
+    def transfer(self, freqs, zeta=0.0, rayleigh=None):
+        """Returns the complex (n_freqs, n_outputs, n_inputs) transfer
+        function at the frequencies (freqs) in Hz, with the modal damping
+        ratio (zeta), a scalar or the ratio of each mode of the reduced
+        model, and the Rayleigh damping (rayleigh) = (alpha, beta).
+        """
+        omega = 2 * np.pi * np.atleast_1d(np.asarray(freqs, dtype=float))
+        wn = np.sqrt(self._w)
+        ratio = self._damping_ratio(zeta, rayleigh)
+        d = self._w - omega[:, None] ** 2 + 2j * ratio * wn * omega[:, None]
+        return np.einsum('or,fr,ri->foi', self._cphi, 1 / d, self._phib,
+                         optimize=True)
+
+
+    def error_estimate(self, freqs, zeta=0.0, rayleigh=None):
+        """Returns the estimate of the relative error of the transfer
+        function at the frequencies (freqs) in Hz, the norm of the
+        difference to the model of one round less relative to the norm of
+        the transfer function at each frequency.
+        """
+        if len(self.rounds) < 2:
+            raise ValueError('The error estimate requires at least two '
+                             'rounds of moments.')
+        h = self.transfer(freqs, zeta, rayleigh)
+        previous = self.truncate(len(self.rounds) - 1)
+        diff = h - previous.transfer(freqs, zeta, rayleigh)
+        return (np.linalg.norm(diff, axis=(1, 2)) /
+                np.linalg.norm(h, axis=(1, 2)))
+
+
+    def truncate(self, n_rounds):
+        """Returns the reduced model of the first (n_rounds) rounds of
+        moments.
+        """
+        n = self.rounds[n_rounds - 1]
+        return ReducedModel(self.m[:n, :n], self.k[:n, :n], self.b[:n],
+                            self.c[:, :n], self.rounds[:n_rounds])
+
+
+    def state_space(self, zeta=0.0, rayleigh=None):
+        """Returns the matrices (A, B, C, D) of the first order state-space
+        model of the modal coordinates of the reduced model and their
+        velocities, with the damping of `transfer`, for example to design a
+        controller with scipy.signal.StateSpace.
+        """
+        n = self.order
+        wn = np.sqrt(self._w)
+        ratio = self._damping_ratio(zeta, rayleigh)
+        a = np.zeros((2 * n, 2 * n))
+        a[:n, n:] = np.eye(n)
+        a[n:, :n] = -np.diag(self._w)
+        a[n:, n:] = -np.diag(2 * ratio * wn)
+        b = np.vstack((np.zeros_like(self._phib), self._phib))
+        c = np.hstack((self._cphi, np.zeros_like(self._cphi)))
+        d = np.zeros((c.shape[0], b.shape[1]))
+        return a, b, c, d
+
+
+    def _damping_ratio(self, zeta, rayleigh):
+        """The damping ratio of each mode of the reduced model."""
+        alpha, beta = (0.0, 0.0) if rayleigh is None else rayleigh
+        wn = np.sqrt(self._w)
+        return zeta + 0.5 * alpha / wn + 0.5 * beta * wn
+
+
+def krylov_reduction(fem, inputs, outputs, n_moments=8,
+                     expansion_freqs=(0.0,), tol=1e-8):
+    """Reduces the transfer function from the (inputs) to the (outputs) of
+    the plate or laminate (fem) by moment matching. The reduced coordinates
+    are an M-orthonormal basis of the block Krylov spaces
+
+        (K - s M)^-1 B, ((K - s M)^-1 M) (K - s M)^-1 B, ...
+
+    of each expansion frequency, with s = (2 pi f0)^2, found by block
+    Arnoldi. The Galerkin projection of the equations of motion onto the
+    basis matches the first (n_moments) moments of the transfer function
+    about each expansion frequency. The factorization of the stiffness
+    matrix is reused for an expansion frequency of zero, and the shifted
+    matrix is factorized once for any other expansion frequency.
+
+    Parameters
+    ----------
+    fem : microfem.PlateFEM or microfem.LaminateFEM
+        The finite element model.
+    inputs : scipy.sparse matrix or ndarray
+        The (n_mdof, n_inputs) load vectors of all DOFs of the inputs.
+    outputs : scipy.sparse matrix or ndarray
+        The (n_outputs, n_mdof) operator of the outputs.
+    n_moments : int
+        The number of moments matched about each expansion frequency.
+    expansion_freqs : tuple
+        The expansion frequencies in Hz, which should not be natural
+        frequencies.
+    tol : float
+        The relative tolerance of the deflation of linearly dependent
+        directions of the Krylov blocks.
+
+    Returns
+    -------
+    model : microfem.ReducedModel
+        The reduced model.
+    """
+    prolongation = fem.dof.prolongation
+    k = fem.get_stiffness_matrix(free=True)
+    m = fem.get_mass_matrix(free=True)
+    b = prolongation.restrict_rows(inputs)
+    b = b.toarray() if sparse.issparse(b) else np.asarray(b)
+    b = b.reshape(b.shape[0], -1)
+    if not sparse.issparse(outputs):
+        outputs = np.atleast_2d(outputs)
+    c = prolongation.restrict_rows(outputs.T).T
+
+    factors = []
+    for f0 in expansion_freqs:
+        sigma = (2 * np.pi * f0) ** 2
+        if sigma == 0:
+            factors.append(fem.factorize_stiffness())
+        else:
+            factors.append(factorize(k - sigma * m, fem.solver,
+                                     symmetric=True))
+
+    # One block of each expansion frequency in each round, so the basis of
+    # the earlier rounds spans the Krylov spaces of fewer moments.
+    basis = np.zeros((k.shape[0], 0))
+    mbasis = np.zeros((k.shape[0], 0))
+    blocks = [b] * len(factors)
+    rounds = []
+    for _ in range(n_moments):
+        for i, factor in enumerate(factors):
+            rhs = b if not rounds else m @ blocks[i]
+            if rhs.shape[1] == 0:
+                continue
+            block = factor.solve(rhs).reshape(rhs.shape)
+            block = _orthonormalize(block, basis, mbasis, m, tol)
+            blocks[i] = block
+            basis = np.hstack((basis, block))
+            mbasis = np.hstack((mbasis, m @ block))
+        rounds.append(basis.shape[1])
+
+    mr = basis.T @ mbasis
+    kr = basis.T @ (k @ basis)
+    return ReducedModel(0.5 * (mr + mr.T), 0.5 * (kr + kr.T), basis.T @ b,
+                        np.asarray(c @ basis), rounds)
+
+
+def _orthonormalize(block, basis, mbasis, m, tol):
+    """M-orthonormalizes the columns of (block) against the M-orthonormal
+    (basis) by two passes of block Gram-Schmidt, and against each other by
+    the eigen-decomposition of their Gram matrix. The directions with a
+    norm below (tol) relative to the largest column of the block are
+    dropped.
+    """
+    scale = np.max(np.einsum('ij,ij->j', block, m @ block))
+    for _ in range(2):
+        block = block - basis @ (mbasis.T @ block)
+    d, e = np.linalg.eigh(block.T @ (m @ block))
+    keep = d > tol ** 2 * scale
+    return block @ (e[:, keep] / np.sqrt(d[keep]))
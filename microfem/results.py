@@ -0,0 +1,349 @@
+import os
+import json
+import numpy as np
+
+from .tracking import normalize_signs
+
+
+# The header of every field file has room for a record count of this many
+# digits and is padded to a multiple of 64 bytes, so the shape in the header
+# can be rewritten in place as records are appended.
+_COUNT_DIGITS = 18
+
+# The file that lists the fields of the results.
+_MANIFEST = 'fields.json'
+
+
+class ResultWriter(object):
+    """Streams the results of long parameter sweeps and optimizations to disk.
+    Results are appended one record at a time. Each field of a record is
+    stored in its own .npy file in the results directory, and the design
+    metadata of each record is a line of metadata.jsonl. The .npy files are
+    rewritten in place as they grow, so they can be loaded or memory-mapped
+    by numpy at any time, and a crash only loses the records that haven't
+    been flushed. The names of the fields are listed in fields.json, and
+    only the files of these fields are ever removed.
+
+    Every record must have the same fields, and each field must have the
+    same shape and type in every record.
+
+    Public Attributes
+    -----------------
+    self.path : string
+        The results directory.
+    self.n_records : int
+        The number of records appended, including unflushed records.
+    """
+
+    def __init__(self, path, mode='w', chunk_size=1):
+        """
+        Parameters
+        ----------
+        path : string
+            The results directory. It is created if it doesn't exist.
+        mode : string
+            'w' to start new results or 'a' to append to existing results. 
+            A directory that isn't empty must hold earlier results, whose
+            fields are removed in mode 'w'. In mode 'a' every field and the
+            metadata are truncated to the records that were completely
+            written, so records lost in a crash are overwritten.
+        chunk_size : int
+            The number of records buffered in memory before being written.
+        """
+        if mode not in ('w', 'a'):
+            raise ValueError('The mode must be either w or a.')
+
+        self._meta_filename = os.path.join(path, 'metadata.jsonl')
+        manifest = os.path.join(path, _MANIFEST)
+        if (os.path.isdir(path) and os.listdir(path) and 
+                not os.path.exists(self._meta_filename) and
+                not os.path.exists(manifest)):
+            raise ValueError('%s is not empty and does not hold results.' % 
+                             path)
+
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_size = chunk_size
+        self._files = {}
+        self._buffer = []
+
+        if mode == 'w':
+            if os.path.exists(manifest):
+                for name in _field_names(path):
+                    filename = _field_filename(path, name)
+                    if os.path.exists(filename):
+                        os.remove(filename)
+            _write_manifest(path, [])
+            open(self._meta_filename, 'w').close()
+            self.n_records = 0
+        else:
+            if not os.path.exists(self._meta_filename):
+                open(self._meta_filename, 'w').close()
+            self.n_records = len(ResultReader(path))
+            for name in _field_names(path):
+                self._files[name] = _FieldFile.open(path, name)
+                self._files[name].truncate(self.n_records)
+            _truncate_lines(self._meta_filename, self.n_records)
+            _write_manifest(path, list(self._files))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def append(self, metadata=None, **fields):
+        """Appends a record. The keyword arguments are the arrays of each
+        field and (metadata) is a dictionary of JSON compatible values that
+        describe the design.
+        """
+        fields = {k: np.asarray(v) for k, v in fields.items()}
+        if self._files:
+            names = set(self._files)
+        else:
+            names = set(self._buffer[0][1]) if self._buffer else set(fields)
+        if names != set(fields):
+            raise ValueError('Each record must have the same fields.')
+
+        self._buffer.append((metadata or {}, fields))
+        self.n_records += 1
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+
+    def append_modal(self, fem, w, vall, deflection_only=False,
+                     metadata=None, normalize=False, **fields):
+        """Appends the results of a modal analysis. The frequencies (Hz) are
+        stored in the field 'freq' and the mode shapes in 'modes'.
+
+        If (deflection_only) is True, only the deflection of each node is
+        stored, on the full grid of nodes with shape (nelx+1, nely+1, n_modes).
+        Nodes that are not part of the mesh are NaN, so records of different
+        topologies have the same shape.
+
+        If (normalize) is True, the sign of each mode is normalized before it
+        is stored, so the modes of similar designs have the same sign. The 
+        signs of the grid deflection are normalized by a reference on the 
+        grid of nodes, so they are comparable across topologies. Otherwise 
+        the mode shapes are copied to normalize their signs, see 
+        `normalize_signs`.
+        """
+        freq = np.sqrt(np.abs(w)) / (2 * np.pi)
+        if deflection_only is True:
+            mesh = fem.dof.mesh
+            nelx, nely = mesh.shape
+            modes = np.full((nelx + 1, nely + 1, vall.shape[1]), np.nan)
+            ii, jj = mesh.node_ij[:, 0], mesh.node_ij[:, 1]
+            modes[ii, jj, :] = vall[fem.dof.deflection_dofs, :]
+            if normalize is True:
+                rng = np.random.default_rng(0)
+                reference = rng.standard_normal((nelx + 1, nely + 1))
+                signs = np.sign(np.einsum('ij,ijm->m', reference, 
+                                          np.nan_to_num(modes)))
+                modes *= np.where(signs == 0, 1, signs)
+        elif normalize is True:
+            modes = normalize_signs(vall)
+        else:
+            modes = vall
+        self.append(metadata, freq=freq, modes=modes, **fields)
+
+
+    def flush(self):
+        """Writes the buffered records to disk."""
+        if not self._buffer:
+            return
+        for name in self._buffer[0][1]:
+            if name not in self._files:
+                array = self._buffer[0][1][name]
+                self._files[name] = _FieldFile.create(self.path, name, array)
+                _write_manifest(self.path, list(self._files))
+
+            stack = np.stack([fields[name] for _, fields in self._buffer])
+            self._files[name].append(stack)
+
+        with open(self._meta_filename, 'a') as fh:
+            for metadata, _ in self._buffer:
+                fh.write(json.dumps(metadata, default=_to_json) + '\n')
+        self._buffer = []
+
+
+    def close(self):
+        self.flush()
+
+
+class ResultReader(object):
+    """Reads the results written by a `ResultWriter`. Fields are memory-mapped
+    so any subset of records can be read without loading the whole file.
+    """
+
+    def __init__(self, path):
+
+        self.path = path
+        self.fields = _field_names(path)
+
+
+    def __len__(self):
+        counts = [_FieldFile.open(self.path, n).n_records for n in self.fields]
+        meta = _count_lines(os.path.join(self.path, 'metadata.jsonl'))
+        return min(counts + [meta])
+
+
+    def __getitem__(self, field):
+        """Returns a read-only memory map of all the records of a field."""
+        if field not in self.fields:
+            raise KeyError(field)
+        mm = np.load(_field_filename(self.path, field), mmap_mode='r')
+        return mm[:len(self)]
+
+
+    def read(self, field, records):
+        """Loads the given records (an index, slice or list of indices) of a
+        field into memory.
+        """
+        return np.array(self[field][records])
+
+
+    def metadata(self, records=None):
+        """Returns the list of metadata dictionaries of the records."""
+        filename = os.path.join(self.path, 'metadata.jsonl')
+        with open(filename) as fh:
+            meta = [json.loads(line) for line in fh][:len(self)]
+        if records is None:
+            return meta
+        return [meta[i] for i in np.arange(len(meta))[records]]
+
+
+class _FieldFile(object):
+    """An appendable .npy file with a fixed size header. The size of the
+    header is set by the dtype and shape of the field when the file is 
+    created.
+    """
+
+    def __init__(self, filename, dtype, record_shape, n_records, 
+                 header_size=None):
+
+        self.filename = filename
+        self.dtype = dtype
+        self.record_shape = record_shape
+        self.n_records = n_records
+        self.header_size = header_size
+
+
+    @classmethod
+    def create(cls, path, name, array):
+
+        field = cls(_field_filename(path, name), array.dtype, array.shape, 0)
+        # The header of the largest record count, rounded up to 64 bytes.
+        size = len(field._header_text(10 ** _COUNT_DIGITS - 1)) + 10 + 1
+        field.header_size = -(-size // 64) * 64
+        if field.header_size > 65535:
+            raise ValueError('The dtype of the field %s is too large.' % name)
+        with open(field.filename, 'wb') as fh:
+            fh.write(field._header())
+        return field
+
+
+    @classmethod
+    def open(cls, path, name):
+
+        filename = _field_filename(path, name)
+        with open(filename, 'rb') as fh:
+            np.lib.format.read_magic(fh)
+            shape, _, dtype = np.lib.format.read_array_header_1_0(fh)
+            header_size = fh.tell()
+        return cls(filename, dtype, shape[1:], shape[0], header_size)
+
+
+    def append(self, stack):
+
+        if stack.shape[1:] != self.record_shape:
+            raise ValueError('The shape of the field %s has changed.' %
+                             os.path.basename(self.filename))
+        with open(self.filename, 'r+b') as fh:
+            fh.seek(self.header_size + self._record_bytes() * self.n_records)
+            fh.write(np.ascontiguousarray(stack, dtype=self.dtype).tobytes())
+            fh.flush()
+            self.n_records += len(stack)
+            fh.seek(0)
+            fh.write(self._header())
+
+
+    def truncate(self, n_records):
+        """Removes the records after the first (n_records)."""
+        if n_records >= self.n_records:
+            return
+        self.n_records = n_records
+        with open(self.filename, 'r+b') as fh:
+            fh.truncate(self.header_size + self._record_bytes() * n_records)
+            fh.seek(0)
+            fh.write(self._header())
+
+
+    def _record_bytes(self):
+        return int(np.prod(self.record_shape)) * self.dtype.itemsize
+
+
+    def _header(self):
+
+        header = self._header_text(self.n_records)
+        if len(header) + 10 + 1 > self.header_size:
+            raise ValueError('The header of %s is full.' % self.filename)
+        header = header.ljust(self.header_size - 10 - 1) + '\n'
+        return (np.lib.format.MAGIC_PREFIX + b'\x01\x00' +
+                len(header).to_bytes(2, 'little') + header.encode('latin1'))
+
+
+    def _header_text(self, n_records):
+
+        shape = (n_records,) + tuple(self.record_shape)
+        descr = np.lib.format.dtype_to_descr(self.dtype)
+        return "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            descr, shape)
+
+
+def _field_filename(path, name):
+    return os.path.join(path, name + '.npy')
+
+
+def _field_names(path):
+    """The fields listed in the manifest, or every .npy file of results
+    written before the manifest existed.
+    """
+    if not os.path.isdir(path):
+        return []
+    manifest = os.path.join(path, _MANIFEST)
+    if os.path.exists(manifest):
+        with open(manifest) as fh:
+            return sorted(json.load(fh))
+    return sorted(f[:-4] for f in os.listdir(path) if f.endswith('.npy'))
+
+
+def _write_manifest(path, names):
+    with open(os.path.join(path, _MANIFEST), 'w') as fh:
+        json.dump(sorted(names), fh)
+
+
+def _truncate_lines(filename, n_lines):
+    with open(filename) as fh:
+        lines = fh.readlines()
+    if len(lines) > n_lines:
+        with open(filename, 'w') as fh:
+            fh.writelines(lines[:n_lines])
+
+
+def _count_lines(filename):
+    if not os.path.exists(filename):
+        return 0
+    with open(filename) as fh:
+        return sum(1 for _ in fh)
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('%r is not JSON serializable.' % value)
@@ -0,0 +1,506 @@
+"""A long-lived evaluation service. The service reads one JSON request per
+line and writes one JSON response per line, either on stdin/stdout or on a
+local Unix socket. The finite element models, factorizations and results are
+cached between requests, so a client that evaluates many topologies only pays
+for building each model once.
+
+    python -m microfem.serve                       # stdin/stdout
+    python -m microfem.serve --socket /tmp/fem.sock
+    python -m microfem.serve --socket /tmp/fem.sock --workers 4
+
+With (--workers) the process is a dispatcher that forwards each request to
+the least busy of several worker daemons, each with its own caches.
+
+A request is an object with the key 'analysis', one of 'modal', 'static',
+'poisson' or 'stats', and an optional 'id' that is copied to the response.
+The modal and static analyses take the keys:
+
+    'fem'       : 'laminate' (default) or 'plate'.
+    'material'  : 'PiezoMumps' (default for laminates) or 'SoiMumps'.
+    'topology'  : The nested list of the binary topology.
+    'a', 'b'    : Half the element dimensions in um.
+    'element'   : The element type, see `element_shapes`.
+    'full_grid' : If True (default), one model is kept for each shape of
+                  topology and only its topology is updated, see
+                  `LaminateFEM.update_topology`.
+    'n_modes'   : The number of modes of a modal analysis.
+    'modes'     : If True, the modal analysis also returns the deflection of
+                  the mesh nodes of each mode.
+    'coords'    : The (x, y) point in um of the static load and deflection.
+                  Defaults to the middle of the free edge.
+    'force'     : The force in N at (coords) of a static analysis.
+    'voltage'   : The voltage of the piezoelectric layer of a static analysis
+                  of a laminate.
+
+A Poisson analysis takes the keys 'domain', 'conductivity', 'source', 'a',
+'b', and optionally 'sources', a list of source arrays solved together.
+
+A response has the key 'ok', and either 'result' or 'error', as well as
+'latency' in s and 'cached' if the result was cached.
+"""
+import argparse
+import collections
+import hashlib
+import io
+import json
+import os
+import signal
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .cantilevers import Cantilever
+from .laminate_fem import LaminateFEM
+from .laminate_materials import PiezoMumpsMaterial, SoiMumpsModel
+from .plate_fem import PlateFEM
+from .plate_materials import SoiMumpsMaterial
+from .poisson_domain import PoissonDomain
+from .poisson_fem import PoissonFEM
+from .analysis_laminate_displacement import LaminateDisplacement
+from .analysis_plate_displacement import PlateDisplacement
+
+
+_MATERIALS = {('laminate', 'PiezoMumps'): PiezoMumpsMaterial,
+              ('laminate', 'SoiMumps'): SoiMumpsModel,
+              ('plate', 'SoiMumps'): SoiMumpsMaterial}
+
+_DEFAULT_MATERIALS = {'laminate': 'PiezoMumps', 'plate': 'SoiMumps'}
+
+
+class LRUCache(object):
+    """A dictionary that keeps at most (size) items, discarding the least
+    recently used. It counts its hits and misses.
+    """
+
+    def __init__(self, size):
+
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+
+
+    def get(self, key):
+
+        if key in self._items:
+            self.hits += 1
+            self._items.move_to_end(key)
+            return self._items[key]
+        self.misses += 1
+        return None
+
+
+    def put(self, key, value):
+
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.size:
+            self._items.popitem(last=False)
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def stats(self):
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+class Service(object):
+    """Evaluates requests with warm caches. The models are cached by their
+    material, element dimensions and shape of topology, so the element
+    matrices, DOFs and scatter maps are reused. The factorizations of the
+    static analyses and the results of all analyses are cached by the
+    topology, so repeated requests are answered without solving.
+
+    Public Attributes
+    -----------------
+    self.counters : dict
+        The number of requests and errors, and the total and largest latency
+        in s, of each analysis.
+    """
+
+    def __init__(self, max_models=8, max_factors=16, max_results=1024):
+        """
+        Parameters
+        ----------
+        max_models : int
+            The number of finite element models kept.
+        max_factors : int
+            The number of factorized stiffness matrices kept.
+        max_results : int
+            The number of results kept.
+        """
+        self.models = LRUCache(max_models)
+        self.factors = LRUCache(max_factors)
+        self.results = LRUCache(max_results)
+        self.counters = collections.defaultdict(
+            lambda: {'requests': 0, 'errors': 0, 'latency': 0.0,
+                     'max_latency': 0.0})
+        self._lock = threading.Lock()
+        self._handlers = {'modal': self._modal, 'static': self._static,
+                          'poisson': self._poisson, 'stats': self._stats}
+
+
+    def handle(self, request):
+        """Evaluates a request and returns the response. Requests are
+        evaluated one at a time since the models are shared.
+        """
+        with self._lock:
+            start = time.perf_counter()
+            is_dict = isinstance(request, dict)
+            analysis = request.get('analysis') if is_dict else None
+            response = {'id': request.get('id')} if is_dict else {}
+            try:
+                if analysis not in self._handlers:
+                    raise ValueError('Unknown analysis %s.' % analysis)
+                result, cached = self._cached(analysis, request)
+                response.update(ok=True, result=result, cached=cached)
+            except Exception as e:
+                response.update(ok=False, error='%s: %s' %
+                                (type(e).__name__, e))
+            latency = time.perf_counter() - start
+            response['latency'] = latency
+
+            counter = self.counters[str(analysis)]
+            counter['requests'] += 1
+            counter['errors'] += 0 if response['ok'] else 1
+            counter['latency'] += latency
+            counter['max_latency'] = max(counter['max_latency'], latency)
+            return response
+
+
+    def _cached(self, analysis, request):
+
+        if analysis == 'stats':
+            return self._stats(request), False
+        key = _digest({k: v for k, v in request.items() if k != 'id'})
+        result = self.results.get(key)
+        if result is not None:
+            return result, True
+        result = self._handlers[analysis](request)
+        self.results.put(key, result)
+        return result, False
+
+
+    def _model(self, request):
+        """Returns the model of a modal or static request with its topology,
+        and the key of the topology.
+        """
+        kind = request.get('fem', 'laminate')
+        name = request.get('material', _DEFAULT_MATERIALS.get(kind))
+        if (kind, name) not in _MATERIALS:
+            raise ValueError('Unknown %s material %s.' % (kind, name))
+        topology = np.array(request['topology'], dtype=float)
+        a, b = float(request['a']), float(request['b'])
+        element = request.get('element', 'q4')
+        full_grid = bool(request.get('full_grid', True))
+
+        topology_key = _digest(topology)
+        key = (kind, name, a, b, topology.shape, element, full_grid)
+        if full_grid is False:
+            key = key + (topology_key,)
+        cached = self.models.get(key)
+
+        nelx, nely = topology.shape
+        if cached is None:
+            cantilever = Cantilever(topology, a, b, nelx * a, 2 * nely * b)
+            fem_class = LaminateFEM if kind == 'laminate' else PlateFEM
+            fem = fem_class(_MATERIALS[kind, name](), cantilever,
+                            full_grid=full_grid, element=element)
+            self.models.put(key, (fem, topology_key))
+        else:
+            fem, current_key = cached
+            if current_key != topology_key:
+                fem.update_topology(topology)
+                self.models.put(key, (fem, topology_key))
+        return fem, kind, key + (topology_key,)
+
+
+    def _modal(self, request):
+
+        fem, _, _ = self._model(request)
+        w, _, vall = fem.modal_analysis(n_modes=int(request.get('n_modes', 3)))
+        result = {'freq': (np.sqrt(w) / (2 * np.pi)).tolist()}
+        if request.get('modes', False):
+            result['modes'] = vall[fem.dof.deflection_dofs, :].T.tolist()
+        return result
+
+
+    def _static(self, request):
+
+        fem, kind, key = self._model(request)
+        nelx, nely = np.shape(request['topology'])
+        coords = request.get('coords', (fem.a * nelx, 2 * fem.b * nely))
+        displacement = LaminateDisplacement if kind == 'laminate' else PlateDisplacement
+        opr = displacement(fem, coords).get_operator()
+        prolongation = fem.dof.prolongation
+
+        load = float(request.get('force', 0.0)) * opr.toarray().ravel()
+        if 'voltage' in request:
+            if kind != 'laminate':
+                raise ValueError('Only laminates have a voltage.')
+            kuv = fem.get_piezoelectric_matrix()
+            voltage = np.asarray(request['voltage'], dtype=float)
+            load = load - kuv @ np.broadcast_to(voltage, kuv.shape[1:])
+
+        factor = self.factors.get(key)
+        if factor is None:
+            factor = fem.factorize_stiffness()
+            self.factors.put(key, factor)
+        u = prolongation.prolong(factor.solve(prolongation.restrict_rows(load)))
+        w = u[fem.dof.deflection_dofs]
+        return {'deflection': float((opr @ u)[0]),
+                'max_deflection': float(w[np.argmax(np.abs(w))])}
+
+
+    def _poisson(self, request):
+
+        domain = np.array(request['domain'], dtype=float)
+        conductivity = np.array(request['conductivity'], dtype=float)
+        source = np.array(request['source'], dtype=float)
+        a, b = float(request['a']), float(request['b'])
+
+        key = ('poisson', a, b, _digest((domain, conductivity, source)))
+        fem = self.models.get(key)
+        if fem is None:
+            poisson_domain = PoissonDomain(domain, conductivity, source, a, b)
+            fem = PoissonFEM(poisson_domain)
+            self.models.put(key, fem)
+
+        if 'sources' in request:
+            uall = fem.solve_many(np.array(request['sources'], dtype=float))
+        else:
+            uall = fem.solve()[0][:, None]
+        return {'max': np.max(uall, axis=0).tolist(),
+                'mean': np.mean(uall, axis=0).tolist()}
+
+
+    def _stats(self, request):
+
+        return {'pid': os.getpid(),
+                'counters': {k: dict(v) for k, v in self.counters.items()},
+                'caches': {'models': self.models.stats(),
+                           'factors': self.factors.stats(),
+                           'results': self.results.stats()}}
+
+
+def _digest(value):
+    """A key of the contents of nested lists, dicts and arrays."""
+    h = hashlib.sha1()
+    def update(x):
+        if isinstance(x, np.ndarray):
+            h.update(str((x.shape, x.dtype.str)).encode())
+            h.update(np.ascontiguousarray(x).tobytes())
+        elif isinstance(x, (list, tuple)):
+            h.update(b'[')
+            for v in x:
+                update(v)
+            h.update(b']')
+        elif isinstance(x, dict):
+            h.update(b'{')
+            for k in sorted(x):
+                update(k)
+                update(x[k])
+            h.update(b'}')
+        else:
+            h.update(json.dumps(x).encode())
+    update(value)
+    return h.hexdigest()
+
+
+class Dispatcher(object):
+    """Forwards requests to several worker daemons, each running in its own
+    process with its own caches, over their stdin/stdout pipes. Each request
+    goes to the worker with the fewest requests in progress. A 'stats'
+    request returns the counters of the dispatcher and of every worker. A
+    worker that stops is restarted with empty caches, and the request it
+    was evaluating fails with an error response.
+
+    Public Attributes
+    -----------------
+    self.counters : dict
+        The number of requests and errors, and the total latency in s, of
+        each worker.
+    """
+
+    def __init__(self, n_workers, worker_args=()):
+        """
+        Parameters
+        ----------
+        n_workers : int
+            The number of worker daemons.
+        worker_args : list of string
+            Extra command line arguments of the workers.
+        """
+        self._command = ([sys.executable, '-m', 'microfem.serve'] + 
+                         list(worker_args))
+        self._workers = [self._spawn() for _ in range(n_workers)]
+        self._locks = [threading.Lock() for _ in self._workers]
+        self._busy = [0] * n_workers
+        self._lock = threading.Lock()
+        self.counters = [{'requests': 0, 'errors': 0, 'latency': 0.0}
+                         for _ in self._workers]
+
+
+    def handle(self, request):
+
+        request_id = request.get('id') if isinstance(request, dict) else None
+        if isinstance(request, dict) and request.get('analysis') == 'stats':
+            workers = []
+            for i in range(len(self._workers)):
+                try:
+                    workers.append(self._forward(i, request).get('result'))
+                except RuntimeError:
+                    workers.append(None)
+            return {'id': request_id, 'ok': True,
+                    'result': {'dispatcher': self.counters,
+                               'workers': workers}}
+
+        with self._lock:
+            i = int(np.argmin(self._busy))
+            self._busy[i] += 1
+        start = time.perf_counter()
+        response = {}
+        try:
+            response = self._forward(i, request)
+        except RuntimeError as e:
+            response = {'id': request_id, 'ok': False, 
+                        'error': 'RuntimeError: %s' % e}
+        finally:
+            with self._lock:
+                self._busy[i] -= 1
+                self.counters[i]['requests'] += 1
+                self.counters[i]['errors'] += 0 if response.get('ok') else 1
+                self.counters[i]['latency'] += time.perf_counter() - start
+        return response
+
+
+    def _forward(self, i, request):
+        """Returns the response of worker (i) to a request. If the worker 
+        has stopped, it is restarted and a RuntimeError is raised.
+        """
+        with self._locks[i]:
+            worker = self._workers[i]
+            try:
+                worker.stdin.write(json.dumps(request) + '\n')
+                worker.stdin.flush()
+                line = worker.stdout.readline()
+            except OSError:
+                line = ''
+            if not line:
+                self._restart(i)
+                raise RuntimeError('Worker %d has stopped and was '
+                                   'restarted.' % i)
+        return json.loads(line)
+
+
+    def _spawn(self):
+
+        return subprocess.Popen(self._command, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, bufsize=1,
+                                universal_newlines=True)
+
+
+    def _restart(self, i):
+        """Replaces the stopped worker (i) with a new worker."""
+        worker = self._workers[i]
+        if worker.poll() is None:
+            worker.kill()
+        worker.wait()
+        for pipe in (worker.stdin, worker.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+        self._workers[i] = self._spawn()
+
+
+    def close(self):
+
+        for worker in self._workers:
+            worker.stdin.close()
+            worker.wait()
+
+
+def serve_stream(handler, rfile, wfile):
+    """Answers the JSON requests on each line of (rfile) with a JSON line on
+    (wfile) until the end of the file.
+    """
+    for line in rfile:
+        if isinstance(line, bytes):
+            line = line.decode()
+        if not line.strip():
+            continue
+        try:
+            response = handler.handle(json.loads(line))
+        except json.JSONDecodeError as e:
+            response = {'ok': False, 'error': 'JSONDecodeError: %s' % e}
+        text = json.dumps(response) + '\n'
+        if isinstance(wfile, io.TextIOBase):
+            wfile.write(text)
+        else:
+            wfile.write(text.encode())
+        wfile.flush()
+
+
+def serve_socket(handler, path):
+    """Serves the requests of every client connected to the Unix socket at
+    (path). Each connection is served by its own thread.
+    """
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            serve_stream(handler, self.rfile, self.wfile)
+
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, RequestHandler)
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='python -m microfem.serve',
+                                     description=__doc__.split('\n')[0])
+    parser.add_argument('--socket', help='The path of a Unix socket. '
+                        'Defaults to stdin/stdout.')
+    parser.add_argument('--workers', type=int, default=0, help='The number '
+                        'of worker daemons run under a dispatcher.')
+    parser.add_argument('--max-models', type=int, default=8)
+    parser.add_argument('--max-factors', type=int, default=16)
+    parser.add_argument('--max-results', type=int, default=1024)
+    args = parser.parse_args(argv)
+
+    cache_args = ['--max-models', str(args.max_models),
+                  '--max-factors', str(args.max_factors),
+                  '--max-results', str(args.max_results)]
+    if args.workers > 0:
+        handler = Dispatcher(args.workers, cache_args)
+    else:
+        handler = Service(args.max_models, args.max_factors, args.max_results)
+
+    # Stop cleanly on SIGTERM, removing the socket and stopping the workers.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        if args.socket is None:
+            serve_stream(handler, sys.stdin, sys.stdout)
+        else:
+            serve_socket(handler, args.socket)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(handler, Dispatcher):
+            handler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import numpy as np
+from .mesh import Node
+
+
+# The Gauss points of the two and three point rules in one dimension.
+_GAUSS_2 = (np.array([-1, 1]) / np.sqrt(3), np.array([1.0, 1.0]))
+_GAUSS_3 = (np.array([-1, 0, 1]) * np.sqrt(0.6), np.array([5, 8, 5]) / 9)
+
+
+def _tensor_rule(rule):
+    """The product of a one dimensional rule with itself. The points are
+    ordered counterclockwise from the sw corner for the two point rule, which
+    is the order of the integration points of the original bilinear models.
+    """
+    x, w = rule
+    if len(x) == 2:
+        ij = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    else:
+        ij = [(i, j) for j in range(len(x)) for i in range(len(x))]
+    points = np.array([[x[i], x[j]] for i, j in ij])
+    weights = np.array([w[i] * w[j] for i, j in ij])
+    return points, weights
+
+
+class BilinearShapes(object):
+    """The shape functions of the 4-node bilinear element on the reference
+    square [-1, 1] x [-1, 1].
+
+    The elements are integrated with selective reduced integration: the
+    full rule is used for the bending, membrane and mass terms, and the
+    reduced rule for the transverse shear terms, which avoids shear locking.
+
+    Public Attributes
+    -----------------
+    self.nodes : ndarray
+        The (n_nodes, 2) natural coordinates of the nodes. The corners are
+        first, in order (sw, se, ne, nw), followed by the mid-side nodes
+        (s, e, n, w) and the center node of the quadratic elements.
+    self.full_rule : tuple of ndarray
+        The integration points and weights of the full rule.
+    self.reduced_rule : tuple of ndarray
+        The integration points and weights of the reduced rule.
+    """
+
+    name = 'q4'
+    nodes = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]])
+    full_rule = _tensor_rule(_GAUSS_2)
+    reduced_rule = (np.array([[0.0, 0.0]]), np.array([4.0]))
+
+
+    @property
+    def n_nodes(self):
+        return len(self.nodes)
+
+
+    def evaluate(self, point):
+        """Returns the shape functions (n) and their derivatives (dndxi,
+        dndeta) at the natural coordinates (point) as arrays with an entry
+        for each node.
+        """
+        xi, eta = point
+        xs, es = self.nodes.T
+        n = 0.25 * (1 + xs * xi) * (1 + es * eta)
+        dndxi = xs * 0.25 * (1 + es * eta)
+        dndeta = es * 0.25 * (1 + xs * xi)
+        return n, dndxi, dndeta
+
+
+class SerendipityShapes(BilinearShapes):
+    """The shape functions of the 8-node quadratic serendipity element. The
+    full rule is 3 x 3 Gauss points and the reduced rule is 2 x 2.
+    """
+
+    name = 'q8'
+    nodes = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1],
+                      [0, -1], [1, 0], [0, 1], [-1, 0]])
+    full_rule = _tensor_rule(_GAUSS_3)
+    reduced_rule = _tensor_rule(_GAUSS_2)
+
+
+    def evaluate(self, point):
+
+        xi, eta = point
+        xs, es = self.nodes[:4].T
+        x0, e0 = xs * xi, es * eta
+        nc = 0.25 * (1 + x0) * (1 + e0) * (x0 + e0 - 1)
+        dcdxi = 0.25 * xs * (1 + e0) * (2 * x0 + e0)
+        dcdeta = 0.25 * es * (1 + x0) * (x0 + 2 * e0)
+
+        # The s and n nodes have xi = 0, the e and w nodes have eta = 0.
+        es_mid = np.array([-1, 1])
+        xs_mid = np.array([1, -1])
+        ns = 0.5 * (1 - xi * xi) * (1 + es_mid * eta)
+        dsdxi = -xi * (1 + es_mid * eta)
+        dsdeta = 0.5 * (1 - xi * xi) * es_mid
+        ne = 0.5 * (1 + xs_mid * xi) * (1 - eta * eta)
+        dedxi = 0.5 * xs_mid * (1 - eta * eta)
+        dedeta = -eta * (1 + xs_mid * xi)
+
+        order = [0, 2, 1, 3]    # (s, n, e, w) to (s, e, n, w)
+        n = np.concatenate((nc, np.concatenate((ns, ne))[order]))
+        dndxi = np.concatenate((dcdxi, np.concatenate((dsdxi, dedxi))[order]))
+        dndeta = np.concatenate((dcdeta,
+                                 np.concatenate((dsdeta, dedeta))[order]))
+        return n, dndxi, dndeta
+
+
+class LagrangeShapes(BilinearShapes):
+    """The shape functions of the 9-node biquadratic Lagrange element. The
+    full rule is 3 x 3 Gauss points and the reduced rule is 2 x 2.
+    """
+
+    name = 'q9'
+    nodes = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1],
+                      [0, -1], [1, 0], [0, 1], [-1, 0], [0, 0]])
+    full_rule = _tensor_rule(_GAUSS_3)
+    reduced_rule = _tensor_rule(_GAUSS_2)
+
+
+    def evaluate(self, point):
+
+        xi, eta = point
+        lx, dlx = self._quadratic(xi, self.nodes[:, 0])
+        le, dle = self._quadratic(eta, self.nodes[:, 1])
+        return lx * le, dlx * le, lx * dle
+
+
+    @staticmethod
+    def _quadratic(x, xs):
+        """The one dimensional quadratic Lagrange polynomials of the nodes at
+        (xs) in {-1, 0, 1}, and their derivatives, at (x).
+        """
+        corner = 0.5 * x * (x + xs)
+        dcorner = 0.5 * (2 * x + xs)
+        mid = 1 - x * x
+        dmid = -2 * x
+        return np.where(xs == 0, mid, corner), np.where(xs == 0, dmid, dcorner)
+
+
+_ELEMENTS = {c.name: c for c in (BilinearShapes, SerendipityShapes,
+                                 LagrangeShapes)}
+
+
+def element_shapes(element):
+    """Returns the shape functions of an element type, one of 'q4' (4-node
+    bilinear), 'q8' (8-node serendipity) or 'q9' (9-node Lagrange).
+    """
+    if element not in _ELEMENTS:
+        raise ValueError('Unknown element %s.' % element)
+    return _ELEMENTS[element]()
+
+
+def element_nodes(mesh, shapes):
+    """Returns the nodes of the DOF model of a mesh and the indices of the
+    nodes of each element, in the order of (shapes.nodes). The mesh nodes are
+    first and keep their indices. The mid-side and center nodes of quadratic
+    elements follow, in the order they are first met, and are shared by
+    neighbouring elements. Their grid indices (i, j) are half integers.
+    """
+    nodes = list(mesh.nodes)
+    lookup = {(2 * n.i, 2 * n.j): n for n in nodes}
+    connectivity = []
+    for e in mesh.elements:
+        indices = []
+        for xi, eta in shapes.nodes:
+            key = (2 * e.i + e.size * (1 + xi), 2 * e.j + e.size * (1 + eta))
+            if key not in lookup:
+                n = Node(key[0] / 2, key[1] / 2)
+                n.void = False
+                n.index = len(nodes)
+                nodes.append(n)
+                lookup[key] = n
+            indices.append(lookup[key].index)
+        connectivity.append(indices)
+    connectivity = np.array(connectivity, dtype=int)
+    return nodes, connectivity.reshape(-1, shapes.n_nodes)
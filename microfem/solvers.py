@@ -0,0 +1,314 @@
+import abc
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sparse
+import scipy.sparse.linalg as linalg
+
+try:
+    from sksparse import cholmod
+except ImportError:
+    cholmod = None
+
+try:
+    from scikits import umfpack
+except ImportError:
+    umfpack = None
+
+try:
+    import pypardiso
+except ImportError:
+    pypardiso = None
+
+
+# PARDISO is only selected for systems with at least this many DOFs, below
+# which the cost of its setup outweighs its parallel factorization.
+_PARDISO_MIN_SIZE = 20000
+
+# The largest backward error of a SuperLU factorization of a symmetric
+# indefinite matrix with diagonal pivots, see `SuperLUFactorization`.
+_BACKWARD_ERROR_TOL = 1e-8
+
+
+class Factorization(abc.ABC):
+    """The factorization of a square sparse matrix, which solves linear
+    systems with the matrix by forward and back substitution. The
+    factorizations of all backends share this interface, so the modal, static
+    and Poisson solves don't depend on the backend.
+
+    Public Attributes
+    -----------------
+    self.backend : string
+        The name of the backend, see `factorize`.
+    self.shape : tuple
+        The shape of the matrix.
+    """
+
+    backend = None
+
+    def __init__(self, a):
+        self.shape = a.shape
+
+
+    @abc.abstractmethod
+    def solve(self, b):
+        """Returns the solution (x) of a x = b, where (b) is a vector or an
+        (n, k) array of right hand sides.
+        """
+
+
+    def operator(self):
+        """Returns the inverse of the matrix as a LinearOperator, which is
+        the OPinv of a shift-invert eigensolve.
+        """
+        return linalg.LinearOperator(self.shape, matvec=self.solve,
+                                     matmat=self.solve, dtype=float)
+
+
+class SuperLUFactorization(Factorization):
+    """The LU factorization of SciPy's SuperLU, which is always available.
+    A symmetric matrix is ordered by the minimum degree of (A' + A) and
+    pivots on the diagonal without a threshold, which halves the fill-in of
+    the factors and is several times faster than the default column 
+    ordering. A threshold lets the pivots of an indefinite matrix, such as
+    the shifted stiffness of a band solve or the dynamic stiffness of a 
+    frequency response, leave the diagonal, which destroys the ordering and
+    is over a hundred times slower. Without pivoting a small diagonal pivot
+    of an indefinite matrix can spoil the factors, so the backward error of
+    a solve is checked and a poor factorization is repeated with the 
+    default column ordering and pivoting.
+    """
+
+    backend = 'superlu'
+
+    def __init__(self, a, symmetric=False, definite=False):
+        super().__init__(a)
+        options = {}
+        if symmetric is True:
+            options = {'permc_spec': 'MMD_AT_PLUS_A',
+                       'diag_pivot_thresh': 0.0,
+                       'options': {'SymmetricMode': True}}
+        a = a.tocsc()
+        if symmetric is True and definite is False:
+            try:
+                self._lu = linalg.splu(a, **options)
+                stable = self._backward_error(a) <= _BACKWARD_ERROR_TOL
+            except RuntimeError:
+                stable = False
+            if not stable:
+                self._lu = linalg.splu(a)
+        else:
+            self._lu = linalg.splu(a, **options)
+
+
+    def solve(self, b):
+        return self._lu.solve(np.asarray(b, dtype=float))
+
+
+    def _backward_error(self, a):
+        """The normwise backward error of the solve of a x = 1."""
+        b = np.ones(a.shape[0])
+        x = self._lu.solve(b)
+        if not np.all(np.isfinite(x)):
+            return np.inf
+        norm = abs(a).sum(axis=1).max()
+        return (np.abs(a @ x - b).max() / 
+                (norm * np.abs(x).max() + np.abs(b).max()))
+
+
+class UMFPACKFactorization(Factorization):
+    """The LU factorization of UMFPACK from scikit-umfpack. The symmetry
+    and definiteness of the matrix are ignored, scikit-umfpack always 
+    computes a general LU factorization.
+    """
+
+    backend = 'umfpack'
+
+    def __init__(self, a, symmetric=False, definite=False):
+        super().__init__(a)
+        self._dtype = np.result_type(a.dtype, float)
+        self._lu = umfpack.splu(a.tocsc())
+
+
+    def solve(self, b):
+        return self._lu.solve(np.asarray(b, dtype=self._dtype))
+
+
+class CholmodFactorization(Factorization):
+    """The supernodal Cholesky factorization of CHOLMOD from scikit-sparse.
+    The matrix must be symmetric positive definite.
+    """
+
+    backend = 'cholmod'
+
+    def __init__(self, a, symmetric=True, definite=True):
+        if definite is False:
+            raise ValueError('CHOLMOD requires a positive definite matrix.')
+        super().__init__(a)
+        self._factor = cholmod.cholesky(a.tocsc())
+
+
+    def solve(self, b):
+        return self._factor(np.asarray(b, dtype=float))
+
+
+class PardisoFactorization(Factorization):
+    """The parallel factorization of the Intel MKL PARDISO solver from
+    pypardiso. A symmetric positive definite matrix is factorized by 
+    Cholesky (matrix type 2), a symmetric matrix by Bunch-Kaufman LDL' 
+    (type -2) and otherwise by LU (type 11). PARDISO only reads the upper
+    triangle of a symmetric matrix.
+    """
+
+    backend = 'pardiso'
+
+    def __init__(self, a, symmetric=False, definite=False):
+        super().__init__(a)
+        if symmetric is True:
+            mtype = 2 if definite is True else -2
+            self._a = sparse.triu(a, format='csr')
+        else:
+            mtype = 11
+            self._a = a.tocsr()
+        self._solver = pypardiso.PyPardisoSolver(mtype=mtype)
+        self._solver.factorize(self._a)
+
+
+    def solve(self, b):
+        return self._solver.solve(self._a, np.asarray(b, dtype=float))
+
+
+class LowRankUpdate(Factorization):
+    """The factorization of A + U C^-1 U' from a factorization (factor) of
+    the symmetric matrix A, where U is a dense (n, p) array of low rank p and
+    C is a (p, p) symmetric positive definite matrix. The update is applied
+    by the Sherman-Morrison-Woodbury formula, so the sparse factors of A are
+    reused and the dense (n, n) block U C^-1 U' is never formed. This is the
+    stiffness matrix of a laminate with open electrodes, where U are the
+    piezoelectric columns and C the capacitance matrix.
+    """
+
+    def __init__(self, factor, u, c):
+        self.shape = factor.shape
+        self.backend = factor.backend
+        self._factor = factor
+        self._u = np.asarray(u, dtype=float).reshape(self.shape[0], -1)
+        self._c = np.atleast_2d(c)
+        self._z = factor.solve(self._u).reshape(self._u.shape)
+        s = self._c + self._u.T @ self._z
+        self._s = scipy.linalg.cho_factor(0.5 * (s + s.T))
+
+
+    def solve(self, b):
+        b = np.asarray(b, dtype=float)
+        correction = scipy.linalg.cho_solve(self._s, self._z.T @ b)
+        return self._factor.solve(b) - self._z @ correction
+
+
+    def matrix_operator(self, a):
+        """Returns the updated matrix A + U C^-1 U' of the sparse matrix (a)
+        as a LinearOperator.
+        """
+        cu = np.linalg.solve(self._c, self._u.T)
+
+        def matvec(x):
+            return a @ x + self._u @ (cu @ x)
+
+        return linalg.LinearOperator(self.shape, matvec=matvec,
+                                     matmat=matvec, dtype=float)
+
+
+BACKENDS = {'superlu': SuperLUFactorization,
+            'umfpack': UMFPACKFactorization,
+            'cholmod': CholmodFactorization,
+            'pardiso': PardisoFactorization}
+
+_MODULES = {'superlu': linalg, 'umfpack': umfpack, 'cholmod': cholmod,
+            'pardiso': pypardiso}
+
+
+def available_backends():
+    """Returns the names of the installed backends."""
+    return [name for name in BACKENDS if _MODULES[name] is not None]
+
+
+def select_backend(n, symmetric=False, definite=False):
+    """Returns the name of the backend used for a matrix of size (n). A
+    positive definite matrix is factorized by Cholesky with CHOLMOD, large
+    matrices by PARDISO, general matrices by UMFPACK, and otherwise by
+    SuperLU, depending on which backends are installed.
+    """
+    if definite is True and cholmod is not None:
+        return 'cholmod'
+    if n >= _PARDISO_MIN_SIZE and pypardiso is not None:
+        return 'pardiso'
+    if symmetric is False and umfpack is not None:
+        return 'umfpack'
+    return 'superlu'
+
+
+def is_symmetric(a, rtol=1e-10):
+    """Returns True if the sparse matrix (a) is symmetric to a tolerance
+    relative to its largest entry.
+    """
+    a = a.tocsr()
+    if a.nnz == 0:
+        return True
+    return abs(a - a.T).max() <= rtol * abs(a).max()
+
+
+def factorize(a, backend='auto', symmetric=None, definite=False):
+    """Returns the factorization of the square sparse matrix (a).
+
+    Parameters
+    ----------
+    a : scipy.sparse matrix
+        The matrix.
+    backend : string
+        'superlu', 'umfpack', 'cholmod' or 'pardiso'. If 'auto', the backend
+        is chosen by `select_backend` from the size and symmetry of (a),
+        and complex matrices are factorized by SuperLU.
+    symmetric : bool
+        True if (a) is symmetric. If None, the symmetry is checked.
+    definite : bool
+        True if (a) is symmetric positive definite, such as the stiffness
+        matrix of the free DOFs of a clamped cantilever.
+
+    Returns
+    -------
+    factor : microfem.Factorization
+        The factorization, see `Factorization.solve`.
+    """
+    if symmetric is None:
+        symmetric = definite or is_symmetric(a)
+    if backend == 'auto' and np.iscomplexobj(a):
+        backend = 'superlu'
+    elif backend == 'auto':
+        backend = select_backend(a.shape[0], symmetric, definite)
+    if backend not in BACKENDS:
+        raise ValueError('Unknown solver backend %s.' % backend)
+    if np.iscomplexobj(a) and backend not in ('superlu', 'umfpack'):
+        raise ValueError('The %s solver backend only supports real '
+                         'matrices.' % backend)
+    if _MODULES[backend] is None:
+        raise ValueError('The %s solver backend is not installed.' % backend)
+    return BACKENDS[backend](a, symmetric, definite)
+
+
+def solve_modes(k, m, n_modes, sigma=0, backend='auto', factor=None):
+    """Finds the (n_modes) eigenvalues of the generalized eigenproblem
+    (k, m) nearest (sigma) by ARPACK in shift-invert mode. The shifted matrix
+    (k - sigma m) is factorized by `factorize`, or (factor) is used if it is
+    given, so a factorization can be shared with static solves.
+
+    Returns
+    -------
+    w : ndarray
+        The eigenvalues in increasing order.
+    v : ndarray
+        The M-normalized eigenvectors of each eigenvalue.
+    """
+    if factor is None:
+        a = k if sigma == 0 else k - sigma * m
+        factor = factorize(a, backend, symmetric=True, definite=sigma == 0)
+    return linalg.eigsh(k, k=n_modes, M=m, sigma=sigma, which='LM',
+                        OPinv=factor.operator())
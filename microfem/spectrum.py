@@ -0,0 +1,105 @@
+import os
+import numpy as np
+import scipy.sparse.linalg as linalg
+from concurrent.futures import ProcessPoolExecutor
+
+from .solvers import factorize
+
+
+def solve_band(k, m, f_min, f_max, n_slices=None, processes=None,
+               backend='auto'):
+    """Finds all the modes of the generalized eigenproblem (k, m) with a
+    frequency in the band [f_min, f_max] Hz. The band is split into slices of
+    equal width in frequency. Each slice is shifted to its center, factorized,
+    and solved on a separate process. Since each slice only needs the modes
+    near its own shift, the Krylov spaces stay small even for high order
+    modes. Modes found by two slices at their common boundary are removed
+    using the M-orthogonality of the eigenvectors.
+
+    Parameters
+    ----------
+    k : scipy.sparse matrix
+        The stiffness matrix of the free DOFs.
+    m : scipy.sparse matrix
+        The mass matrix of the free DOFs.
+    f_min : float
+        The lower frequency of the band in Hz.
+    f_max : float
+        The upper frequency of the band in Hz.
+    n_slices : int
+        The number of slices. Defaults to the number of processes.
+    processes : int
+        The number of worker processes. Defaults to the number of CPUs. If 1,
+        the slices are solved in this process.
+    backend : string
+        The sparse direct solver that factorizes the shifted matrices, see
+        `factorize`.
+
+    Returns
+    -------
+    w : ndarray
+        The eigenvalues in the band in increasing order.
+    v : ndarray
+        The M-normalized eigenvectors of each eigenvalue.
+    """
+    if not 0 <= f_min < f_max:
+        raise ValueError('The band must satisfy 0 <= f_min < f_max.')
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if n_slices is None:
+        n_slices = processes
+
+    edges = (2 * np.pi * np.linspace(f_min, f_max, n_slices + 1)) ** 2
+    tasks = [(k, m, lo, hi, backend) for lo, hi in zip(edges[:-1], edges[1:])]
+    if processes == 1 or n_slices == 1:
+        results = [_solve_slice(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_solve_slice, tasks))
+
+    w = np.concatenate([r[0] for r in results])
+    v = np.hstack([r[1] for r in results])
+    order = np.argsort(w, kind='stable')
+    w, v = _deduplicate(w[order], v[:, order], m)
+    inside = (w >= edges[0] * (1 - 1e-9)) & (w <= edges[-1] * (1 + 1e-9))
+    return w[inside], v[:, inside]
+
+
+def _solve_slice(task):
+    """Finds the eigenvalues in the interval [lo, hi]. The number of requested
+    modes nearest the center of the interval is doubled until the furthest
+    mode lies outside the interval. A small margin is kept on either side so
+    modes on the boundary are found by both neighbouring slices.
+    """
+    k, m, lo, hi, backend = task
+    n = k.shape[0]
+    sigma = 0.5 * (lo + hi)
+    radius = 0.5 * (hi - lo) * (1 + 1e-6)
+    opinv = factorize(k - sigma * m, backend, symmetric=True).operator()
+
+    n_modes = min(6, n - 2)
+    while True:
+        w, v = linalg.eigsh(k, k=n_modes, M=m, sigma=sigma, which='LM',
+                            OPinv=opinv)
+        if np.max(np.abs(w - sigma)) > radius or n_modes == n - 2:
+            break
+        n_modes = min(2 * n_modes, n - 2)
+
+    inside = np.abs(w - sigma) <= radius
+    return w[inside], v[:, inside]
+
+
+def _deduplicate(w, v, m, rtol=1e-6):
+    """Removes duplicate modes from a sorted list of modes. Modes with nearly
+    equal eigenvalues are only duplicates if their eigenvectors are not
+    M-orthogonal, so repeated eigenvalues are retained.
+    """
+    keep = []
+    for i in range(len(w)):
+        close = [j for j in keep if abs(w[i] - w[j]) <= rtol * abs(w[i])]
+        if close:
+            overlap = np.abs(v[:, close].T @ (m @ v[:, i]))
+            if np.max(overlap) > 0.5:
+                continue
+        keep.append(i)
+    return w[keep], v[:, keep]
@@ -0,0 +1,201 @@
+import numpy as np
+import scipy.linalg
+import scipy.sparse as sparse
+
+from .assembly import SparseAssembler, element_values
+from .solvers import factorize, solve_modes
+
+
+class Superelement(object):
+    """Condenses a region of a full grid model that never changes, such as
+    the clamped base of a cantilever, onto the DOFs of its interface with the
+    rest of the mesh, the design window. The condensation is computed once,
+    after which each design evaluation only assembles the elements of the
+    design window and solves an eigenproblem on the design window, the
+    interface, and the modal coordinates of the region.
+
+    The region is condensed by the Craig-Bampton method. The displacement of
+    the interior DOFs of the region is the static response to the interface
+    displacement, plus a combination of the (n_modes) lowest modes of the
+    region with its interface clamped. With no modes this is Guyan
+    reduction, which is exact for static problems but overestimates the
+    frequencies of modes that deform the region.
+
+    Public Attributes
+    -----------------
+    self.region : ndarray
+        The (nelx, nely) boolean array of the elements of the region.
+    self.interface : ndarray
+        The free DOFs shared by the region and the design window.
+    self.interior : ndarray
+        The free DOFs only in the region, which are condensed.
+    self.design : ndarray
+        The free DOFs only in the design window.
+    self.kbb : ndarray
+        The condensed stiffness matrix of the region on the modal
+        coordinates and interface DOFs, in that order.
+    self.mbb : ndarray
+        The condensed mass matrix of the region.
+    """
+
+    def __init__(self, fem, topology, region, n_modes=0):
+        """
+        Parameters
+        ----------
+        fem : microfem.PlateFEM or microfem.LaminateFEM
+            A full grid model of the cantilever.
+        topology : ndarray
+            The topology of the cantilever, which must not change in the
+            region for later evaluations.
+        region : ndarray
+            The (nelx, nely) boolean array of the elements of the region.
+        n_modes : int
+            The number of fixed interface modes of the region. With zero
+            modes the region is condensed by Guyan reduction.
+        """
+        mesh = fem.dof.mesh
+        if mesh.full_grid is False or fem.dof.prolongation.constrained:
+            raise ValueError('A superelement requires a full grid model.')
+
+        self._fem = fem
+        self.region = np.asarray(region, dtype=bool)
+        self._topology = np.array(topology)
+        self._in_region = mesh.domain2array(self.region)
+        self.n_modes = n_modes
+
+        # Partition the free DOFs into interior, interface and design DOFs.
+        edofs = fem.dof.element_mdofs
+        region_dofs = np.unique(edofs[self._in_region])
+        window_dofs = np.unique(edofs[~self._in_region])
+        free = fem.dof.free_dofs
+        self.interface = np.intersect1d(np.intersect1d(region_dofs,
+                                                       window_dofs), free)
+        self.interior = np.intersect1d(np.setdiff1d(region_dofs,
+                                                    window_dofs), free)
+        self.design = np.intersect1d(np.setdiff1d(window_dofs, region_dofs),
+                                     free)
+
+        self._condense()
+        self._assembler = self._window_map()
+        zero = sparse.csr_matrix((len(self.design), len(self.design)))
+        self._k_region = sparse.block_diag((self.kbb, zero), format='csr')
+        self._m_region = sparse.block_diag((self.mbb, zero), format='csr')
+
+
+    @property
+    def n_reduced(self):
+        """The size of the eigenproblem of each evaluation."""
+        return self.n_modes + len(self.interface) + len(self.design)
+
+
+    def modal_analysis(self, topology, n_modes):
+        """Computes the lowest modes of a topology that matches the topology
+        of the region. The return values (w, v, vall) are the eigenvalues,
+        the eigenvectors of the reduced problem, and the mode shapes of all
+        DOFs of the full grid model.
+        """
+        topology = np.asarray(topology)
+        if not np.array_equal(topology[self.region],
+                              self._topology[self.region]):
+            raise ValueError('The topology of the region has changed.')
+
+        k, m = self.get_matrices(topology)
+        w, v = solve_modes(k, m, n_modes, backend=self._fem.solver)
+        return w, v, self.expand(v)
+
+
+    def get_matrices(self, topology):
+        """Returns the stiffness and mass matrices of the reduced problem for
+        a topology. Only the elements of the design window are assembled.
+        """
+        muue, kuue, kinds = self._fem.get_element_matrices()
+        xk, xm = self._fem.element_densities(topology)
+        window = ~self._in_region
+        kinds = kinds[window]
+        k_val = element_values(xk[window], kuue, self._fem.threads, kinds)
+        m_val = element_values(xm[window], muue, self._fem.threads, kinds)
+
+        n = self.n_reduced
+        k = self._assembler.assemble(k_val)[:n, :n] + self._k_region
+        m = self._assembler.assemble(m_val)[:n, :n] + self._m_region
+        return k.tocsc(), m.tocsc()
+
+
+    def expand(self, v):
+        """Returns the displacement of all DOFs of the full grid model from
+        the coordinates (v) of the reduced problem.
+        """
+        nm, nb = self.n_modes, len(self.interface)
+        vall = np.zeros((self._fem.dof.n_mdof,) + v.shape[1:])
+        q, ub, ud = v[:nm], v[nm:nm + nb], v[nm + nb:]
+        vall[self.interface] = ub
+        vall[self.design] = ud
+        vall[self.interior] = self._static @ ub + self._modes @ q
+        return vall
+
+
+    def _condense(self):
+        """Assembles the region and condenses it onto the interface."""
+        fem = self._fem
+        muue, kuue, kinds = fem.get_element_matrices()
+        xk, xm = fem.element_densities(self._topology)
+        edofs = fem.dof.element_mdofs[self._in_region]
+        kinds = kinds[self._in_region]
+        n = edofs.shape[1]
+        rows = np.repeat(edofs, n, axis=1)
+        cols = np.tile(edofs, (1, n))
+        shape = (fem.dof.n_mdof, fem.dof.n_mdof)
+        assembler = SparseAssembler(rows, cols, shape)
+        k = assembler.assemble(element_values(xk[self._in_region], kuue,
+                                              fem.threads, kinds))
+        m = assembler.assemble(element_values(xm[self._in_region], muue,
+                                              fem.threads, kinds))
+
+        i, b = self.interior, self.interface
+        kii = k[i, :][:, i].tocsc()
+        kib = k[i, :][:, b].toarray()
+        mii = m[i, :][:, i].tocsc()
+        mib = m[i, :][:, b].toarray()
+        kbb = k[b, :][:, b].toarray()
+        mbb = m[b, :][:, b].toarray()
+
+        # The static response of the interior to the interface DOFs.
+        factor = factorize(kii, fem.solver, definite=True)
+        self._static = -factor.solve(kib)
+        kbb = kbb + kib.T @ self._static
+        mx = mii @ self._static
+        mbb = (mbb + mib.T @ self._static + self._static.T @ mib +
+               self._static.T @ mx)
+
+        # The fixed interface modes of the region, normalized to unit mass.
+        if self.n_modes > 0:
+            w, self._modes = solve_modes(kii, mii, self.n_modes,
+                                         factor=factor)
+            coupling = self._modes.T @ (mib + mx)
+        else:
+            w = np.zeros(0)
+            self._modes = np.zeros((len(i), 0))
+            coupling = np.zeros((0, len(b)))
+
+        self.kbb = scipy.linalg.block_diag(np.diag(w), 0.5 * (kbb + kbb.T))
+        self.mbb = np.block([[np.eye(self.n_modes), coupling],
+                             [coupling.T, 0.5 * (mbb + mbb.T)]])
+
+
+    def _window_map(self):
+        """The map from the element matrices of the design window to the
+        reduced matrices. The fixed DOFs of the window are mapped to an extra
+        row and column that is discarded.
+        """
+        fem = self._fem
+        local = np.full(fem.dof.n_mdof, self.n_reduced)
+        nm, nb = self.n_modes, len(self.interface)
+        local[self.interface] = nm + np.arange(nb)
+        local[self.design] = nm + nb + np.arange(len(self.design))
+
+        edofs = local[fem.dof.element_mdofs[~self._in_region]]
+        n = edofs.shape[1]
+        rows = np.repeat(edofs, n, axis=1)
+        cols = np.tile(edofs, (1, n))
+        shape = (self.n_reduced + 1, self.n_reduced + 1)
+        return SparseAssembler(rows, cols, shape)
@@ -0,0 +1,92 @@
+import copy
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .tracking import normalize_signs
+
+
+class ParameterSweep(object):
+    """Sweeps the material and element dimensions of a fixed topology. The
+    mesh, DOFs and scatter maps of the FEM are built once. For each point of
+    the sweep only the element matrices are recomputed and scattered into the
+    system matrices, see `update_model` of the FEM. The points are spread
+    across worker processes, each of which receives a copy of the FEM once.
+
+    Public Attributes
+    -----------------
+    self.fem : microfem.PlateFEM or microfem.LaminateFEM
+        The FEM defining the topology of the sweep. It isn't modified.
+    self.outputs : scipy.sparse matrix
+        An optional operator applied to the mode shapes of each point, such
+        as the tip displacement operator. The operator is fixed, so it acts
+        on the same DOFs when the element dimensions change.
+    """
+
+    def __init__(self, fem, outputs=None):
+
+        self.fem = fem
+        self.outputs = outputs
+
+
+    def run(self, points, n_modes, processes=None):
+        """
+        Parameters
+        ----------
+        points : list of dict
+            Each point of the sweep is a dictionary with any of the keys
+            'material', 'a' and 'b'. Missing keys keep the values of the FEM.
+        n_modes : int
+            The number of modes to compute at each point.
+        processes : int
+            The number of worker processes. Defaults to the number of CPUs.
+            If 1, the sweep runs in this process.
+
+        Returns
+        -------
+        results : dict
+            'freq' is the (n_points, n_modes) array of frequencies in Hz. If
+            the sweep has outputs, 'outputs' is the (n_points, n_out, n_modes)
+            array of the outputs of the M-normalized mode shapes. The sign
+            of each mode is normalized, see `normalize_signs`, so the 
+            outputs don't flip sign between points.
+        """
+        tasks = [(p, n_modes) for p in points]
+        if processes == 1:
+            _init_worker(self.fem, self.outputs)
+            results = [_evaluate(t) for t in tasks]
+        else:
+            initargs = (self.fem, self.outputs)
+            with ProcessPoolExecutor(max_workers=processes,
+                                     initializer=_init_worker,
+                                     initargs=initargs) as executor:
+                results = list(executor.map(_evaluate, tasks))
+
+        sweep = {'freq': np.array([r[0] for r in results])}
+        if self.outputs is not None:
+            sweep['outputs'] = np.array([r[1] for r in results])
+        return sweep
+
+
+# The copy of the FEM owned by a worker process.
+_worker = {}
+
+
+def _init_worker(fem, outputs):
+
+    _worker['fem'] = copy.deepcopy(fem)
+    _worker['outputs'] = outputs
+    _worker['defaults'] = {'material': fem.material, 'a': fem.a, 'b': fem.b}
+
+
+def _evaluate(task):
+
+    point, n_modes = task
+    fem = _worker['fem']
+    point = dict(_worker['defaults'], **point)
+    fem.update_model(point['material'], point['a'], point['b'])
+    w, _, vall = fem.modal_analysis(n_modes)
+    freq = np.sqrt(w) / (2 * np.pi)
+    outputs = None
+    if _worker['outputs'] is not None:
+        outputs = _worker['outputs'] @ normalize_signs(vall)
+    return freq, outputs
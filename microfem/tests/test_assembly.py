@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import microfem
+
+
+def topology():
+    # A base and a narrow tip, so an adaptive mesh has elements of several
+    # sizes and hanging nodes.
+    tip = np.vstack((np.zeros((6, 8)), np.ones((4, 8)), np.zeros((6, 8))))
+    return np.hstack((np.ones((16, 16)), tip))
+
+
+def plate(threads, adaptive):
+    cantilever = microfem.Cantilever(topology(), 5, 5, 80, 235)
+    fem = microfem.PlateFEM(microfem.SoiMumpsMaterial(), cantilever,
+                            threads=threads, adaptive=adaptive)
+    return [fem.get_stiffness_matrix(), fem.get_mass_matrix()]
+
+
+def laminate(threads, adaptive):
+    cantilever = microfem.Cantilever(topology(), 5, 5, 80, 235)
+    fem = microfem.LaminateFEM(microfem.PiezoMumpsMaterial(), cantilever,
+                               threads=threads, adaptive=adaptive)
+    return [fem.get_stiffness_matrix(), fem.get_mass_matrix(), 
+            fem.get_piezoelectric_matrix()]
+
+
+def poisson(threads, adaptive):
+    domain = topology()
+    rng = np.random.default_rng(0)
+    poisson_domain = microfem.PoissonDomain(
+        domain, domain * rng.uniform(1, 2, domain.shape), domain, 5, 5)
+    fem = microfem.PoissonFEM(poisson_domain, threads=threads, 
+                              adaptive=adaptive)
+    return [fem.get_conduction_matrix(), fem.get_heating_matrix()]
+
+
+@pytest.mark.parametrize('adaptive', [False, True])
+@pytest.mark.parametrize('build', [plate, laminate, poisson])
+def test_threads_bit_identical(build, adaptive):
+    reference = build(1, adaptive)
+    for threads in (2, 3, 7):
+        for a, b in zip(reference, build(threads, adaptive)):
+            if hasattr(a, 'data'):
+                assert a.data.tobytes() == b.data.tobytes()
+                np.testing.assert_array_equal(a.indices, b.indices)
+            else:
+                assert np.asarray(a).tobytes() == np.asarray(b).tobytes()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.linalg
+
+import microfem
+
+
+def laminate():
+    # Two electrodes, on the base and tip halves of the cantilever.
+    topology = np.ones((6, 16))
+    cantilever = microfem.Cantilever(topology, 5, 5, 30, 155)
+    electrodes = np.zeros(topology.shape, dtype=int)
+    electrodes[:, 8:] = 1
+    return microfem.LaminateFEM(microfem.PiezoMumpsMaterial(), cantilever,
+                                electrodes=electrodes)
+
+
+def dense_eigenvalues(fem, n_modes):
+    """The short and open-circuit eigenvalues of dense eigensolves."""
+    k = fem.get_stiffness_matrix(free=True).toarray()
+    m = fem.get_mass_matrix(free=True).toarray()
+    kuv = fem.get_piezoelectric_matrix(free=True).toarray()
+    kvv = fem.get_capacitance_matrix().toarray()
+    k_open = k + kuv @ np.linalg.solve(kvv, kuv.T)
+    short = scipy.linalg.eigh(k, m, eigvals_only=True)[:n_modes]
+    open_ = scipy.linalg.eigh(k_open, m, eigvals_only=True)[:n_modes]
+    return short, open_
+
+
+def test_open_circuit_modes():
+    fem = laminate()
+    assert fem.get_piezoelectric_matrix().shape[1] == 2
+    short, open_ = dense_eigenvalues(fem, 4)
+    w, _, _ = fem.modal_analysis(4, electrical='open')
+    np.testing.assert_allclose(w, open_, rtol=1e-8)
+    # The electrodes stiffen the flexural modes.
+    assert np.max(open_ / short - 1) > 1e-4
+
+
+def test_shunt_limits():
+    # A small resistance short-circuits the electrodes and a large one is
+    # open, and the modes are barely damped in both limits.
+    fem = laminate()
+    short, open_ = dense_eigenvalues(fem, 4)
+    for resistance, reference in ((1.0, short), (1e12, open_)):
+        w, _, _ = fem.modal_analysis(4, electrical='shunt', 
+                                     resistance=resistance)
+        s = np.sqrt(w)
+        np.testing.assert_allclose(s.real ** 2, reference, rtol=1e-8)
+        assert np.all(np.abs(s.imag) < 1e-6 * s.real)
+
+    # In between, the frequencies lie between the limits.
+    w, _, _ = fem.modal_analysis(4, electrical='shunt', resistance=1e6)
+    wd = np.sqrt(w).real ** 2
+    assert np.all(wd > short * (1 - 1e-8)) and np.all(wd < open_ * (1 + 1e-8))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import microfem
+
+
+# Rayleigh damping, which the modal and direct responses both support.
+RAYLEIGH = (1e3, 1e-9)
+
+
+def laminate():
+    topology = np.ones((6, 16))
+    cantilever = microfem.Cantilever(topology, 5, 5, 30, 155)
+    return microfem.LaminateFEM(microfem.PiezoMumpsMaterial(), cantilever)
+
+
+def off_resonance(fem):
+    """Zero frequency and frequencies between the lowest modes."""
+    f = fem.modal_metrics(4)['freq']
+    return np.array([0.0, 0.5 * f[0], 0.5 * (f[0] + f[1]), 
+                     0.5 * (f[2] + f[3])])
+
+
+def test_modal_matches_direct():
+    fem = laminate()
+    freqs = off_resonance(fem)
+    direct = fem.frequency_response(freqs, voltage=1.0, rayleigh=RAYLEIGH,
+                                    method='direct')
+    modal = fem.frequency_response(freqs, voltage=1.0, rayleigh=RAYLEIGH)
+    assert direct.shape == (4, 1)
+    # The static residual makes the modal response exact at zero frequency.
+    np.testing.assert_allclose(modal[0], direct[0], rtol=1e-9)
+    np.testing.assert_allclose(modal, direct, rtol=5e-3)
+
+    # A response to each of several loads.
+    load = np.column_stack((-fem.get_piezoelectric_matrix() @ [1.0], 
+                            np.ones(fem.dof.n_mdof)))
+    modal = fem.frequency_response(freqs, load, rayleigh=RAYLEIGH)
+    assert modal.shape == (4, 1, 2)
+    np.testing.assert_allclose(modal[:, :, 0], direct, rtol=5e-3)
+
+
+def test_reduced_model_matches_direct():
+    fem = laminate()
+    freqs = off_resonance(fem)
+    direct = fem.frequency_response(freqs, voltage=1.0, rayleigh=RAYLEIGH,
+                                    method='direct')
+    f2 = 0.5 * (freqs[2] + freqs[3])
+    for expansion_freqs in ((0.0,), (0.0, f2)):
+        rom = fem.reduced_model(n_moments=8, expansion_freqs=expansion_freqs)
+        h = rom.transfer(freqs, rayleigh=RAYLEIGH)
+        assert h.shape == (4, 1, 1)
+        np.testing.assert_allclose(h[:, :, 0], direct, rtol=1e-8)
+        # The model of one round less is nearly as accurate, so the error
+        # estimate is small.
+        assert np.all(rom.error_estimate(freqs, rayleigh=RAYLEIGH) < 1e-6)
+
+    # Too few moments to match the higher frequencies, which the error 
+    # estimate detects.
+    rom = fem.reduced_model(n_moments=2)
+    h = rom.transfer(freqs, rayleigh=RAYLEIGH)[:, :, 0]
+    error = np.abs(h[:, 0] / direct[:, 0] - 1)
+    estimate = rom.error_estimate(freqs, rayleigh=RAYLEIGH)
+    assert error[-1] > 1e-3 and estimate[-1] > error[-1]
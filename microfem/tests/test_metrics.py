@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import warnings
+import numpy as np
+
+import microfem
+
+
+def test_modal_metrics_torsional_modes():
+    # The torsional modes of a symmetric cantilever don't deflect the tip on
+    # the centerline, so their normalized metrics are NaN.
+    topology = np.ones((10, 20))
+    cantilever = microfem.Cantilever(topology, 5, 5, 50, 195)
+    fem = microfem.LaminateFEM(microfem.PiezoMumpsMaterial(), cantilever)
+    w, v, _ = fem.modal_analysis(4)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        metrics = fem.modal_metrics(modes=(w, v))
+    np.testing.assert_allclose(metrics['freq'], fem.modal_metrics(4)['freq'],
+                               rtol=1e-10)
+    torsional = ~metrics['flexural']
+    assert np.any(torsional)
+    assert np.all(np.isnan(metrics['stiffness'][torsional]))
+    assert np.all(np.isnan(metrics['charge'][torsional]))
+    assert np.all(metrics['stiffness'][~torsional] > 0)
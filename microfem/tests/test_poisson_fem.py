@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import microfem
+from microfem.poisson_model import PoissonModel
+
+
+def test_conduction_matrix_scale():
+    # The conduction matrix of a square element doesn't depend on its size.
+    for a in (1, 5, 100):
+        ke = PoissonModel(a, a).ke
+        np.testing.assert_allclose(np.diag(ke), 2 / 3)
+        np.testing.assert_allclose(ke.sum(axis=1), 0, atol=1e-12)
+
+
+def test_transient_decay_rate():
+    # A strip held at zero at y = 0 and insulated at y = L decays in its
+    # slowest mode sin(pi y / 2L) at the rate k / (rho c) (pi / 2L)^2, the
+    # rate of a strip of length 2L held at zero at both ends.
+    n, a, b = 40, 5, 5
+    conductivity, capacity = 2.0, 0.5
+    domain = np.ones((1, n))
+    poisson_domain = microfem.PoissonDomain(
+        domain, conductivity * domain, np.zeros(domain.shape), a, b,
+        capacity * domain)
+    fem = microfem.PoissonFEM(poisson_domain)
+
+    length = 2 * b * n * 1e-6
+    rate = conductivity / capacity * (np.pi / (2 * length)) ** 2
+    y = np.array([2 * b * 1e-6 * node.node.j for node in fem.dof.dof_nodes])
+    u0 = np.sin(np.pi * y / (2 * length))
+
+    t_end = 1 / rate
+    n_steps = 400
+    snapshots = fem.transient(t_end / n_steps, n_steps, u0, theta=0.5,
+                              stride=n_steps)
+    t, uall = list(snapshots)[-1]
+    decay = -np.log(uall.max() / u0.max()) / t
+    np.testing.assert_allclose(decay, rate, rtol=1e-2)
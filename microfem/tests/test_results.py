@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+import microfem
+from microfem.results import ResultWriter, ResultReader
+
+
+def test_append_modal_signs(tmp_path):
+    topology = np.ones((6, 20))
+    cantilever = microfem.Cantilever(topology, 5, 5, 30, 195)
+    fem = microfem.PlateFEM(microfem.SoiMumpsMaterial(), cantilever)
+    w, _, vall = fem.modal_analysis(3)
+    # The mode shapes are stored as given by default.
+    with ResultWriter(str(tmp_path / 'full'), 'w') as writer:
+        writer.append_modal(fem, w, vall)
+    reader = ResultReader(str(tmp_path / 'full'))
+    np.testing.assert_array_equal(reader.read('modes', 0), vall)
+
+    with ResultWriter(str(tmp_path / 'grid'), 'w') as writer:
+        writer.append_modal(fem, w, vall, deflection_only=True, 
+                            normalize=True)
+        writer.append_modal(fem, w, -vall, deflection_only=True, 
+                            normalize=True)
+    reader = ResultReader(str(tmp_path / 'grid'))
+    np.testing.assert_array_equal(reader.read('modes', 0),
+                                  reader.read('modes', 1))
+
+
+def test_append_and_reopen(tmp_path):
+    # The long dtype of the structured field needs a header over 256 bytes.
+    path = str(tmp_path / 'results')
+    record = np.dtype([('field%d' % i, float) for i in range(12)])
+    with ResultWriter(path, 'w', chunk_size=2) as writer:
+        for i in range(3):
+            writer.append({'i': i}, x=np.full(4, i), y=np.full(2, i, record))
+    reader = ResultReader(path)
+    assert len(reader) == 3
+    assert isinstance(reader['y'], np.memmap)
+    np.testing.assert_array_equal(reader['x'][:, 0], [0, 1, 2])
+    np.testing.assert_array_equal(reader.read('y', [0, 2])['field11'][:, 0], 
+                                  [0, 2])
+    np.testing.assert_array_equal(np.load(path + '/y.npy')['field5'][:, 1], 
+                                  [0, 1, 2])
+
+    # The last record lost its metadata in a crash, so it is overwritten in
+    # mode 'a'.
+    with open(path + '/metadata.jsonl') as fh:
+        lines = fh.readlines()
+    with open(path + '/metadata.jsonl', 'w') as fh:
+        fh.writelines(lines[:2])
+    with ResultWriter(path, 'a') as writer:
+        assert writer.n_records == 2
+        writer.append({'i': 3}, x=np.full(4, 3), y=np.full(2, 3, record))
+    reader = ResultReader(path)
+    assert len(reader) == 3
+    assert [m['i'] for m in reader.metadata()] == [0, 1, 3]
+    np.testing.assert_array_equal(reader['x'][:, 0], [0, 1, 3])
+    np.testing.assert_array_equal(reader['y']['field0'][:, 0], [0, 1, 3])
+    assert np.load(path + '/x.npy').shape == (3, 4)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import scipy.sparse as sparse
+import pytest
+
+from microfem.solvers import factorize, available_backends
+
+
+def laplacian(n):
+    """The 2D Laplacian of an n x n grid, which is symmetric positive
+    definite.
+    """
+    d = sparse.diags([-1.0, 2.0, -1.0], [-1, 0, 1], shape=(n, n))
+    eye = sparse.identity(n)
+    return (sparse.kron(d, eye) + sparse.kron(eye, d)).tocsc()
+
+
+def matrices():
+    a = laplacian(12)
+    rng = np.random.default_rng(0)
+    skew = sparse.random(a.shape[0], a.shape[0], density=0.01,
+                         random_state=rng)
+    yield 'definite', a, True, True
+    yield 'indefinite', (a - 1.3 * sparse.identity(a.shape[0])).tocsc(), \
+        True, False
+    yield 'general', (a + skew - skew.T).tocsc(), False, False
+
+
+@pytest.mark.parametrize('backend', available_backends())
+def test_backends_match_superlu(backend):
+    rng = np.random.default_rng(1)
+    for name, a, symmetric, definite in matrices():
+        if backend == 'cholmod' and definite is False:
+            continue
+        b = rng.standard_normal((a.shape[0], 3))
+        reference = factorize(a, 'superlu').solve(b)
+        x = factorize(a, backend, symmetric, definite).solve(b)
+        np.testing.assert_allclose(x, reference, rtol=1e-8, atol=1e-10,
+                                   err_msg='%s %s' % (backend, name))
+        np.testing.assert_allclose(a @ x, b, atol=1e-8,
+                                   err_msg='%s %s' % (backend, name))
+
+
+def test_superlu_small_pivot():
+    # The tiny first diagonal pivot spoils a factorization without 
+    # pivoting, so the factorization must fall back to pivoting.
+    a = sparse.csc_matrix(np.array([[1e-14, 1, 0], [1, 1, 2], [0, 2, 3]]))
+    b = np.array([1.0, 2.0, 3.0])
+    x = factorize(a, 'superlu', symmetric=True).solve(b)
+    np.testing.assert_allclose(a @ x, b, atol=1e-12)
+
+
+def test_complex_matrix():
+    a = laplacian(8) * (1 + 0.1j) - 2.0 * sparse.identity(64)
+    b = np.ones(64)
+    x = factorize(a.tocsc(), symmetric=True).solve(b)
+    np.testing.assert_allclose(a @ x, b, atol=1e-10)
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import microfem
+
+
+def cantilever():
+    topology = np.ones((6, 20))
+    return microfem.Cantilever(topology, 5, 5, 30, 195)
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_sweep_solved_fem(processes):
+    # The cached factorization of a solved FEM isn't copied to the workers.
+    points = [{'a': 5}, {'a': 6}]
+    fems = (microfem.PlateFEM(microfem.SoiMumpsMaterial(), cantilever()),
+            microfem.LaminateFEM(microfem.PiezoMumpsMaterial(), cantilever()))
+    for fem in fems:
+        reference = microfem.ParameterSweep(fem).run(points, 3, processes=1)
+        fem.modal_analysis(3)
+        sweep = microfem.ParameterSweep(fem).run(points, 3, processes)
+        np.testing.assert_allclose(sweep['freq'], reference['freq'], 
+                                   rtol=1e-10)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import microfem
+
+
+def cantilever():
+    # A wide base and a narrow tip, symmetric about the long axis.
+    topology = np.hstack((np.ones((16, 16)), 
+                          np.vstack((np.zeros((6, 8)), np.ones((4, 8)), 
+                                     np.zeros((6, 8))))))
+    return microfem.Cantilever(topology, 5, 5, 80, 235)
+
+
+@pytest.mark.parametrize('fem_class, material', [
+    (microfem.PlateFEM, microfem.SoiMumpsMaterial()),
+    (microfem.LaminateFEM, microfem.PiezoMumpsMaterial())])
+def test_auto_symmetry_adaptive_mesh(fem_class, material):
+    # Hanging nodes of an adaptive mesh rule out the half-models, so 'auto'
+    # falls back to the full model, and only True raises.
+    fem = fem_class(material, cantilever(), adaptive=True, max_size=4)
+    assert fem.dof.prolongation.constrained is True
+    w, _, _ = fem.modal_analysis(4, symmetric='auto')
+    w_full, _, _ = fem.modal_analysis(4)
+    np.testing.assert_allclose(w, w_full, rtol=1e-10)
+    with pytest.raises(ValueError):
+        fem.modal_analysis(4, symmetric=True)
+
+
+@pytest.mark.parametrize('full_grid', [False, True])
+@pytest.mark.parametrize('element', ['q4', 'q8'])
+@pytest.mark.parametrize('fem_class, material', [
+    (microfem.PlateFEM, microfem.SoiMumpsMaterial()),
+    (microfem.LaminateFEM, microfem.PiezoMumpsMaterial())])
+def test_half_models_exact(fem_class, material, element, full_grid):
+    # The half-models span the symmetric and antisymmetric modes exactly, 
+    # so the parity of each DOF must be right for the frequencies to match.
+    fem = fem_class(material, cantilever(), full_grid=full_grid, 
+                    element=element)
+    w, v, vall = fem.modal_analysis(8, symmetric=True)
+    w_full, _, _ = fem.modal_analysis(8)
+    np.testing.assert_allclose(w, w_full, rtol=1e-9)
+
+    # The expanded modes are M-orthonormal eigenvectors of the full model.
+    k = fem.get_stiffness_matrix(free=True)
+    m = fem.get_mass_matrix(free=True)
+    np.testing.assert_allclose(v.T @ (m @ v), np.eye(8), atol=1e-9)
+    residual = k @ v - (m @ v) * w
+    assert np.linalg.norm(residual) < 1e-8 * np.linalg.norm(k @ v)
@@ -0,0 +1,125 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+def mac_matrix(va, vb, mass=None):
+    """Returns the Modal Assurance Criterion of every pair of modes in the
+    columns of (va) and (vb). The MAC is 1 for modes with the same shape and
+    0 for modes that are orthogonal.
+
+    Parameters
+    ----------
+    va : ndarray
+        The (n_dof, na) mode shapes.
+    vb : ndarray
+        The (n_dof, nb) mode shapes.
+    mass : scipy.sparse matrix
+        If given, the MAC is weighted by the mass matrix, so that distinct
+        modes of the same structure have a MAC of zero.
+
+    Returns
+    -------
+    mac : ndarray
+        The (na, nb) array of the MAC of each pair of modes.
+    """
+    mvb = vb if mass is None else mass @ vb
+    cross = va.T @ mvb
+    nb = np.einsum('ij,ij->j', vb, mvb)
+    mva = va if mass is None else mass @ va
+    na = np.einsum('ij,ij->j', va, mva)
+    return cross ** 2 / np.outer(na, nb)
+
+
+def normalize_signs(vall):
+    """Returns the mode shapes (vall) with the sign of each mode chosen so
+    that its projection onto a fixed pseudo-random vector is positive. The
+    sign of an eigenvector from ARPACK is arbitrary. The projection varies
+    continuously with the mode shape, so the signs agree between designs of
+    the same mesh, unlike the sign of the largest entry, which is ambiguous
+    for antisymmetric modes. The reference is indexed by DOF, so the signs
+    are only comparable for the same DOF numbering, and (vall) is expanded
+    to a dense copy.
+    """
+    vall = np.asarray(vall)
+    reference = np.random.default_rng(0).standard_normal(vall.shape[0])
+    signs = np.sign(reference @ vall)
+    return vall * np.where(signs == 0, 1, signs)
+
+
+class ModeTracker(object):
+    """Follows a set of modes through the iterations of a design optimization
+    in which the order of the modes changes. The modes of each iteration are
+    matched to the tracked modes of the previous iteration by the assignment
+    that maximizes the total MAC, see `mac_matrix`, and are returned in the
+    order of the tracked modes with the sign of the previous iteration. The
+    tracked modes are then replaced by the matched modes, so modes that
+    evolve slowly over many iterations are followed.
+
+    The DOF numbering must be the same for all iterations, such as for a
+    full grid model, see `LaminateFEM.update_topology`.
+
+    Public Attributes
+    -----------------
+    self.reference : ndarray
+        The (n_dof, n_tracked) shapes of the tracked modes.
+    self.permutation : ndarray
+        The column of each tracked mode in the modes of the last update.
+    self.mac : ndarray
+        The MAC of each tracked mode with its match in the last update.
+    """
+
+    def __init__(self, vall, modes=None, mass=None):
+        """
+        Parameters
+        ----------
+        vall : ndarray
+            The (n_dof, n_modes) mode shapes of the first iteration.
+        modes : list of int
+            The columns of (vall) to track. Defaults to all modes.
+        mass : scipy.sparse matrix
+            The mass matrix used to weight the MAC. It can be changed with
+            each update.
+        """
+        modes = np.arange(vall.shape[1]) if modes is None else modes
+        self.reference = np.array(vall[:, modes])
+        self.permutation = np.asarray(modes)
+        self.mac = np.ones(len(self.permutation))
+        self._mass = mass
+
+
+    @property
+    def n_tracked(self):
+        return self.reference.shape[1]
+
+
+    def update(self, w, vall, mass=None):
+        """Matches the modes (w, vall) of a new iteration to the tracked
+        modes. There must be at least as many new modes as tracked modes.
+
+        Returns
+        -------
+        w : ndarray
+            The eigenvalues of the tracked modes.
+        vall : ndarray
+            The (n_dof, n_tracked) shapes of the tracked modes.
+        mac : ndarray
+            The MAC of each tracked mode with its match, a value much less
+            than one indicates the mode was not found among the new modes.
+        """
+        if vall.shape[1] < self.n_tracked:
+            raise ValueError('There are fewer modes than tracked modes.')
+        self._mass = self._mass if mass is None else mass
+
+        mac = mac_matrix(self.reference, vall, self._mass)
+        _, columns = linear_sum_assignment(mac, maximize=True)
+        self.permutation = columns
+        self.mac = mac[np.arange(self.n_tracked), columns]
+
+        # Align the signs with the tracked modes.
+        v = vall[:, columns]
+        mv = v if self._mass is None else self._mass @ v
+        signs = np.sign(np.einsum('ij,ij->j', self.reference, mv))
+        v = v * np.where(signs == 0, 1, signs)
+
+        self.reference = v
+        return np.asarray(w)[columns], v, self.mac